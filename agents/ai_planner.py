@@ -1,32 +1,15 @@
-import os
 import json
-import socket
-import google.generativeai as genai
-from dotenv import load_dotenv
-from typing import Dict, Any
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple
+import config
+from agents import llm_cache, llm_ledger
+from agents.llm_client import LLMUnavailableError
 from agents.logger import logger
+from agents.plan_optimizer import describe_step, invalid_reason, step_effects
 
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-
-def check_internet_connection():
-    """Checks for a live internet connection."""
-    try:
-        socket.create_connection(("8.8.8.8", 53), timeout=3)
-        return True
-    except OSError:
-        return False
-
-def generate_cleaning_plan(profile: Dict[str, Any]) -> Dict[str, Any]:
-    """Sends the data profile to the AI to get a reasoned cleaning plan."""
-    logger.debug("Generating cleaning plan with AI...")
-
-    if not check_internet_connection():
-        raise ConnectionError("No internet connection. Cannot contact AI planner.")
-    logger.info("Internet connection verified.")
-    
-    prompt = f"""
-    You are an expert data scientist preparing a dataset for machine learning. Your task is to generate a JSON object with a 'steps' key
+# Shared by the whole-profile prompt and the per-shard prompts of wide-table planning.
+CLEANING_INSTRUCTIONS = """    You are an expert data scientist preparing a dataset for machine learning. Your task is to generate a JSON object with a 'steps' key
     containing a list of actions to clean and enhance a pandas DataFrame based on its data profile.
 
     **CRITICAL Instructions:**
@@ -49,73 +32,309 @@ def generate_cleaning_plan(profile: Dict[str, Any]) -> Dict[str, Any]:
 
     - **action: "encode_binary"**
       - **column**: The binary categorical column (e.g., "smoker").
-      - **details**: {{"positive_value": "yes"}}  (The value that should map to 1).
+      - **details**: {"positive_value": "yes"}  (The value that should map to 1).
       - **reason**: Explain that converting categories to numbers is essential for machine learning models.
 
     - **action: "scale_numeric"**
       - **column**: The numeric column to scale (e.g., "age").
-      - **details**: {{"strategy": "min_max"}} (Can be 'min_max' for normalization or 'standard' for standardization).
+      - **details**: {"strategy": "min_max"} (Can be 'min_max' for normalization or 'standard' for standardization).
       - **reason**: Explain that scaling features to a similar range improves the performance of many ML models.
 
     - **action: "execute_custom_function"**
       - **column**: The name of the new column to create (e.g., "tour_duration_years").
-      - **details**: {{"function_name": "calculate_year_span", "source_column": "years"}}
+      - **details**: {"function_name": "calculate_year_span", "source_column": "years"}
       - **reason**: Explain that a specialized function is needed for this complex transformation.
 
     - **action: "clean_categorical"**
       - **column**: The categorical column to clean (e.g., "decision").
-      - **details**: {{"valid_values": ["positive", "negative"]}}
+      - **details**: {"valid_values": ["positive", "negative"]}
       - **reason**: Explain that this step ensures the column only contains valid categories for accurate grouping.
 
     - **action: "clean_text"**
       - **column**: The name of the text column (e.g., "review_text").
-      - **details**: {{"operations": ["lowercase", "remove_punctuation", "remove_digits", "remove_non_ascii"]}}
+      - **details**: {"operations": ["lowercase", "remove_punctuation", "remove_digits", "remove_non_ascii"]}
       - **reason**: Explain why cleaning text is crucial for NLP tasks.
 
     - **action: "remove_column"**
       - **column**: The name of the column to remove (e.g., "user_id").
-      - **details**: {{}}
+      - **details**: {}
       - **reason**: Explain why the column is not useful for analysis (e.g., "it's an identifier").
 
     - **action: "remove_duplicates"**
       - **column**: null
-      - **details**: {{}}
+      - **details**: {} to compare whole rows, or {"subset": ["order_id"]} to compare only the columns that identify a record.
       - **reason**: Explain that removing duplicates prevents skewed analysis.
 
     - **action: "convert_type"**
       - **column**: The name of the column to convert (e.g., "price").
-      - **details**: {{"new_type": "float64", "pre_processing": ["remove_currency", "remove_commas"]}}
+      - **details**: {"new_type": "float64", "pre_processing": ["remove_currency", "remove_commas"]}
       - **reason**: Explain why changing the data type is necessary for calculations.
 
     - **action: "fill_missing"**
       - **column**: The name of the column with missing values (e.g., "age").
-      - **details**: {{"strategy": "mean"}}
+      - **details**: {"strategy": "mean"}
       - **reason**: Explain the choice of filling strategy.
 
     - **action: "create_feature"**
       - **column**: null
-      - **details**: {{"new_column_name": "bmi", "expression": "weight / ((height / 100) ** 2)"}}
-      - **reason**: Explain what the new feature represents and why it's valuable.
+      - **details**: {"new_column_name": "bmi", "expression": "weight / ((height / 100) ** 2)"}
+      - **reason**: Explain what the new feature represents and why it's valuable."""
 
-    Data Profile:
-    {json.dumps(profile, indent=2)}
+def generate_cleaning_plan(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Sends the data profile to the AI to get a reasoned cleaning plan."""
+    logger.debug("Generating cleaning plan with AI...")
+    if len(profile.get("columns") or {}) > config.WIDE_TABLE_COLUMNS:
+        return generate_sharded_plan(profile)
 
-    Generate the JSON cleaning and feature engineering plan now.
-    """
+    prompt = _plan_prompt(profile)
 
     generation_config = {
         "temperature": 0.0,
         "response_mime_type": "application/json",
     }
     
-    # Corrected model name to the one that works
-    model = genai.GenerativeModel("gemini-2.5-flash", generation_config=generation_config)
-    
+    # Cached plans are served without contacting Gemini, so a hit works offline.
+    plan = llm_cache.lookup("gemini-2.5-flash", prompt, generation_config, parse=json.loads, purpose="cleaning plan")
+    if plan is not None:
+        logger.info("Reusing cached cleaning plan for an identical profile.")
+        return plan
+    schema_key = _schema_key(profile, "gemini-2.5-flash", generation_config, "whole", [_plan_prompt(TEMPLATE_PROFILE)])
+    if config.LLM_SCHEMA_CACHE:
+        plan = llm_cache.load(schema_key, parse=json.loads)
+        if plan is not None:
+            logger.info("Reusing cached cleaning plan from an earlier run on the same schema.")
+            llm_ledger.record("cleaning plan", "gemini-2.5-flash", prompt, "schema", parsed=True)
+            return plan
+
     try:
-        response = model.generate_content(prompt)
-        plan = json.loads(response.text)
+        # Corrected model name to the one that works
+        plan = llm_cache.generate_and_store("gemini-2.5-flash", prompt, generation_config, parse=json.loads,
+                                            purpose="cleaning plan")
+        llm_cache.put(schema_key, json.dumps(plan), model="gemini-2.5-flash")
         logger.debug("Successfully generated reasoned cleaning plan from AI.")
         return plan
+    except LLMUnavailableError:
+        # Cleaning without a plan would pass the data through unchanged; stop the run instead.
+        raise
     except Exception as e:
         logger.error(f"An error occurred during AI plan generation: {e}")
-        return {"steps": []}
\ No newline at end of file
+        return {"steps": []}
+
+
+# --- WIDE-TABLE PLANNING ---
+# Census-style tables with hundreds of columns do not fit one prompt well: the call is
+# slow and fails often. Their columns are planned in shards instead, each sent in a
+# compact one-line-per-column encoding, all shards at once. A global pass decides the
+# dataset-level steps. Every part is cached on its own, so changing a few columns
+# re-plans only their shards.
+PLANNER_MODEL = "gemini-2.5-flash"
+PLANNER_CONFIG = {"temperature": 0.0, "response_mime_type": "application/json"}
+GLOBAL_ACTIONS = {"remove_duplicates", "create_feature"}
+
+
+def _short(value: Any) -> str:
+    """Numbers to 4 significant digits, text quoted and cut to 40 characters."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"{value:.4g}"
+    text = str(value)
+    return json.dumps(text if len(text) <= 40 else text[:39] + "…", ensure_ascii=False)
+
+
+def encode_columns(profile: Dict[str, Any], columns: List[str]) -> str:
+    """
+    The profile of the given columns, one line per column, e.g.
+    `indicator01 | float64 | missing 31 | min 0.4 max 912 mean 101 std 70.2`.
+    Keeps every statistic the planning rules look at and none of the JSON punctuation.
+    """
+    lines = []
+    for name in columns:
+        stats = profile["columns"][name]
+        parts = [name, str(stats.get("data_type"))]
+        if stats.get("data_type") == "identifier":
+            parts.append(f"unique {stats.get('unique_count')}")
+        else:
+            parts.append(f"missing {stats.get('missing_values_count', 0)}")
+            if "mean" in stats:
+                parts.append(" ".join(f"{label} {_short(stats.get(key))}" for label, key in
+                                      (("min", "min"), ("max", "max"), ("mean", "mean"), ("std", "std_dev"))))
+            if "unique_values_count" in stats:
+                top = ", ".join(f"{_short(value)} {count}" for value, count in (stats.get("top_5_values") or {}).items())
+                parts.append(f"unique {stats['unique_values_count']}; top {top}")
+        lines.append("    " + " | ".join(parts))
+    return "\n".join(lines)
+
+
+def _shard_prompt(profile: Dict[str, Any], shard: List[str]) -> str:
+    # Only the shard's own columns are in the prompt, so adding a column elsewhere
+    # leaves this prompt (and its cached plan) unchanged.
+    return f"""
+{CLEANING_INSTRUCTIONS}
+
+    **Scope:** This dataset has too many columns to plan at once, so its columns are planned in groups.
+    Only the {len(shard)} columns profiled below are in scope.
+    - Every step must name one of these columns, and `create_feature` expressions may only use these columns.
+    - Do NOT suggest `remove_duplicates`; dataset-level steps are planned separately.
+    - If none of these columns needs work, return {{"steps": []}}.
+
+    Data Profile ({profile.get("total_rows")} rows; one line per column: name | type | missing values | min, max, mean and std, or unique values and the top values with their counts):
+{encode_columns(profile, shard)}
+
+    Generate the JSON cleaning and feature engineering plan for these columns now.
+    """
+
+
+def _global_prompt(profile: Dict[str, Any]) -> str:
+    by_type: Dict[str, List[str]] = {}
+    for name, stats in profile["columns"].items():
+        by_type.setdefault(str(stats.get("data_type")), []).append(name)
+    listing = "\n".join(f"    - {dtype} ({len(names)}): {', '.join(names)}" for dtype, names in by_type.items())
+    return f"""
+    You are an expert data scientist preparing a dataset for machine learning. Your task is to generate a JSON object with a 'steps' key
+    containing the dataset-level actions to clean and enhance a pandas DataFrame of {profile.get("total_rows")} rows and {len(profile["columns"])} columns.
+    Each column is planned separately, so suggest ONLY the actions below, with a "reason" for every step.
+
+    - **action: "remove_duplicates"**, **column**: null, **details**: {{}}, or {{"subset": ["order_id"]}} to compare only the columns that identify a record
+      Suggest it unless the columns show that repeated rows are legitimate.
+    - **action: "create_feature"**, **column**: null, **details**: {{"new_column_name": "bmi", "expression": "weight / ((height / 100) ** 2)"}}
+      Only for a simple mathematical expression over numeric columns that provides clear value, such as a ratio of two counts.
+
+    Columns by type:
+{listing}
+
+    Generate the JSON plan of dataset-level steps now.
+    """
+
+
+def _plan_prompt(profile: Dict[str, Any]) -> str:
+    return f"""
+{CLEANING_INSTRUCTIONS}
+
+    Data Profile:
+    {json.dumps(profile, indent=2)}
+
+    Generate the JSON cleaning and feature engineering plan now.
+    """
+
+
+# A profile without columns: the prompts built from it hold only their fixed text.
+TEMPLATE_PROFILE = {"total_rows": None, "columns": {}}
+
+
+def _schema_key(profile: Dict[str, Any], model_name: str, generation_config: Dict[str, Any], mode: str,
+                templates: List[str]) -> str:
+    """
+    Cache key of the plan for a schema, as produced by this planner: the schema fingerprint
+    plus a hash of the model, its config, the planning mode and the prompts' fixed text.
+    Changing the prompts or the planner therefore stops reusing plans made by the old ones.
+    """
+    planner = json.dumps({"model": model_name, "config": generation_config, "mode": mode, "prompts": templates},
+                         sort_keys=True, ensure_ascii=False)
+    return f"schema-{llm_cache.schema_fingerprint(profile)}-{hashlib.sha256(planner.encode('utf-8')).hexdigest()[:16]}"
+
+
+def _plan_steps(plan: Any) -> List[Dict[str, Any]]:
+    steps = plan.get("steps") if isinstance(plan, dict) else None
+    return [step for step in steps if isinstance(step, dict)] if isinstance(steps, list) else []
+
+
+def merge_shard_plans(global_plan: Any, shard_plans: List[Any], shards: List[List[str]],
+                      columns: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Combines the global pass and the shard plans into one list of steps: de-duplication
+    first, then each shard's steps in column order, then the global features. Returns
+    the steps and a reason for every step left out: steps outside their part's scope,
+    steps the executor would reject, and steps writing a column another part created.
+    """
+    global_steps = _plan_steps(global_plan)
+    parts = [(None, [s for s in global_steps if s.get("action") == "remove_duplicates"][:1])]
+    parts += [(set(shard), _plan_steps(plan)) for shard, plan in zip(shards, shard_plans)]
+    parts.append((None, [s for s in global_steps if s.get("action") != "remove_duplicates"]))
+
+    schema = list(columns)
+    created: Dict[str, int] = {}
+    steps, rejected = [], []
+    for part, (scope, part_steps) in enumerate(parts):
+        for step in part_steps:
+            effects = step_effects(step, schema)
+            touched = (effects["reads"] | effects["writes"] | effects["drops"]) - effects["creates"]
+            if scope is None:
+                reason = invalid_reason(step, schema) if step.get("action") in GLOBAL_ACTIONS else "it is not a dataset-level action"
+            elif step.get("action") == "remove_duplicates" or not touched <= scope:
+                reason = "it reaches outside its group of columns"
+            else:
+                reason = invalid_reason(step, schema)
+            if reason is None and any(created.get(c, part) != part for c in effects["writes"]):
+                reason = "another group already creates that column"
+            if reason:
+                rejected.append(f"{describe_step(step)}: {reason}")
+                continue
+            for c in effects["creates"]:
+                created[c] = part
+            schema = [c for c in schema if c not in effects["drops"]] + sorted(effects["creates"])
+            steps.append(step)
+    return steps, rejected
+
+
+def _shard_purpose(i: int) -> str:
+    """Call-ledger label of the sharded planner's i-th prompt (0 is the dataset-level pass)."""
+    return "cleaning plan (dataset pass)" if i == 0 else "cleaning plan (column shard)"
+
+
+def generate_sharded_plan(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Plans a wide table as a global pass plus one request per shard of columns, sent
+    concurrently. Shards whose answer is unusable are left unplanned (and listed in the
+    plan's `planning` entry) rather than failing the whole plan; if Gemini cannot be
+    reached at all, LLMUnavailableError is raised.
+    """
+    columns = list(profile["columns"])
+    shards = [columns[i:i + config.PLAN_SHARD_COLUMNS] for i in range(0, len(columns), config.PLAN_SHARD_COLUMNS)]
+    prompts = [_global_prompt(profile)] + [_shard_prompt(profile, shard) for shard in shards]
+    logger.info(f"Planning {len(columns)} columns in {len(shards)} shards of up to {config.PLAN_SHARD_COLUMNS}.")
+
+    schema_key = _schema_key(profile, PLANNER_MODEL, PLANNER_CONFIG, f"sharded by {config.PLAN_SHARD_COLUMNS}",
+                             [_global_prompt(TEMPLATE_PROFILE), _shard_prompt(TEMPLATE_PROFILE, [])])
+    if config.LLM_SCHEMA_CACHE:
+        plan = llm_cache.load(schema_key, parse=json.loads)
+        if plan is not None:
+            logger.info("Reusing cached cleaning plan from an earlier run on the same schema.")
+            for i, prompt in enumerate(prompts):
+                llm_ledger.record(_shard_purpose(i), PLANNER_MODEL, prompt, "schema", parsed=True)
+            return plan
+
+    # Cached parts are served without contacting Gemini, so a fully cached plan works offline.
+    results = [llm_cache.lookup(PLANNER_MODEL, prompt, PLANNER_CONFIG, json.loads, _shard_purpose(i))
+               for i, prompt in enumerate(prompts)]
+    missing = [i for i, result in enumerate(results) if result is None]
+    failed = []
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, min(config.PLANNER_WORKERS, len(missing)))) as executor:
+            futures = {i: executor.submit(llm_cache.generate_and_store, PLANNER_MODEL, prompts[i], PLANNER_CONFIG,
+                                          json.loads, _shard_purpose(i))
+                       for i in missing}
+            for i, future in futures.items():
+                try:
+                    results[i] = future.result()
+                except LLMUnavailableError:
+                    # Gemini is down, not just this part; the answers that came back are cached.
+                    raise
+                except Exception as e:
+                    part = "the dataset-level pass" if i == 0 else f"columns {shards[i - 1][0]} to {shards[i - 1][-1]}"
+                    logger.error(f"An error occurred while planning {part}: {e}")
+                    failed.append(i)
+
+    steps, rejected = merge_shard_plans(results[0], results[1:], shards, columns)
+    if rejected:
+        logger.warning(f"Left {len(rejected)} out-of-scope or invalid steps out of the merged plan.")
+        logger.debug(f"Steps left out of the merged plan: {rejected}")
+    plan = {"steps": steps, "planning": {
+        "shards": len(shards),
+        "unplanned_columns": [c for i in failed if i > 0 for c in shards[i - 1]],
+        "global_pass_failed": 0 in failed,
+        "rejected_steps": rejected,
+    }}
+    # A plan with failed parts is not stored, so the next run asks again.
+    if not failed:
+        llm_cache.put(schema_key, json.dumps(plan), model=PLANNER_MODEL)
+    logger.debug(f"Merged {len(steps)} steps from {len(shards)} shard plans and the dataset-level pass.")
+    return plan
@@ -0,0 +1,290 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from concurrent.futures import Executor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import config
+from agents.logger import logger
+
+# Intermediate artifacts passed between nodes. Feather (Arrow IPC) is written
+# uncompressed so it can be memory-mapped on read; Parquet trades some read
+# speed for smaller files; CSV keeps the original text round-trip.
+ARTIFACT_FORMATS = config.ARTIFACT_FORMATS
+
+
+# --- IN-PROCESS ARTIFACT STORE ---
+# Every artifact written during a run is also kept in memory, keyed by its path, so
+# the next node receives the live DataFrame instead of re-reading the file. An entry
+# is only served while the file on disk is unchanged. Frames are shared by reference,
+# so `pipeline.run_pipeline` runs the graph with pandas' Copy-on-Write on: a node that
+# modifies a frame it was handed gets its own copy of the touched columns.
+_frames: Dict[str, Tuple[Tuple[int, int], pd.DataFrame]] = {}
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def cached_artifact(path: str) -> Optional[pd.DataFrame]:
+    """Returns the in-memory frame for an artifact written in this process, if still valid."""
+    entry = _frames.get(os.path.abspath(path))
+    if entry is None or entry[0] != _file_signature(path):
+        return None
+    # Under Copy-on-Write (on while the pipeline runs) a shallow copy shares the data safely.
+    return entry[1].copy(deep=not pd.get_option("mode.copy_on_write"))
+
+
+def release_artifact(path: str) -> None:
+    """Drops an artifact's in-memory frame once no later node needs it."""
+    _frames.pop(os.path.abspath(path), None)
+
+
+def clear_artifacts() -> None:
+    """Drops every in-memory frame, e.g. at the end of a run."""
+    _frames.clear()
+
+
+def artifact_path(stem: str, fmt: str) -> str:
+    """Builds the on-disk path for an artifact, e.g. 'outputs/2_cleaned_data.feather'."""
+    if fmt not in ARTIFACT_FORMATS:
+        raise ValueError(f"Unknown artifact format '{fmt}'. Choose one of: {', '.join(ARTIFACT_FORMATS)}.")
+    return f"{stem}.{fmt}"
+
+
+def artifact_format(path: str) -> str:
+    """Infers the artifact format from the file extension."""
+    ext = os.path.splitext(path)[1].lstrip(".").lower()
+    return ext if ext in ARTIFACT_FORMATS else "csv"
+
+
+def _mangle_duplicate_columns(columns: List[str]) -> List[str]:
+    """Renames repeated headers to 'col.1', 'col.2', ... the same way a CSV re-read would."""
+    seen = {}
+    renamed = []
+    for col in columns:
+        col = str(col)
+        if col in seen:
+            seen[col] += 1
+            renamed.append(f"{col}.{seen[col]}")
+        else:
+            seen[col] = 0
+            renamed.append(col)
+    return renamed
+
+
+def _to_arrow(df: pd.DataFrame, workers: int = 1, text_columns: Iterable[str] = ()) -> pa.Table:
+    """
+    Converts a DataFrame to an Arrow table, normalising what Arrow cannot store.
+    `text_columns` are object columns to store as text even where this frame alone
+    does not mix types (see `write_artifact_chunks`).
+    """
+    df = df.reset_index(drop=True)
+    if df.columns.duplicated().any() or not all(isinstance(c, str) for c in df.columns):
+        df.columns = _mangle_duplicate_columns(list(df.columns))
+
+    # Object columns holding mixed Python types (e.g. text plus a numeric fill value)
+    # are stored as text, which is exactly what a CSV round-trip would have produced.
+    text_columns = set(text_columns)
+    mixed = [
+        col for col in df.columns
+        if df[col].dtype == object and (
+            col in text_columns or pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed"))
+    ]
+    if mixed:
+        df = df.copy()
+        for col in mixed:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return pa.Table.from_pandas(df, preserve_index=False, nthreads=workers)
+
+
+def _render_csv(df: pd.DataFrame, header: bool) -> bytes:
+    """Formats one slice of a frame as CSV text. Runs in a worker process."""
+    return df.to_csv(index=False, header=header).encode("utf-8")
+
+
+def _write_csv_parallel(df: pd.DataFrame, path: str, executor: Executor, workers: int) -> None:
+    """Formats row slices of the frame concurrently and writes them in order."""
+    bounds = np.linspace(0, len(df), num=workers * 4 + 1, dtype=int)
+    slices = [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start] or [df]
+    futures = [executor.submit(_render_csv, part, k == 0) for k, part in enumerate(slices)]
+    with open(path, "wb") as f:
+        for future in futures:
+            f.write(future.result())
+
+
+def write_artifact(df: pd.DataFrame, path: str, keep_in_memory: bool = True,
+                   executor: Optional[Executor] = None, workers: int = 1) -> str:
+    """
+    Saves a DataFrame in the format implied by the path's extension. With more
+    than one worker, columns are converted to Arrow on several threads, and CSV
+    text is formatted slice by slice on the given process pool.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fmt = artifact_format(path)
+    if fmt == "feather":
+        feather.write_feather(_to_arrow(df, workers), path, compression="uncompressed")
+    elif fmt == "parquet":
+        pq.write_table(_to_arrow(df, workers), path)
+    elif executor is not None and workers > 1:
+        _write_csv_parallel(df, path, executor, workers)
+    else:
+        df.to_csv(path, index=False)
+    logger.debug(f"Wrote {fmt} artifact to {path}")
+    if keep_in_memory:
+        # A fresh RangeIndex makes the cached frame indistinguishable from a re-read file.
+        _frames[os.path.abspath(path)] = (_file_signature(path), df.reset_index(drop=True))
+    return path
+
+
+def _table_to_pandas(table: pa.Table, use_threads: bool = True) -> pd.DataFrame:
+    """
+    Converts an Arrow table written by `write_artifact` back to pandas. Arrow-backed
+    string columns are rebuilt from the Arrow data directly: the pandas metadata only
+    records them as 'string', which would otherwise come back as Python strings.
+    """
+    metadata = table.schema.pandas_metadata or {}
+    text = [col["name"] for col in metadata.get("columns", []) if col.get("numpy_type") == "string"]
+    text = [name for name in table.column_names if name in text]
+    if not text:
+        return table.to_pandas(use_threads=use_threads)
+    df = table.drop_columns(text).to_pandas(use_threads=use_threads)
+    for name in text:
+        df.insert(table.column_names.index(name), name, pd.arrays.ArrowStringArray(table.column(name)))
+    return df
+
+
+def read_artifact(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Loads an artifact written by `write_artifact`. Columnar files are memory-mapped."""
+    cached = cached_artifact(path)
+    if cached is not None:
+        return cached if columns is None else cached[columns]
+    fmt = artifact_format(path)
+    if fmt == "feather":
+        return _table_to_pandas(feather.read_table(path, columns=columns, memory_map=True))
+    if fmt == "parquet":
+        return _table_to_pandas(pq.read_table(path, columns=columns, memory_map=True))
+    # CSV artifacts are always written by pandas, i.e. as UTF-8.
+    return pd.read_csv(path, encoding="utf-8", usecols=columns)
+
+
+def artifact_shape(path: str) -> Tuple[List[str], int]:
+    """The column names and row count of a Feather or Parquet artifact, read from its metadata."""
+    if artifact_format(path) == "parquet":
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        return parquet_file.schema_arrow.names, parquet_file.metadata.num_rows
+    table = feather.read_table(path, memory_map=True)
+    return table.column_names, table.num_rows
+
+
+def _nullable_columns(path: str) -> Dict[str, str]:
+    """
+    Integer and boolean columns with missing values anywhere in a columnar artifact,
+    mapped to the dtype a whole-file read gives them (float64 or object). A chunk
+    without missing values would otherwise come back as int64 or bool.
+    """
+    if artifact_format(path) == "parquet":
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        metadata, schema = parquet_file.metadata, parquet_file.schema_arrow
+        fields = []
+        for i, field in enumerate(schema):
+            if not (pa.types.is_integer(field.type) or pa.types.is_boolean(field.type)):
+                continue
+            statistics = [metadata.row_group(g).column(i).statistics for g in range(metadata.num_row_groups)]
+            if all(stats is not None and stats.has_null_count for stats in statistics):
+                fields.append((field, sum(stats.null_count for stats in statistics)))
+            else:
+                fields.append((field, pq.read_table(path, columns=[field.name], memory_map=True).column(0).null_count))
+    else:
+        table = feather.read_table(path, memory_map=True)
+        fields = [(field, table.column(i).null_count) for i, field in enumerate(table.schema)]
+    return {
+        field.name: "float64" if pa.types.is_integer(field.type) else "object"
+        for field, null_count in fields
+        if null_count and (pa.types.is_integer(field.type) or pa.types.is_boolean(field.type))
+    }
+
+
+def iter_artifact_chunks(path: str, chunksize: int, columns: Optional[List[str]] = None,
+                         text_columns: Iterable[str] = ()) -> Iterator[pd.DataFrame]:
+    """
+    Yields the artifact (or only `columns` of it) as DataFrames of at most `chunksize`
+    rows, with the dtypes `read_artifact` gives the whole file. CSV columns listed in
+    `text_columns` are kept as the text in the file; columnar files store one type per
+    column, so theirs come back unchanged.
+    """
+    fmt = artifact_format(path)
+    if fmt == "csv":
+        dtype = {name: str for name in text_columns} or None
+        yield from pd.read_csv(path, encoding="utf-8", chunksize=chunksize, usecols=columns, dtype=dtype)
+        return
+    nullable = _nullable_columns(path)
+    if fmt == "feather":
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        schema, batches = table.schema, table.to_batches(max_chunksize=chunksize)
+    else:
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        schema = parquet_file.schema_arrow
+        if columns is not None:
+            schema = pa.schema([field for field in schema if field.name in columns], metadata=schema.metadata)
+        batches = parquet_file.iter_batches(batch_size=chunksize, columns=columns)
+    for batch in batches:
+        # Converted on this thread: buffers Arrow's worker threads allocate for each
+        # chunk are kept by their allocator after release, so memory would grow per chunk.
+        df = _table_to_pandas(pa.Table.from_batches([batch], schema=schema), use_threads=False)
+        for name, dtype in nullable.items():
+            if name in df.columns and df[name].dtype != dtype:
+                df[name] = df[name].astype(dtype)
+        yield df
+
+
+def write_artifact_chunks(chunks: Iterable[pd.DataFrame], path: str, csv_path: Optional[str] = None,
+                          text_columns: Iterable[str] = ()) -> int:
+    """
+    Writes a stream of frames as one artifact, the file `write_artifact` would write for
+    their concatenation, holding one frame in memory at a time. With `csv_path`, the
+    frames are also appended to a CSV copy. Returns the number of rows written.
+
+    Columnar chunks are spilled to a temporary directory first: a column can come out
+    as null in one chunk (all missing) and as text in the next, and the final file's
+    schema is the union of them all.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fmt = artifact_format(path)
+    csv_targets = [p for p in (path if fmt == "csv" else None, csv_path) if p]
+    spill_dir = tempfile.mkdtemp(prefix=".chunks-", dir=os.path.dirname(path) or ".") if fmt != "csv" else None
+    parts, rows = [], 0
+    try:
+        for i, df in enumerate(chunks):
+            for target in csv_targets:
+                df.to_csv(target, index=False, header=i == 0, mode="w" if i == 0 else "a")
+            if spill_dir is not None and (len(df) or not parts):
+                part = os.path.join(spill_dir, f"{i:06d}.arrow")
+                feather.write_feather(_to_arrow(df, text_columns=text_columns), part, compression="uncompressed")
+                # An empty chunk only stands in for the schema until the first rows arrive.
+                if parts and not rows:
+                    os.remove(parts.pop())
+                parts.append(part)
+            rows += len(df)
+
+        if spill_dir is not None:
+            schemas = [feather.read_table(part, memory_map=True).schema for part in parts]
+            schema = pa.unify_schemas(schemas, promote_options="permissive")
+            writer = pa.ipc.new_file(path, schema) if fmt == "feather" else pq.ParquetWriter(path, schema)
+            with writer:
+                for part in parts:
+                    writer.write_table(feather.read_table(part, memory_map=True).cast(schema))
+    finally:
+        if spill_dir is not None:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+    logger.debug(f"Wrote {fmt} artifact to {path} in chunks ({rows} rows)")
+    return rows
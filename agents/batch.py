@@ -0,0 +1,167 @@
+import os
+import glob
+import json
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List
+
+from agents.logger import logger, add_log_file, remove_log_file, quiet_console
+
+# Extensions picked up when a directory (rather than a glob) is given.
+BATCH_EXTENSIONS = (".csv", ".tsv", ".txt")
+
+
+def discover_inputs(inputs: str) -> List[str]:
+    """Expands a directory or a glob pattern into a sorted list of input files."""
+    if os.path.isdir(inputs):
+        paths = [
+            os.path.join(inputs, name) for name in os.listdir(inputs)
+            if name.lower().endswith(BATCH_EXTENSIONS)
+        ]
+    else:
+        paths = glob.glob(inputs, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p))
+
+
+def assign_run_dirs(input_files: List[str], output_root: str) -> Dict[str, str]:
+    """Gives every input its own output directory, named after the file (with a suffix on clashes)."""
+    run_dirs = {}
+    taken = set()
+    for path in input_files:
+        stem = os.path.splitext(os.path.basename(path))[0] or "dataset"
+        name, n = stem, 1
+        while name in taken:
+            n += 1
+            name = f"{stem}_{n}"
+        taken.add(name)
+        run_dirs[path] = os.path.join(output_root, name)
+    return run_dirs
+
+
+def _init_worker() -> None:
+    """
+    Runs once per worker process. Loads every agent with the libraries they import and
+    builds the graph; all later jobs reuse them.
+    """
+    from pipeline import build_graph, load_nodes
+    from agents import insight
+    load_nodes()
+    build_graph()
+    quiet_console()
+    # The insight tables would interleave across workers; they are in each job's report anyway.
+    insight.console.quiet = True
+
+
+def _run_job(input_file: str, run_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs the pipeline on one file inside a worker and reports how it went."""
+    from pipeline import run_pipeline
+
+    output_dir = run_config["output_dir"]
+    handler = add_log_file(os.path.join(output_dir, "run.log"))
+    started = time.perf_counter()
+    result = {
+        "input_file": input_file,
+        "output_dir": output_dir,
+        "input_mb": round(os.path.getsize(input_file) / (1024 * 1024), 3) if os.path.exists(input_file) else 0.0,
+    }
+    try:
+        final_state = run_pipeline(input_file, run_config)
+        result.update({
+            "status": "ok",
+            "rows": (final_state.get("data_profile") or {}).get("total_rows"),
+            "insights": len((final_state.get("insights") or {}).get("generated_insights", [])),
+            "cleaned_data": final_state.get("cleaned_csv_path") or final_state.get("cleaned_data_path"),
+        })
+    except Exception as e:
+        logger.error(f"Batch job failed for {input_file}: {e}", exc_info=True)
+        result.update({"status": "failed", "error": f"{type(e).__name__}: {e}"})
+    finally:
+        remove_log_file(handler)
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def run_batch(input_files: List[str], output_root: str, jobs: int, run_config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs the pipeline on every input in a pool of `jobs` worker processes, each job
+    writing to its own directory under `output_root`. Returns the aggregate summary.
+    """
+    run_dirs = assign_run_dirs(input_files, output_root)
+    # Jobs already run in parallel, so each one parses and renders on a single process.
+    job_config = {**run_config, "ingest_workers": 1, "plot_workers": 1}
+    results = []
+    started = time.perf_counter()
+
+    # Spawned (not forked) workers start from a clean interpreter; the initializer warms them up.
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker) as executor:
+        futures = {
+            executor.submit(_run_job, path, {**job_config, "output_dir": run_dirs[path]}): path
+            for path in input_files
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. out of memory); the job's own errors are caught inside it.
+                result = {"input_file": path, "output_dir": run_dirs[path], "status": "failed",
+                          "error": f"{type(e).__name__}: {e}"}
+            results.append(result)
+            logger.info(f"    [{len(results)}/{len(input_files)}] {result['status']:>6}  {path}  ({result.get('seconds', 0):.1f}s)")
+
+    wall_seconds = time.perf_counter() - started
+    results.sort(key=lambda r: r["input_file"])
+    succeeded = [r for r in results if r["status"] == "ok"]
+    total_mb = sum(r.get("input_mb", 0.0) for r in results)
+    return {
+        "finished_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "jobs": jobs,
+        "files": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "wall_seconds": round(wall_seconds, 3),
+        "job_seconds": round(sum(r.get("seconds", 0.0) for r in results), 3),
+        "input_mb": round(total_mb, 3),
+        "files_per_minute": round(len(results) / wall_seconds * 60, 2) if wall_seconds else None,
+        "mb_per_second": round(total_mb / wall_seconds, 3) if wall_seconds else None,
+        "results": results,
+    }
+
+
+def write_batch_summary(summary: Dict[str, Any], output_root: str) -> str:
+    """Writes the summary as JSON (for tooling) and Markdown (for people). Returns the Markdown path."""
+    os.makedirs(output_root, exist_ok=True)
+    with open(os.path.join(output_root, "batch_summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    lines = [
+        "# RTGS AI Analyst Batch Summary",
+        f"**Finished:** {summary['finished_at']}",
+        "",
+        "| Metric | Value |",
+        "|:---|---:|",
+        f"| Files | {summary['files']} |",
+        f"| Succeeded | {summary['succeeded']} |",
+        f"| Failed | {summary['failed']} |",
+        f"| Worker processes | {summary['jobs']} |",
+        f"| Wall time (s) | {summary['wall_seconds']:,.1f} |",
+        f"| Sum of job times (s) | {summary['job_seconds']:,.1f} |",
+        f"| Input size (MB) | {summary['input_mb']:,.1f} |",
+        f"| Files per minute | {summary['files_per_minute']} |",
+        f"| MB per second | {summary['mb_per_second']} |",
+        "",
+        "| Input | Status | Seconds | Rows | Output |",
+        "|:---|:---|---:|---:|:---|",
+    ]
+    for r in summary["results"]:
+        error = str(r.get("error", "")).replace("|", "\\|").replace("\n", " ")
+        status = r["status"] if r["status"] == "ok" else f"{r['status']}: {error}"
+        lines.append(f"| `{r['input_file']}` | {status} | {r.get('seconds', '')} | {r.get('rows', '')} | `{r['output_dir']}` |")
+
+    md_path = os.path.join(output_root, "batch_summary.md")
+    with open(md_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return md_path
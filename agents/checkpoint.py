@@ -0,0 +1,269 @@
+import os
+import ast
+import json
+import tempfile
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import xxhash
+
+import config
+from agents import tracing
+from agents.logger import logger
+
+# Bump to invalidate every checkpoint written by an older layout.
+CHECKPOINT_VERSION = 1
+CHECKPOINT_SUBDIR = ".checkpoints"
+HASH_BLOCK_BYTES = 8 * 1024 * 1024
+# Where config.py, state.py and the agents package live.
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run options and settings that change how a stage runs but not what it produces.
+NON_SEMANTIC_OPTIONS = {"ingest_workers", "plot_workers", "resume"}
+NON_SEMANTIC_SETTINGS = {
+    "RESUME", "PARALLEL_INGEST_MIN_MB", "PROFILE_CHUNK_ROWS",
+    "LLM_CACHE", "LLM_CACHE_DIR", "LLM_CACHE_TTL_HOURS", "LLM_CACHE_MAX_MB",
+    "WORD_COUNT_CHUNK_ROWS", "WORD_COUNT_PARALLEL_MIN_ROWS", "DEDUP_MEMORY_MB",
+    "LLM_TRANSPORT", "LLM_MAX_CONCURRENCY", "LLM_TIMEOUT_SECONDS", "LLM_MAX_RETRIES",
+    "LLM_BACKOFF_SECONDS", "LLM_BREAKER_FAILURES", "LLM_BREAKER_COOLDOWN_SECONDS",
+    "LLM_LEDGER_HISTORY", "LLM_LEDGER_HISTORY_RUNS", "LLM_PROMPT_WARN_TOKENS",
+}
+
+
+# --- HASHING ---
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def checkpoint_dir(state: Dict[str, Any]) -> str:
+    """Checkpoints live inside the run's output directory, next to the artifacts they describe."""
+    return os.path.join(config.get_option(state, "output_dir"), CHECKPOINT_SUBDIR)
+
+
+def file_content_hash(path: str, directory: str) -> str:
+    """
+    xxh3-128 of a file's bytes. The result is remembered in the checkpoint directory,
+    keyed by the file's size and mtime, so an unchanged multi-GB input is hashed once.
+    """
+    memo_path = os.path.join(directory, "input_hashes.json")
+    memo = _read_json(memo_path) or {}
+    abspath = os.path.abspath(path)
+    signature = list(_file_signature(path) or ())
+    entry = memo.get(abspath)
+    if entry and entry.get("signature") == signature:
+        return entry["hash"]
+
+    digest = xxhash.xxh3_128()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_BLOCK_BYTES)
+            if not block:
+                break
+            digest.update(block)
+    memo[abspath] = {"signature": signature, "hash": digest.hexdigest()}
+    _write_json(memo_path, memo)
+    return memo[abspath]["hash"]
+
+
+def _module_file(name: str) -> Optional[str]:
+    """
+    The source file of a project module. Looked up on disk rather than with
+    `importlib.util.find_spec`, which imports the parent of a dotted name (for
+    `from agents.artifacts import read_artifact`, all of agents.artifacts and pandas)
+    and would load every node's libraries while the graph is being built.
+    """
+    path = os.path.join(PROJECT_ROOT, *name.split("."))
+    for candidate in (path + ".py", os.path.join(path, "__init__.py")):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def _project_imports(name: str, source: str) -> List[str]:
+    """Project modules (agents.*, config, state) imported by a module's source."""
+    found = []
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            found.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            found.append(node.module)
+            # `from agents import llm_cache` imports a submodule.
+            found.extend(f"{node.module}.{alias.name}" for alias in node.names)
+    return [m for m in found if m in ("config", "state") or m.startswith("agents.")]
+
+
+@lru_cache(maxsize=None)
+def code_hash(module_name: str) -> str:
+    """
+    Hash of a node's module source plus every project module it imports, directly or
+    indirectly. Editing the report template only changes the hash of the stages whose
+    code imports it. Computed once per process: a running process executes the code it
+    imported, and `ast.parse` must not run on the graph's threads (CPython 3.11 can fail
+    when two threads parse at once, and nodes such as cleaning call `DataFrame.eval`).
+    """
+    digest = xxhash.xxh3_128()
+    seen = set()
+    pending = [module_name]
+    while pending:
+        name = pending.pop()
+        path = _module_file(name)
+        if name in seen or path is None:
+            continue
+        seen.add(name)
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+        digest.update(f"{name}\0{source}\0".encode("utf-8"))
+        pending.extend(sorted(_project_imports(name, source)))
+    return digest.hexdigest()
+
+
+def _settings() -> Dict[str, Any]:
+    """Pipeline settings from config.py that can change a stage's output."""
+    return {
+        name: value for name, value in vars(config).items()
+        if name.isupper() and not name.endswith("_WORKERS") and name not in NON_SEMANTIC_SETTINGS
+        and isinstance(value, (str, int, float, bool))
+    }
+
+
+def stage_key(stage: str, module_name: str, state: Dict[str, Any], upstream: List[str]) -> str:
+    """
+    Identifies the output of a stage: its code, the pipeline settings and run options,
+    and the keys of the stages it depends on. The first stage (no upstream) is keyed on
+    the content of the input file instead, so any change to the input, the code or the
+    settings marks that stage and everything downstream of it as stale.
+    """
+    run_config = {k: v for k, v in (state.get("run_config") or {}).items() if k not in NON_SEMANTIC_OPTIONS}
+    parts = {
+        "version": CHECKPOINT_VERSION,
+        "stage": stage,
+        "code": code_hash(module_name),
+        "settings": _settings(),
+        "run_config": run_config,
+        # Upstream stages publish keys that also cover the output they produced.
+        "upstream": {name: (state.get("stage_keys") or {}).get(name) for name in upstream},
+    }
+    if not upstream:
+        raw_data_path = state["raw_data_path"]
+        parts["input"] = {"path": raw_data_path, "hash": file_content_hash(raw_data_path, checkpoint_dir(state))}
+    return xxhash.xxh3_128(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+# --- STORAGE ---
+def _to_builtin(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, payload: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, default=_to_builtin)
+    os.replace(tmp_path, path)
+
+
+def _referenced_files(value: Any) -> Dict[str, List[int]]:
+    """Every existing file named anywhere in a node's output, with its size and mtime."""
+    files = {}
+    if isinstance(value, dict):
+        for item in value.values():
+            files.update(_referenced_files(item))
+    elif isinstance(value, list):
+        for item in value:
+            files.update(_referenced_files(item))
+    elif isinstance(value, str) and os.path.isfile(value):
+        files[value] = list(_file_signature(value))
+    return files
+
+
+def _output_key(key: str, update: Dict[str, Any]) -> str:
+    """
+    The key a stage publishes to the stages after it: its own key plus the output it
+    produced. A stage that re-runs and gives a different answer (e.g. a new AI plan)
+    therefore invalidates everything downstream, while an identical re-run does not.
+    """
+    payload = json.dumps(update, sort_keys=True, ensure_ascii=False, default=_to_builtin)
+    return xxhash.xxh3_128(f"{key}\0{payload}".encode("utf-8")).hexdigest()
+
+
+def load_checkpoint(directory: str, stage: str, key: str) -> Optional[Tuple[Dict[str, Any], str]]:
+    """
+    Returns a stage's saved output and published key if it was produced under `key`
+    and the files it names are untouched.
+    """
+    entry = _read_json(os.path.join(directory, f"{stage}.json"))
+    if not entry or entry.get("key") != key:
+        return None
+    for path, signature in entry.get("files", {}).items():
+        if list(_file_signature(path) or ()) != signature:
+            logger.debug(f"Checkpoint for '{stage}' is stale: {path} changed since it was written.")
+            return None
+    return entry["update"], entry["output_key"]
+
+
+def save_checkpoint(directory: str, stage: str, key: str, update: Dict[str, Any], output_key: str) -> None:
+    try:
+        _write_json(os.path.join(directory, f"{stage}.json"),
+                    {"key": key, "output_key": output_key, "update": update, "files": _referenced_files(update)})
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Could not save checkpoint for stage '{stage}': {e}")
+
+
+def refresh_file_signature(directory: str, path: str) -> None:
+    """
+    Records the current size and mtime of `path` in every checkpoint that names it. Used
+    when the pipeline itself amends a stage's output file after the stage has run.
+    """
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if not name.endswith(".json") or name == "input_hashes.json":
+            continue
+        entry_path = os.path.join(directory, name)
+        entry = _read_json(entry_path)
+        if entry and path in entry.get("files", {}):
+            entry["files"][path] = list(_file_signature(path) or ())
+            _write_json(entry_path, entry)
+
+
+def checkpointed(stage: str, node: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 upstream: List[str]) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Wraps a graph node so that its output is saved after it runs and replayed, without
+    running it, while its key still matches. `upstream` names the stages whose output
+    the node consumes.
+    """
+    # Hash the code now, on the thread building the graph (see `code_hash`).
+    code_hash(node.__module__)
+    def run(state: Dict[str, Any]) -> Dict[str, Any]:
+        key = stage_key(stage, node.__module__, state, upstream)
+        if config.get_option(state, "resume"):
+            restored = load_checkpoint(checkpoint_dir(state), stage, key)
+            if restored is not None:
+                update, output_key = restored
+                logger.info(f"    - Skipping: '{stage}' is unchanged since the last run (checkpoint {key[:12]}).")
+                tracing.annotate(checkpoint="reused")
+                return {**update, "stage_keys": {stage: output_key}}
+
+        update = node(state)
+        output_key = _output_key(key, update)
+        save_checkpoint(checkpoint_dir(state), stage, key, update, output_key)
+        return {**update, "stage_keys": {stage: output_key}}
+
+    run.__name__ = getattr(node, "__name__", stage)
+    return run
@@ -0,0 +1,470 @@
+import math
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from agents.artifacts import artifact_shape, iter_artifact_chunks, write_artifact_chunks
+from agents.cleaning import apply_step, prepare_step
+from agents.dedup import Deduplicator
+from agents.logger import logger
+from agents.plan_optimizer import ALL_COLUMNS, describe_step, step_effects
+
+# Out-of-core execution of a cleaning plan, for standardized files too big to clean in
+# memory. A step is row-local when each row's result depends on that row alone, and
+# global when it needs something of the whole column or frame: a fill statistic, the
+# scaler's range, the dtype pandas infers, or which rows are duplicates. Streaming
+# passes replay the plan chunk by chunk up to the global steps and gather their
+# parameters; a last pass transforms each chunk and appends it to the output. Memory
+# holds one chunk plus the statistics (16 bytes per row for de-duplication, spilled to
+# disk past DEDUP_MEMORY_MB).
+
+
+def is_global(step: Dict[str, Any], schema: List[str]) -> bool:
+    """True if the step's result for a row depends on the other rows."""
+    # fill_missing is global for every strategy: whether a constant upcasts the column
+    # (e.g. text into a float column) depends on whether the column has any gaps at all.
+    return step_effects(step, schema)["row_dependent"] or step.get("action") in ("remove_duplicates", "fill_missing")
+
+
+def _require_numeric(series: pd.Series) -> None:
+    if not pd.api.types.is_numeric_dtype(series.dtype):
+        raise TypeError(f"Could not convert column '{series.name}' of dtype {series.dtype} to numeric")
+
+
+# --- COLUMN STATISTICS ---
+class _Mean:
+    """`series.mean()` from partial sums; agrees with pandas to floating-point rounding."""
+
+    def __init__(self):
+        self.sums: List[float] = []
+        self.count = 0
+        self.resolved = False
+
+    def update(self, series: pd.Series) -> None:
+        _require_numeric(series)
+        self.sums.append(float(series.sum()))
+        self.count += int(series.count())
+
+    def end_pass(self) -> None:
+        self.resolved = True
+
+    def value(self) -> float:
+        return math.fsum(self.sums) / self.count if self.count else np.nan
+
+
+class _Median:
+    """
+    Exact `series.median()` in bounded memory. Values are mapped to unsigned keys that
+    sort like the floats, and each pass narrows the two middle ranks down to a 16-bit
+    prefix of the key until the values sharing it are few enough to keep and sort.
+    """
+
+    KEEP_VALUES = 1_000_000
+
+    def __init__(self):
+        self.count = 0
+        self.histogram = np.zeros(1 << 16, dtype=np.int64)
+        # Per middle rank: [rank within prefix, prefix, prefix bits, values kept, histogram, count]
+        self.targets: Optional[List[List[Any]]] = None
+        self.resolved = False
+        self.result = np.nan
+
+    @staticmethod
+    def _keys(series: pd.Series) -> np.ndarray:
+        _require_numeric(series)
+        bits = series.dropna().to_numpy(dtype="float64").view(np.uint64)
+        negative = (bits >> np.uint64(63)).astype(bool)
+        return np.where(negative, ~bits, bits | np.uint64(1 << 63))
+
+    @staticmethod
+    def _value(key: int) -> float:
+        bits = np.uint64(key)
+        bits = bits & ~np.uint64(1 << 63) if bits >> np.uint64(63) else ~bits
+        return float(np.array([bits], dtype=np.uint64).view(np.float64)[0])
+
+    def update(self, series: pd.Series) -> None:
+        keys = self._keys(series)
+        if self.targets is None:
+            self.count += len(keys)
+            self.histogram += np.bincount((keys >> np.uint64(48)).astype(np.int64), minlength=1 << 16)
+            return
+        for target in self.targets:
+            rank, prefix, bits, kept, histogram, _ = target
+            if kept is None and histogram is None:
+                continue
+            matches = keys[(keys >> np.uint64(64 - bits)) == np.uint64(prefix)] if bits else keys
+            if kept is not None:
+                kept.append(matches)
+            else:
+                histogram += np.bincount(((matches >> np.uint64(48 - bits)) & np.uint64(0xFFFF)).astype(np.int64),
+                                         minlength=1 << 16)
+
+    @staticmethod
+    def _narrow(target: List[Any], histogram: np.ndarray) -> None:
+        """Moves a target into the 16-bit bucket holding its rank."""
+        cumulative = np.cumsum(histogram)
+        bucket = int(np.searchsorted(cumulative, target[0], side="right"))
+        target[0] -= int(cumulative[bucket - 1]) if bucket else 0
+        target[1] = (target[1] << 16) | bucket
+        target[2] += 16
+        target[5] = int(histogram[bucket])
+
+    def end_pass(self) -> None:
+        if self.targets is None:
+            if self.count == 0:
+                self.resolved = True
+                return
+            ranks = sorted({(self.count - 1) // 2, self.count // 2})
+            self.targets = [[rank, 0, 0, None, None, self.count] for rank in ranks]
+            for target in self.targets:
+                self._narrow(target, self.histogram)
+            self.histogram = None
+        else:
+            for target in self.targets:
+                rank, prefix, bits, kept, histogram, _ = target
+                if kept is not None:
+                    target[1] = int(np.sort(np.concatenate(kept))[rank])
+                    target[2], target[3] = 64, None
+                elif histogram is not None:
+                    target[4] = None
+                    self._narrow(target, histogram)
+
+        for target in self.targets:
+            if target[2] >= 64:
+                continue
+            # Keep the values once few enough share the prefix; otherwise count the next 16 bits.
+            if target[5] <= self.KEEP_VALUES:
+                target[3] = []
+            else:
+                target[4] = np.zeros(1 << 16, dtype=np.int64)
+        if all(target[2] >= 64 for target in self.targets):
+            middle = [self._value(target[1]) for target in self.targets]
+            # np.median averages the one or two middle values the same way.
+            self.result = float(np.mean(np.array(middle, dtype="float64")))
+            self.resolved = True
+
+    def value(self) -> float:
+        return self.result
+
+
+class _Mode:
+    """Exact `series.mode()[0]` from merged value counts."""
+
+    def __init__(self):
+        self.counts: Dict[Any, int] = {}
+        self.dtype = None
+        self.resolved = False
+
+    def update(self, series: pd.Series) -> None:
+        self.dtype = series.dtype
+        counts = series.value_counts(dropna=True)
+        for value, count in zip(counts.index, counts.to_numpy()):
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+
+    def end_pass(self) -> None:
+        self.resolved = True
+
+    def value(self) -> Any:
+        if not self.counts:
+            raise KeyError(0)
+        top = max(self.counts.values())
+        # pandas returns every most frequent value, sorted; the first one is used.
+        return pd.Series([v for v, c in self.counts.items() if c == top], dtype=self.dtype).mode()[0]
+
+
+# --- GLOBAL STEPS ---
+class _GlobalStep:
+    """Parameters of one global step, gathered chunk by chunk, and the transform that uses them."""
+
+    def __init__(self, step: Dict[str, Any]):
+        self.step = step
+        self.details = step.get("details") or {}
+        self.column = step.get("column") or self.details.get("column")
+        self.resolved = False
+        self.error: Optional[Exception] = None
+        self.warning: Optional[str] = None
+
+    def start_pass(self) -> None:
+        pass
+
+    def update(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def end_pass(self) -> None:
+        self.resolved = True
+
+    def fail(self, error: Exception) -> None:
+        self.error, self.resolved = error, True
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        raise NotImplementedError
+
+
+class _FillMissing(_GlobalStep):
+    def __init__(self, step: Dict[str, Any]):
+        super().__init__(step)
+        strategy = self.details.get("strategy")
+        self.statistic = {"mean": _Mean, "median": _Median, "mode": _Mode}.get(strategy, lambda: None)()
+        self.fill_value = self.details.get("fill_value", 0)
+        self.has_missing = False
+        self.upcast = False
+
+    def update(self, df: pd.DataFrame) -> None:
+        series = df[self.column]
+        self.has_missing = self.has_missing or bool(series.isna().any())
+        if self.statistic is not None:
+            self.statistic.update(series)
+
+    def end_pass(self) -> None:
+        if self.statistic is None:
+            self.resolved = True
+            return
+        self.statistic.end_pass()
+        if self.statistic.resolved:
+            try:
+                self.fill_value = self.statistic.value()
+                self.resolved = True
+            except Exception as e:
+                self.fail(e)
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        series = df[self.column]
+        if self.has_missing and series.dtype.kind == "f":
+            # Filling the whole column upcasts it (e.g. to object for a text value), so
+            # chunks with nothing to fill are upcast too.
+            target = pd.Series([np.nan], dtype=series.dtype).fillna(self.fill_value).dtype
+            self.upcast = target == object
+            if target != series.dtype:
+                series = series.astype(target)
+        # fillna on a chunk with no gaps would turn an upcast object column back into floats.
+        df[self.column] = series.fillna(self.fill_value) if series.isna().any() else series
+        return df
+
+
+class _ScaleNumeric(_GlobalStep):
+    def __init__(self, step: Dict[str, Any]):
+        super().__init__(step)
+        strategy = self.details.get("strategy")
+        from sklearn.preprocessing import MinMaxScaler, StandardScaler
+        self.scaler = {"min_max": MinMaxScaler, "standard": StandardScaler}.get(strategy, lambda: None)()
+        self.samples = 0
+        self.dtype = None
+        if self.scaler is None:
+            self.warning = f"Unknown scaling strategy '{strategy}'. Skipping."
+
+    def update(self, df: pd.DataFrame) -> None:
+        numeric = pd.to_numeric(df[self.column], errors='coerce')
+        self.dtype = numeric.dtype if self.dtype is None else np.result_type(self.dtype, numeric.dtype)
+        col_data = numeric.to_frame().dropna()
+        if self.scaler is not None and len(col_data):
+            self.scaler.partial_fit(col_data)
+        self.samples += len(col_data)
+
+    def end_pass(self) -> None:
+        self.resolved = True
+        if not self.samples:
+            self.warning = f"Column '{self.column}' contains no valid data to scale. Skipping scaling step."
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        df[self.column] = pd.to_numeric(df[self.column], errors='coerce').astype(self.dtype)
+        if self.scaler is None or not self.samples:
+            return df
+        df[self.column] = df[self.column].astype(float)
+        col_data = df[[self.column]].dropna()
+        if len(col_data):
+            df.loc[col_data.index, self.column] = self.scaler.transform(col_data)
+        return df
+
+
+class _ConvertType(_GlobalStep):
+    """convert_type without a final cast: the dtype is whatever parsing the whole column gives."""
+
+    def __init__(self, step: Dict[str, Any]):
+        super().__init__(step)
+        self.dtype = None
+
+    def update(self, df: pd.DataFrame) -> None:
+        converted = apply_step(df[[self.column]].copy(), self.step)[self.column]
+        self.dtype = converted.dtype if self.dtype is None else np.result_type(self.dtype, converted.dtype)
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = apply_step(df, self.step)
+        if self.dtype is not None and df[self.column].dtype != self.dtype:
+            df[self.column] = df[self.column].astype(self.dtype)
+        return df
+
+
+class _RemoveDuplicates(_GlobalStep):
+    """Keeps the first of each set of equal rows, found from 128-bit row fingerprints (see `agents.dedup`)."""
+
+    def __init__(self, step: Dict[str, Any]):
+        super().__init__(step)
+        self.dedup = Deduplicator(self.details.get("subset"))
+        self.removed = 0
+        self.offset = 0
+
+    def start_pass(self) -> None:
+        self.offset = 0
+
+    def update(self, df: pd.DataFrame) -> None:
+        self.dedup.add(df)
+
+    def fail(self, error: Exception) -> None:
+        self.dedup.discard()
+        super().fail(error)
+
+    def end_pass(self) -> None:
+        self.removed = self.dedup.finish()
+        self.resolved = True
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        keep = self.dedup.keep(self.offset, len(df))
+        self.offset += len(df)
+        return df[keep]
+
+
+def _global_step(step: Dict[str, Any]) -> _GlobalStep:
+    action = step.get("action")
+    if action == "fill_missing":
+        return _FillMissing(step)
+    if action == "scale_numeric":
+        return _ScaleNumeric(step)
+    if action == "convert_type":
+        return _ConvertType(step)
+    return _RemoveDuplicates(step)
+
+
+# --- PASSES ---
+def _schemas(steps: List[Dict[str, Any]], columns: List[str]) -> List[List[str]]:
+    schemas, schema = [], list(columns)
+    for step in steps:
+        schemas.append(schema)
+        effects = step_effects(step, schema)
+        schema = [c for c in schema if c not in effects["drops"]] + sorted(effects["creates"])
+    return schemas
+
+
+def _plan_pass(steps: List[Dict[str, Any]], schemas: List[List[str]], pending: Set[int]):
+    """
+    Which pending global steps can gather their parameters in the next pass, and which
+    steps must run to feed them. A pending step's output is unknown until it resolves,
+    so it taints the columns it writes (every column, for a row filter); steps reading
+    tainted columns are skipped and taint their own outputs.
+    """
+    collect, run = set(), set()
+    tainted, all_tainted = set(), False
+    for i, step in enumerate(steps):
+        effects = step_effects(step, schemas[i])
+        touched = effects["reads"] | effects["writes"] | effects["drops"]
+        clean = not all_tainted and not (touched & tainted) and not (ALL_COLUMNS in touched and tainted)
+        if i in pending:
+            if clean:
+                collect.add(i)
+            tainted |= effects["writes"]
+            all_tainted = all_tainted or effects["filters_rows"]
+        elif clean:
+            run.add(i)
+        else:
+            tainted |= effects["writes"]
+            all_tainted = all_tainted or effects["filters_rows"]
+    last = max(collect)
+    return collect, {i for i in run if i < last}, last
+
+
+def clean_in_chunks(input_path: str, plan: Dict[str, Any], output_path: str, csv_path: Optional[str],
+                    chunk_rows: int, lineage: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+    """
+    Executes the cleaning plan on a Feather or Parquet artifact chunk by chunk and writes
+    the result to `output_path` (and `csv_path`), with the same result as `execute_plan`
+    on the whole frame. Means and standard deviations are summed per chunk, so they can
+    differ from pandas in the last bits. Fills `lineage` like `execute_plan` and returns
+    the input and output row counts and the number of passes over the input.
+    """
+    columns, rows_in = artifact_shape(input_path)
+    steps = plan.get("steps")
+    if not isinstance(steps, list):
+        logger.warning("Cleaning plan is malformed. Skipping cleaning.")
+        steps = []
+    schemas = _schemas(steps, columns)
+    global_steps = {i: _global_step(step) for i, step in enumerate(steps) if is_global(step, schemas[i])}
+
+    passes = 0
+    while pending := {i for i, g in global_steps.items() if not g.resolved}:
+        collect, run, last = _plan_pass(steps, schemas, pending)
+        passes += 1
+        logger.debug(f"Chunked cleaning pass {passes}: gathering {[describe_step(steps[i]) for i in sorted(collect)]}.")
+        for g in global_steps.values():
+            g.start_pass()
+        for df in iter_artifact_chunks(input_path, chunk_rows):
+            for i in range(last + 1):
+                if i not in run and i not in collect:
+                    continue
+                step, g = steps[i], global_steps.get(i)
+                prepare_step(df, step, step_effects(step, list(df.columns)))
+                try:
+                    if i in collect:
+                        if not g.resolved:
+                            g.update(df)
+                    elif g is not None:
+                        df = g.apply(df)
+                    else:
+                        df = apply_step(df, step)
+                except Exception as e:
+                    if i in collect:
+                        g.fail(e)
+        for i in collect:
+            if not global_steps[i].resolved:
+                global_steps[i].end_pass()
+
+    for g in global_steps.values():
+        g.start_pass()
+        if g.warning:
+            logger.warning(g.warning)
+
+    errors: Dict[int, List[Any]] = {}
+    effects_log: List[Dict[str, Any]] = []
+    # Object columns a fill turned into numbers plus text are stored as text in every
+    # chunk, as `write_artifact` does for the whole column.
+    text_columns: Set[str] = set()
+    final_columns, chunks = list(columns), 0
+
+    def transformed():
+        nonlocal final_columns, chunks
+        for chunk_index, df in enumerate(iter_artifact_chunks(input_path, chunk_rows)):
+            for i, step in enumerate(steps):
+                effects = step_effects(step, list(df.columns))
+                if chunk_index == 0:
+                    effects_log.append(effects)
+                prepare_step(df, step, effects)
+                g = global_steps.get(i)
+                try:
+                    if g is not None and g.error is not None:
+                        raise g.error
+                    df = g.apply(df) if g is not None else apply_step(df, step)
+                except Exception as e:
+                    errors.setdefault(i, [e, 0])[1] += 1
+                if isinstance(g, _FillMissing) and g.upcast:
+                    text_columns.add(g.column)
+            final_columns, chunks = list(df.columns), chunks + 1
+            yield df
+
+    rows_out = write_artifact_chunks(transformed(), output_path, csv_path, text_columns=text_columns)
+    passes += 1
+
+    for i, (error, count) in sorted(errors.items()):
+        partial = f" (in {count} chunks only; the result differs from cleaning in memory)" if count < chunks else ""
+        logger.error(f"Could not execute step {steps[i]}. Error: {error}{partial}")
+
+    if lineage is not None:
+        modified = set().union(*(e["writes"] for e in effects_log))
+        dropped = set().union(*(e["drops"] for e in effects_log))
+        lineage.update(
+            modified=sorted(c for c in modified if c in final_columns),
+            dropped=sorted(c for c in dropped if c not in final_columns),
+            rows_changed=rows_out != rows_in,
+            columns=final_columns,
+            duplicates_removed=sum(g.removed for g in global_steps.values()
+                                   if isinstance(g, _RemoveDuplicates) and g.error is None),
+        )
+    return {"rows_in": rows_in, "rows_out": rows_out, "passes": passes}
@@ -1,14 +1,96 @@
+import os
+import numpy as np
 import pandas as pd
 import re
 import string
-from typing import Dict, Any
-
-# --- START: NEW IMPORTS FOR ML PREPROCESSING ---
-from sklearn.preprocessing import MinMaxScaler, StandardScaler
-# --- END: NEW IMPORTS ---
+from typing import Dict, Any, List, Optional
 
+import config
 from state import GraphState
+from agents import tracing
 from agents.logger import logger
+from agents.dedup import drop_duplicate_rows
+from agents.dtypes import expand, is_compact
+from agents.engines import polars_step, resolve_engine
+from agents.plan_optimizer import ALL_COLUMNS, optimize_plan, step_effects
+from agents.artifacts import artifact_format, artifact_path, artifact_shape, read_artifact, release_artifact, write_artifact
+
+# --- VECTORIZED KERNELS ---
+def _is_text(series: pd.Series) -> bool:
+    """True for non-categorical columns holding only strings (plus missing values)."""
+    # Categoricals are left out: pandas already maps them once per category.
+    if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+        return pd.api.types.infer_dtype(series, skipna=True) == "string"
+    return False
+
+
+def _map_distinct(series: pd.Series, func) -> pd.Series:
+    """
+    Same result as `series.apply(func)` for a per-value function returning one scalar
+    type, but calls `func` once per distinct value and broadcasts with numpy. Only
+    text columns take this path: elsewhere pandas treats values as equal that `str()`
+    renders differently (0.0 and -0.0, or 1 and True in an object column).
+    """
+    if series.empty or not _is_text(series):
+        return series.apply(func)
+    codes, uniques = pd.factorize(series)
+    if len(uniques) == 0:
+        return series.apply(func)
+    lookup = np.asarray([func(value) for value in uniques])
+    result = pd.Series(lookup[codes], index=series.index, name=series.name)
+    # factorize folds None and NaN together, but str() tells them apart.
+    missing = codes == -1
+    if missing.any():
+        result[missing] = series[missing].apply(func)
+    return result
+
+
+def _to_numeric(series: pd.Series, pre_processing: List[str]) -> pd.Series:
+    """
+    Strips currency signs, thousands separators and bracketed notes from the text of
+    each value and parses it as a number, coercing failures to NaN. Text columns are
+    processed once per distinct value; int64/float64 columns round-trip through `str`
+    unchanged, so they skip the text stage entirely.
+    """
+    if not series.empty and series.dtype in (np.dtype("int64"), np.dtype("float64")):
+        return pd.to_numeric(series, errors='coerce')
+
+    def strip(text: pd.Series) -> pd.Series:
+        if "remove_currency" in pre_processing:
+            text = text.str.replace('$', '', regex=False)
+        if "remove_commas" in pre_processing:
+            text = text.str.replace(',', '', regex=False)
+        if "remove_brackets" in pre_processing:
+            text = text.str.replace(r'\[.*?\]', '', regex=True)
+        return text
+
+    if series.empty or not _is_text(series):
+        return pd.to_numeric(strip(series.astype(str)), errors='coerce')
+    # Missing values all parse to NaN whatever their text ('nan', 'None'), so they can share a code.
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    distinct = pd.Series(np.asarray(uniques, dtype=object), dtype=object).astype(str)
+    parsed = pd.to_numeric(strip(distinct), errors='coerce').to_numpy()
+    return pd.Series(parsed[codes], index=series.index, name=series.name)
+# --- END: VECTORIZED KERNELS ---
+
+# Steps that only compare values, so they give the same result on compacted columns.
+COMPACT_SAFE_ACTIONS = {"remove_duplicates", "remove_column", "clean_categorical"}
+
+
+def _expand_columns(df: pd.DataFrame, columns) -> None:
+    """Returns compacted columns (categories, Arrow strings, small ints) to their plain dtypes."""
+    for col in columns:
+        if col != ALL_COLUMNS and col in df.columns and not df.columns.duplicated().any():
+            if is_compact(df[col]):
+                df[col] = expand(df[col])
+
+
+def prepare_step(df: pd.DataFrame, step: Dict[str, Any], effects: Dict[str, Any]) -> None:
+    """Expands the compacted columns a step touches, unless it gives the same result on them."""
+    # Transformations run on the plain dtypes, so compaction never changes their result.
+    if step.get("action") not in COMPACT_SAFE_ACTIONS:
+        _expand_columns(df, effects["reads"] | effects["writes"])
+
 
 # --- HELPER FUNCTION LIBRARY (POWER TOOLS) ---
 def _calculate_year_span(series: pd.Series) -> pd.Series:
@@ -36,23 +118,154 @@ def _calculate_year_span(series: pd.Series) -> pd.Series:
         elif s.isdigit() and len(s) == 4:
             return 1
         return 1
-    return series.apply(span_from_string)
+    return _map_distinct(series, span_from_string)
 # --- END: HELPER FUNCTION LIBRARY ---
 
 
-def execute_plan(df: pd.DataFrame, plan: Dict[str, Any]) -> pd.DataFrame:
-    """Dynamically executes the steps from the AI-generated cleaning plan."""
-    df_cleaned = df.copy()
-    
-    custom_functions = {
-        "calculate_year_span": _calculate_year_span
-    }
+CUSTOM_FUNCTIONS = {
+    "calculate_year_span": _calculate_year_span
+}
+
+
+def apply_step(df_cleaned: pd.DataFrame, step: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Runs one plan step on the frame (in place where possible) and returns the result.
+    Errors propagate, so callers decide how a failed step is reported.
+    """
+    action = step.get("action")
+    details = step.get("details", {})
+    column = step.get("column") or details.get("column")
+
+    if action == "remove_duplicates":
+        df_cleaned, _ = drop_duplicate_rows(df_cleaned, details.get("subset"))
+
+    elif action == "remove_column" and column:
+        df_cleaned.drop(columns=[column], inplace=True)
+
+    elif action == "clean_text" and column:
+        temp_col = df_cleaned[column].astype(str).fillna('')
+        operations = details.get("operations", [])
+        if "lowercase" in operations:
+            temp_col = temp_col.str.lower()
+        if "remove_punctuation" in operations:
+            temp_col = temp_col.str.replace(f'[{re.escape(string.punctuation)}]', '', regex=True)
+        if "remove_digits" in operations:
+            temp_col = temp_col.str.replace(r'\d+', '', regex=True)
+        if "remove_non_ascii" in operations:
+            temp_col = temp_col.str.encode('ascii', 'ignore').str.decode('ascii')
+        df_cleaned[column] = temp_col
+
+    elif action == "clean_categorical" and column:
+        valid_values = details.get("valid_values", [])
+        if valid_values:
+            df_cleaned = df_cleaned[df_cleaned[column].isin(valid_values)]
+
+    elif action == "encode_binary" and column:
+        positive_value = details.get("positive_value")
+        if positive_value:
+            positive = str(positive_value).lower()
+            df_cleaned[column] = _map_distinct(df_cleaned[column], lambda x: 1 if str(x).lower() == positive else 0)
+            logger.debug(f"Binary encoded column '{column}' with '{positive_value}' as 1.")
+
+    elif action == "scale_numeric" and column:
+        strategy = details.get("strategy")
+        df_cleaned[column] = pd.to_numeric(df_cleaned[column], errors='coerce')
+
+        col_data = df_cleaned[[column]].dropna()
+
+        if col_data.empty:
+            logger.warning(f"Column '{column}' contains no valid data to scale. Skipping scaling step.")
+            return df_cleaned
+
+        # sklearn takes most of a second to import, so only runs that scale pay for it.
+        from sklearn.preprocessing import MinMaxScaler, StandardScaler
+        if strategy == "min_max":
+            scaler = MinMaxScaler()
+        elif strategy == "standard":
+            scaler = StandardScaler()
+        else:
+            logger.warning(f"Unknown scaling strategy '{strategy}'. Skipping.")
+            return df_cleaned
+
+        # --- START: FINAL FIX for FutureWarning ---
+        # Ensure the column is float type *before* assigning scaled float values.
+        df_cleaned[column] = df_cleaned[column].astype(float)
+        # --- END: FINAL FIX ---
+
+        scaled_data = scaler.fit_transform(col_data)
+        df_cleaned.loc[col_data.index, column] = scaled_data
+        logger.debug(f"Applied '{strategy}' scaling to column '{column}'.")
+
+    elif action == "convert_type" and column:
+        new_type = details.get("new_type")
+        pre_processing_steps = details.get("pre_processing", [])
+        df_cleaned[column] = _to_numeric(df_cleaned[column], pre_processing_steps)
+        if df_cleaned[column].isnull().any():
+            df_cleaned[column] = df_cleaned[column].fillna(0)
+        if new_type in ['int64', 'float64']:
+            df_cleaned[column] = df_cleaned[column].astype(new_type)
+
+    elif action == "fill_missing" and column:
+        strategy = details.get("strategy")
+        fill_value = 0
+        if strategy == "mean":
+            fill_value = df_cleaned[column].mean()
+        elif strategy == "median":
+            fill_value = df_cleaned[column].median()
+        elif strategy == "mode":
+            fill_value = df_cleaned[column].mode()[0]
+        else:
+            fill_value = details.get("fill_value", 0)
+        df_cleaned[column] = df_cleaned[column].fillna(fill_value)
+
+    elif action == "create_feature":
+        new_col = details.get("new_column_name")
+        expression = details.get("expression")
+        if new_col and expression:
+            df_cleaned[new_col] = df_cleaned.eval(expression)
+
+    elif action == "execute_custom_function" and column:
+        func_name = details.get("function_name")
+        source_col = details.get("source_column")
+        if func_name in CUSTOM_FUNCTIONS and source_col in df_cleaned.columns:
+            func_to_run = CUSTOM_FUNCTIONS[func_name]
+            df_cleaned[column] = func_to_run(df_cleaned[source_col])
+            logger.debug(f"Successfully executed custom function '{func_name}'.")
+        else:
+            logger.warning(f"Custom function '{func_name}' not found in library or source column not found.")
+
+    return df_cleaned
+
+
+def execute_plan(df: pd.DataFrame, plan: Dict[str, Any], inplace: bool = False,
+                 lineage: Optional[Dict[str, Any]] = None, engine: str = "pandas") -> pd.DataFrame:
+    """
+    Dynamically executes the steps from the AI-generated cleaning plan.
+    With `inplace=True` the steps run on `df` itself, for callers that own the frame;
+    always use the returned frame, since row filters produce a new object.
+    If a `lineage` dict is given, it is filled with what the plan changed: the columns
+    written or created, the columns dropped, whether any rows were removed, the final
+    columns (see `agents.profiler.derive_profile`) and how many duplicate rows were removed.
+    With `engine="polars"`, the steps Polars can run are computed there (see `agents.engines`).
+    """
+    # Under Copy-on-Write (on while the pipeline runs) a shallow copy is enough to keep
+    # the caller's frame untouched: only the columns a step modifies get copied.
+    df_cleaned = df if inplace else df.copy(deep=not pd.get_option("mode.copy_on_write"))
     
+    modified, dropped, rows_changed, duplicates = set(), set(), False, 0
+    if lineage is not None:
+        lineage.update(modified=[], dropped=[], rows_changed=False, columns=list(df_cleaned.columns),
+                       duplicates_removed=0)
+
     if "steps" not in plan or not isinstance(plan["steps"], list):
         logger.warning("Cleaning plan is malformed. Skipping cleaning.")
         return df_cleaned
         
     for step in plan["steps"]:
+        # What the step may touch, judged before it runs; a failed step counts as having run.
+        effects = step_effects(step, list(df_cleaned.columns))
+        rows_before = len(df_cleaned)
+        prepare_step(df_cleaned, step, effects)
         action = step.get("action")
         details = step.get("details", {})
         column = step.get("column") or details.get("column")
@@ -61,133 +274,119 @@ def execute_plan(df: pd.DataFrame, plan: Dict[str, Any]) -> pd.DataFrame:
         logger.debug(f"Action: {action}, Column: '{column or 'all'}', Reason: {reason}")
         
         try:
-            if action == "remove_duplicates":
-                df_cleaned.drop_duplicates(inplace=True)
-            
-            elif action == "remove_column" and column:
-                df_cleaned.drop(columns=[column], inplace=True)
-            
-            elif action == "clean_text" and column:
-                temp_col = df_cleaned[column].astype(str).fillna('')
-                operations = details.get("operations", [])
-                if "lowercase" in operations:
-                    temp_col = temp_col.str.lower()
-                if "remove_punctuation" in operations:
-                    temp_col = temp_col.str.replace(f'[{re.escape(string.punctuation)}]', '', regex=True)
-                if "remove_digits" in operations:
-                    temp_col = temp_col.str.replace(r'\d+', '', regex=True)
-                if "remove_non_ascii" in operations:
-                    temp_col = temp_col.str.encode('ascii', 'ignore').str.decode('ascii')
-                df_cleaned[column] = temp_col
-
-            elif action == "clean_categorical" and column:
-                valid_values = details.get("valid_values", [])
-                if valid_values:
-                    df_cleaned = df_cleaned[df_cleaned[column].isin(valid_values)]
-
-            elif action == "encode_binary" and column:
-                positive_value = details.get("positive_value")
-                if positive_value:
-                    df_cleaned[column] = df_cleaned[column].apply(lambda x: 1 if str(x).lower() == str(positive_value).lower() else 0)
-                    logger.debug(f"Binary encoded column '{column}' with '{positive_value}' as 1.")
-
-            elif action == "scale_numeric" and column:
-                strategy = details.get("strategy")
-                df_cleaned[column] = pd.to_numeric(df_cleaned[column], errors='coerce')
-                
-                col_data = df_cleaned[[column]].dropna()
-                
-                if col_data.empty:
-                    logger.warning(f"Column '{column}' contains no valid data to scale. Skipping scaling step.")
-                    continue
-                
-                if strategy == "min_max":
-                    scaler = MinMaxScaler()
-                elif strategy == "standard":
-                    scaler = StandardScaler()
-                else:
-                    logger.warning(f"Unknown scaling strategy '{strategy}'. Skipping.")
-                    continue
-                
-                # --- START: FINAL FIX for FutureWarning ---
-                # Ensure the column is float type *before* assigning scaled float values.
-                df_cleaned[column] = df_cleaned[column].astype(float)
-                # --- END: FINAL FIX ---
-
-                scaled_data = scaler.fit_transform(col_data)
-                df_cleaned.loc[col_data.index, column] = scaled_data
-                logger.debug(f"Applied '{strategy}' scaling to column '{column}'.")
-
-            elif action == "convert_type" and column:
-                new_type = details.get("new_type")
-                pre_processing_steps = details.get("pre_processing", [])
-                temp_col = df_cleaned[column].astype(str)
-                if "remove_currency" in pre_processing_steps:
-                    temp_col = temp_col.str.replace('$', '', regex=False)
-                if "remove_commas" in pre_processing_steps:
-                    temp_col = temp_col.str.replace(',', '', regex=False)
-                if "remove_brackets" in pre_processing_steps:
-                    temp_col = temp_col.str.replace(r'\[.*?\]', '', regex=True)
-                df_cleaned[column] = pd.to_numeric(temp_col, errors='coerce')
-                if df_cleaned[column].isnull().any():
-                    df_cleaned[column] = df_cleaned[column].fillna(0)
-                if new_type in ['int64', 'float64']:
-                    df_cleaned = df_cleaned.astype({column: new_type})
-            
-            elif action == "fill_missing" and column:
-                strategy = details.get("strategy")
-                fill_value = 0
-                if strategy == "mean":
-                    fill_value = df_cleaned[column].mean()
-                elif strategy == "median":
-                    fill_value = df_cleaned[column].median()
-                elif strategy == "mode":
-                    fill_value = df_cleaned[column].mode()[0]
-                else:
-                    fill_value = details.get("fill_value", 0)
-                df_cleaned[column] = df_cleaned[column].fillna(fill_value)
-            
-            elif action == "create_feature":
-                new_col = details.get("new_column_name")
-                expression = details.get("expression")
-                if new_col and expression:
-                    df_cleaned[new_col] = df_cleaned.eval(expression)
-            
-            elif action == "execute_custom_function" and column:
-                func_name = details.get("function_name")
-                source_col = details.get("source_column")
-                if func_name in custom_functions and source_col in df_cleaned.columns:
-                    func_to_run = custom_functions[func_name]
-                    df_cleaned[column] = func_to_run(df_cleaned[source_col])
-                    logger.debug(f"Successfully executed custom function '{func_name}'.")
-                else:
-                    logger.warning(f"Custom function '{func_name}' not found in library or source column not found.")
-
+            result = polars_step(df_cleaned, step) if engine == "polars" else None
+            df_cleaned = result if result is not None else apply_step(df_cleaned, step)
         except Exception as e:
             logger.error(f"Could not execute step {step}. Error: {e}", exc_info=True)
-            
+
+        if lineage is not None:
+            modified |= effects["writes"]
+            dropped |= effects["drops"]
+            # A filter that removed nothing leaves every column's statistics as they were.
+            rows_changed = rows_changed or len(df_cleaned) != rows_before
+            if action == "remove_duplicates":
+                duplicates += rows_before - len(df_cleaned)
+
+    if lineage is not None:
+        columns = list(df_cleaned.columns)
+        lineage.update(
+            modified=sorted(c for c in modified if c in columns),
+            dropped=sorted(c for c in dropped if c not in columns),
+            rows_changed=rows_changed,
+            columns=columns,
+            duplicates_removed=duplicates,
+        )
     return df_cleaned
 
+def _cleans_in_chunks(standardized_data_path: str) -> bool:
+    """Columnar artifacts at or above CHUNKED_CLEANING_MB and longer than one chunk are cleaned out of core."""
+    if artifact_format(standardized_data_path) == "csv":
+        return False
+    if os.path.getsize(standardized_data_path) < config.CHUNKED_CLEANING_MB * 1024 * 1024:
+        return False
+    return artifact_shape(standardized_data_path)[1] > config.CLEAN_CHUNK_ROWS
+
+
+def _duplicates_message(plan: Dict[str, Any], lineage: Dict[str, Any]) -> List[str]:
+    """The run report's line on de-duplication, if the plan removes duplicates."""
+    if not any(step.get("action") == "remove_duplicates" for step in plan.get("steps", [])):
+        return []
+    removed = lineage.get("duplicates_removed", 0)
+    return [f"Removed {removed:,} duplicate row{'s' if removed != 1 else ''}."]
+
+
 def cleaning_node(state: GraphState) -> Dict[str, Any]:
     """Loads data and executes the AI-generated cleaning and preprocessing plan."""
     logger.info("    - Executing: Dynamic Cleaning & Preprocessing Node")
     standardized_data_path = state['standardized_data_path']
     plan = state['cleaning_plan']
+    output_dir = config.get_option(state, "output_dir")
+    cleaned_data_path = artifact_path(os.path.join(output_dir, "2_cleaned_data"), config.get_option(state, "artifact_format"))
+    export_csv = artifact_format(cleaned_data_path) != "csv" and config.get_option(state, "export_csv")
+
+    if _cleans_in_chunks(standardized_data_path):
+        # Imported here: the chunked executor builds on this module's step functions.
+        from agents.chunked_cleaning import clean_in_chunks
+
+        columns, rows_in = artifact_shape(standardized_data_path)
+        tracing.annotate(rows_in=rows_in, bytes_in=os.path.getsize(standardized_data_path))
+        rewrites = []
+        if config.OPTIMIZE_PLAN:
+            plan, rewrites = optimize_plan(plan, columns)
+        # The frame from ingestion is not needed: every pass streams from the file.
+        release_artifact(standardized_data_path)
+        lineage = {}
+        cleaned_csv_path = os.path.join(output_dir, "2_cleaned_data.csv") if export_csv else None
+        counts = clean_in_chunks(standardized_data_path, plan, cleaned_data_path, cleaned_csv_path,
+                                 config.CLEAN_CHUNK_ROWS, lineage)
+        tracing.annotate(rows_out=counts["rows_out"], bytes_out=os.path.getsize(cleaned_data_path), passes=counts["passes"])
+        if artifact_format(cleaned_data_path) == "csv":
+            cleaned_csv_path = cleaned_data_path
+        return {
+            "cleaned_data_path": cleaned_data_path,
+            "cleaned_csv_path": cleaned_csv_path,
+            "optimized_plan": {"steps": plan.get("steps", []), "rewrites": rewrites},
+            "cleaning_lineage": lineage,
+            "log_messages": [
+                f"Plan optimizer applied {len(rewrites)} rewrites.",
+                f"Cleaned {rows_in:,} rows out of core, {config.CLEAN_CHUNK_ROWS:,} at a time, in {counts['passes']} pass{'es' if counts['passes'] != 1 else ''} over the data.",
+                *_duplicates_message(plan, lineage),
+                "Dynamic preprocessing complete.",
+            ]
+        }
 
-    try:
-        df = pd.read_csv(standardized_data_path, encoding='utf-8')
-    except UnicodeDecodeError:
-        df = pd.read_csv(standardized_data_path, encoding='latin-1')
+    df = read_artifact(standardized_data_path)
     
     logger.debug(f"Loaded {standardized_data_path}.")
+    tracing.annotate(rows_in=len(df), bytes_in=os.path.getsize(standardized_data_path))
     
-    cleaned_df = execute_plan(df, plan)
+    # Reorder and prune the AI's steps before running them on the full data.
+    rewrites = []
+    if config.OPTIMIZE_PLAN:
+        plan, rewrites = optimize_plan(plan, list(df.columns))
+    optimized_plan = {"steps": plan.get("steps", []), "rewrites": rewrites}
 
-    cleaned_data_path = "outputs/2_cleaned_data.csv"
-    cleaned_df.to_csv(cleaned_data_path, index=False)
+    lineage = {}
+    engine = resolve_engine(config.get_option(state, "engine"))
+    cleaned_df = execute_plan(df, plan, inplace=True, lineage=lineage, engine=engine)
+    # No later node reads the standardized data, so free its in-memory copy.
+    del df
+    release_artifact(standardized_data_path)
+
+    write_artifact(cleaned_df, cleaned_data_path)
     logger.debug(f"Saved preprocessed data to {cleaned_data_path}")
+    tracing.annotate(rows_out=len(cleaned_df), bytes_out=os.path.getsize(cleaned_data_path))
+
+    # The CSV copy is the final deliverable; downstream nodes keep using the typed artifact.
+    cleaned_csv_path = cleaned_data_path if artifact_format(cleaned_data_path) == "csv" else None
+    if export_csv:
+        cleaned_csv_path = write_artifact(cleaned_df, os.path.join(output_dir, "2_cleaned_data.csv"), keep_in_memory=False)
 
     return {
         "cleaned_data_path": cleaned_data_path,
-        "log_messages": state.get('log_messages', []) + ["Dynamic preprocessing complete."]
-    }
\ No newline at end of file
+        "cleaned_csv_path": cleaned_csv_path,
+        "optimized_plan": optimized_plan,
+        "cleaning_lineage": lineage,
+        "log_messages": [f"Plan optimizer applied {len(rewrites)} rewrites.", *_duplicates_message(plan, lineage),
+                         "Dynamic preprocessing complete."]
+    }
@@ -0,0 +1,311 @@
+import numbers
+import os
+import shutil
+import tempfile
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+import config
+from agents.logger import logger
+
+# Duplicate rows are found from a 128-bit fingerprint per row, built one column at a
+# time, instead of pandas' group labels for every column at once. Columns compare the
+# way `drop_duplicates` compares them (missing values equal, 0.0 equal to -0.0, 1 equal
+# to 1.0 and True in object columns), and their hashes are mixed into two independent
+# 64-bit lanes. The working memory is 16 bytes per row; past DEDUP_MEMORY_MB the
+# fingerprints go to hash-partitioned files, one partition being checked at a time.
+
+_LANE_SEEDS = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+_HASH_KEYS = ("rtgs.dedup.lane0", "rtgs.dedup.lane1")
+# Missing values; NaN bit patterns, so no float that is not missing hashes the same.
+_NULL = (np.uint64(0x7FF8D1E9955BD1E9), np.uint64(0x7FF827D4EB2F1656))
+_RECORD = np.dtype([("row", "<u8"), ("hi", "<u8"), ("lo", "<u8")])
+_PARTITION_BITS = 6
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    """The splitmix64 finalizer, applied elementwise and in place (uint64 arithmetic wraps)."""
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+def _canonical(value) -> str:
+    """Text that is equal for Python-equal values of different types (1, 1.0, True)."""
+    if isinstance(value, (bool, np.bool_, numbers.Integral)):
+        return "n" + str(int(value))
+    if isinstance(value, numbers.Real) and float(value).is_integer():
+        return "n" + str(int(value))
+    if isinstance(value, numbers.Real):
+        return "f" + repr(float(value))
+    return "o" + type(value).__name__ + ":" + repr(value)
+
+
+def _hash_values(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The two 64-bit lanes of each (non-missing) value, as new arrays. Numbers go in as
+    their bits, since the row hash mixes every column it takes in; text is hashed.
+    """
+    if values.dtype.kind == "f":
+        bits = (values.astype(np.float64) + 0.0).view(np.uint64)
+    elif values.dtype.kind in "ub":
+        bits = values.astype(np.uint64)
+    elif values.dtype.kind in "imM":
+        bits = values.astype(np.int64).view(np.uint64)
+    else:
+        values = values.astype(object)
+        if pd.api.types.infer_dtype(values, skipna=False) == "string":
+            return tuple(pd.util.hash_array(values, hash_key=key, categorize=False) for key in _HASH_KEYS)
+        # Other values are hashed as canonical text under their own keys, so they cannot
+        # meet a string that happens to read the same.
+        is_text = np.array([isinstance(v, str) for v in values], dtype=bool)
+        others = np.array([_canonical(v) for v in values[~is_text]], dtype=object)
+        lanes = []
+        for key in _HASH_KEYS:
+            lane = np.empty(len(values), dtype=np.uint64)
+            lane[is_text] = pd.util.hash_array(values[is_text], hash_key=key, categorize=False)
+            lane[~is_text] = pd.util.hash_array(others, hash_key=key[::-1], categorize=False)
+            lanes.append(lane)
+        return lanes[0], lanes[1]
+    return bits, bits
+
+
+def _is_plain_number(series: pd.Series) -> bool:
+    return isinstance(series.dtype, np.dtype) and series.dtype.kind in "fiubmM"
+
+
+def _codes(series: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.array.codes.astype(np.int64), series.array.categories.to_numpy()
+    return pd.factorize(series, use_na_sentinel=True)
+
+
+def _null_kinds(series: pd.Series, missing: np.ndarray) -> np.ndarray:
+    """
+    A lone object column is compared the way `Series.duplicated` compares it, where
+    None, NaN, NA and NaT are different values; several columns are compared through
+    their factorized codes, which treat every kind of missing value alike.
+    """
+    return np.array(["x" + type(v).__name__ for v in series.to_numpy()[missing]], dtype=object)
+
+
+def _column_hashes(series: pd.Series, typed_nulls: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """The hashes of a column's values, the same in any frame."""
+    if _is_plain_number(series):
+        # Plain numbers are hashed row by row; factorizing them would cost more.
+        values = series.to_numpy()
+        lanes = list(_hash_values(values))
+        missing = pd.isna(values) if series.dtype.kind in "fmM" else None
+    else:
+        codes, uniques = _codes(series)
+        missing = codes < 0
+        lanes = [lane[codes] if len(lane) else np.zeros(len(codes), dtype=np.uint64)
+                 for lane in _hash_values(np.asarray(uniques))]
+    if missing is not None and missing.any():
+        for lane, null in zip(lanes, _NULL):
+            lane[missing] = null
+        if typed_nulls and series.dtype == object:
+            kinds = _null_kinds(series, missing)
+            for lane, key in zip(lanes, _HASH_KEYS):
+                lane[missing] = pd.util.hash_array(kinds, hash_key=key, categorize=True)
+    return lanes[0], lanes[1]
+
+
+def _dense_codes(series: pd.Series, typed_nulls: bool) -> Tuple[np.ndarray, int]:
+    """Codes 0..n-1 numbering the column's distinct values in this frame, and n."""
+    codes, uniques = _codes(series)
+    n = len(uniques)
+    missing = codes < 0
+    if missing.any():
+        if typed_nulls and series.dtype == object:
+            kinds, distinct = pd.factorize(_null_kinds(series, missing))
+            codes[missing] = n + kinds
+            return codes, n + len(distinct)
+        codes[missing] = n
+        n += 1
+    return codes, n
+
+
+def _positions(columns: pd.Index, subset: Optional[Sequence]) -> List[int]:
+    if not subset:
+        return list(range(len(columns)))
+    missing = [c for c in subset if c not in columns]
+    if missing:
+        raise KeyError(pd.Index(missing))
+    wanted = set(subset)
+    return [i for i, col in enumerate(columns) if col in wanted]
+
+
+def row_fingerprints(df: pd.DataFrame, subset: Optional[Sequence] = None,
+                     by_value: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The two 64-bit halves of each row's fingerprint over `subset` (all columns by default).
+    With `by_value=False` the fingerprints are only comparable within this frame: text
+    and categories then enter as one exact key numbering their combinations, built the
+    way pandas groups rows, which is cheaper than hashing the values.
+    """
+    positions = _positions(df.columns, subset)
+    typed_nulls = len(subset or df.columns) == 1 and df.columns.is_unique
+    hi = np.full(len(df), _LANE_SEEDS[0], dtype=np.uint64)
+    lo = np.full(len(df), _LANE_SEEDS[1], dtype=np.uint64)
+    key, combinations = None, 1
+
+    def combine(col_hi: np.ndarray, col_lo: np.ndarray, position: int) -> None:
+        nonlocal hi, lo
+        hi ^= col_hi
+        _mix(hi)
+        lo ^= col_lo
+        lo += np.uint64(position)
+        _mix(lo)
+
+    for i in positions:
+        series = df.iloc[:, i]
+        if by_value or _is_plain_number(series):
+            combine(*_column_hashes(series, typed_nulls), i)
+            continue
+        codes, n = _dense_codes(series, typed_nulls)
+        if key is None:
+            key, combinations = codes, n
+            continue
+        if combinations * n >= 1 << 63:
+            # Renumber the combinations seen so far before the key overflows.
+            key, seen = pd.factorize(key)
+            combinations = len(seen)
+        key *= n
+        key += codes
+        combinations *= n
+    if key is not None:
+        key = key.view(np.uint64)
+        combine(key, key, len(df.columns))
+    return hi, lo
+
+
+def _first_occurrences(hi: np.ndarray, lo: np.ndarray) -> np.ndarray:
+    """True for the first row of each fingerprint, in row order."""
+    # Codes are numbered in order of first appearance, so a row is the first of its
+    # code exactly when the code is higher than any before it.
+    codes, _ = pd.factorize(hi)
+    seen = np.maximum.accumulate(codes)
+    keep = np.empty(len(codes), dtype=bool)
+    keep[:1] = True
+    np.greater(codes[1:], seen[:-1], out=keep[1:])
+    del seen
+    repeats = np.flatnonzero(~keep)
+    first = np.flatnonzero(keep)[codes[repeats]]
+    del codes
+    if (lo[repeats] != lo[first]).any():
+        # Rows sharing only the first half are told apart by comparing both.
+        shared = np.flatnonzero(pd.Series(hi, copy=False).duplicated(keep=False).to_numpy())
+        keep[shared] = ~pd.DataFrame({"hi": hi[shared], "lo": lo[shared]}).duplicated().to_numpy()
+    return keep
+
+
+class Deduplicator:
+    """
+    Finds repeated rows across a stream of frames, keeping each row's first occurrence.
+    Frames are fed in order with `add`; after `finish`, `keep(offset, length)` gives the
+    mask of rows to keep for any run of rows.
+    """
+
+    def __init__(self, subset: Optional[Sequence] = None, memory_mb: Optional[float] = None,
+                 spill_dir: Optional[str] = None):
+        self.subset = subset
+        self.budget = (config.DEDUP_MEMORY_MB if memory_mb is None else memory_mb) * 1024 * 1024
+        self.spill_parent = spill_dir
+        self.spill_path: Optional[str] = None
+        self.pending: List[Tuple[np.ndarray, np.ndarray]] = []
+        self.pending_bytes = 0
+        self.rows = 0
+        self.spilled_rows = 0
+        self.duplicate_rows: Optional[np.ndarray] = None
+
+    def add(self, df: pd.DataFrame) -> None:
+        self.add_fingerprints(*row_fingerprints(df, self.subset))
+
+    def add_fingerprints(self, hi: np.ndarray, lo: np.ndarray) -> None:
+        self.pending.append((hi, lo))
+        self.pending_bytes += hi.nbytes + lo.nbytes
+        self.rows += len(hi)
+        if self.pending_bytes > self.budget:
+            self._spill()
+
+    def _spill(self) -> None:
+        if not self.pending:
+            return
+        if self.spill_path is None:
+            self.spill_path = tempfile.mkdtemp(prefix="rtgs-dedup-", dir=self.spill_parent)
+            logger.debug(f"Duplicate fingerprints exceed {self.budget / 2**20:g} MB; spilling to {self.spill_path}.")
+        records = np.empty(sum(len(hi) for hi, _ in self.pending), dtype=_RECORD)
+        records["row"] = np.arange(self.spilled_rows, self.spilled_rows + len(records), dtype=np.uint64)
+        records["hi"] = np.concatenate([hi for hi, _ in self.pending])
+        records["lo"] = np.concatenate([lo for _, lo in self.pending])
+        partitions = (records["hi"] >> np.uint64(64 - _PARTITION_BITS)).astype(np.int64)
+        # A stable sort keeps each partition's rows in order.
+        order = np.argsort(partitions, kind="stable")
+        bounds = np.searchsorted(partitions[order], np.arange((1 << _PARTITION_BITS) + 1))
+        for p in range(1 << _PARTITION_BITS):
+            if bounds[p + 1] > bounds[p]:
+                with open(os.path.join(self.spill_path, f"{p:03d}.bin"), "ab") as f:
+                    records[order[bounds[p]:bounds[p + 1]]].tofile(f)
+        self.spilled_rows += len(records)
+        self.pending, self.pending_bytes = [], 0
+
+    def discard(self) -> None:
+        """Drops the fingerprints gathered so far, including any spilled to disk."""
+        if self.spill_path is not None:
+            shutil.rmtree(self.spill_path, ignore_errors=True)
+            self.spill_path = None
+        self.pending, self.pending_bytes = [], 0
+
+    def finish(self) -> int:
+        """Resolves which rows are repeats; returns how many there are."""
+        if self.spill_path is None:
+            hi, lo = self.pending[0] if len(self.pending) == 1 else (
+                np.concatenate([hi for hi, _ in self.pending] or [np.empty(0, dtype=np.uint64)]),
+                np.concatenate([lo for _, lo in self.pending] or [np.empty(0, dtype=np.uint64)]))
+            self.pending = []
+            self.duplicate_rows = np.flatnonzero(~_first_occurrences(hi, lo))
+        else:
+            self._spill()
+            duplicates = []
+            try:
+                for name in sorted(os.listdir(self.spill_path)):
+                    records = np.fromfile(os.path.join(self.spill_path, name), dtype=_RECORD)
+                    keep = _first_occurrences(records["hi"], records["lo"])
+                    duplicates.append(records["row"][~keep].astype(np.int64))
+            finally:
+                self.discard()
+            self.duplicate_rows = np.sort(np.concatenate(duplicates)) if duplicates else np.empty(0, dtype=np.int64)
+        self.pending, self.pending_bytes = [], 0
+        return len(self.duplicate_rows)
+
+    def keep(self, offset: int, length: int) -> np.ndarray:
+        """Mask of the rows to keep among rows `offset` to `offset + length` of the stream."""
+        keep = np.ones(length, dtype=bool)
+        start, end = np.searchsorted(self.duplicate_rows, [offset, offset + length])
+        keep[self.duplicate_rows[start:end] - offset] = False
+        return keep
+
+
+def drop_duplicate_rows(df: pd.DataFrame, subset: Optional[Union[str, Sequence]] = None) -> Tuple[pd.DataFrame, int]:
+    """
+    `df.drop_duplicates(subset)` by row fingerprints. Columns are hashed one at a time,
+    so the memory needed beyond the frame is 16 bytes per row plus one column's codes,
+    however wide the frame. Returns the frame without repeated rows and the number removed.
+    """
+    if isinstance(subset, str):
+        subset = [subset]
+    hi, lo = row_fingerprints(df, subset, by_value=False)
+    # pandas finds no duplicates without columns to compare.
+    if df.empty:
+        return df, 0
+    dedup = Deduplicator(subset)
+    dedup.add_fingerprints(hi, lo)
+    del hi, lo
+    removed = dedup.finish()
+    return (df[dedup.keep(0, len(df))] if removed else df), removed
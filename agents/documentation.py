@@ -1,7 +1,10 @@
+import os
 import json
 from datetime import datetime
 from typing import Dict, Any
+import config
 from agents.logger import logger
+from agents.plan_optimizer import describe_step
 from state import GraphState
 
 def format_plan_for_report(plan: Dict[str, Any]) -> str:
@@ -27,6 +30,48 @@ def format_plan_for_report(plan: Dict[str, Any]) -> str:
     return "\n\n".join(report_lines)
 
 
+def format_optimization_for_report(optimized_plan: Dict[str, Any]) -> str:
+    """Lists the optimizer's rewrites and the order in which steps actually ran."""
+    if not optimized_plan:
+        return "The plan was executed as generated."
+    rewrites = optimized_plan.get("rewrites", [])
+    lines = []
+    if rewrites:
+        lines.append("Before execution, the plan was rewritten into an equivalent, cheaper form:")
+        lines.extend(f"- {rewrite}" for rewrite in rewrites)
+    else:
+        lines.append("The plan was already in an efficient order; no rewrites were needed.")
+    lines.append("\n**Executed order:**")
+    lines.extend(f"{i + 1}. {describe_step(step)}" for i, step in enumerate(optimized_plan.get("steps", [])))
+    return "\n".join(lines)
+
+
+REPORT_FOOTER = "\n---\n*End of Report*"
+PERFORMANCE_HEADING = "\n---\n\n## 5. Performance"
+
+
+def run_report_path(state: GraphState) -> str:
+    return os.path.join(config.get_option(state, "output_dir"), "run_report.md")
+
+
+def add_performance_section(report_path: str, timing_table: str, llm_calls: str = "") -> None:
+    """
+    Inserts the run's timing table (and, if given, its model-call ledger) into an existing
+    run report, replacing the one from an earlier run. The tables are only complete once
+    every branch of the graph has finished, so they are added after the run rather than by
+    the documentation node.
+    """
+    with open(report_path, "r", encoding="utf-8") as f:
+        report = f.read()
+    body, footer, _ = report.partition(REPORT_FOOTER)
+    body = body.split(PERFORMANCE_HEADING)[0].rstrip("\n") + "\n"
+    section = f"{PERFORMANCE_HEADING}\nTime and resources spent in each stage of this run:\n\n{timing_table}\n\n"
+    if llm_calls:
+        section += f"### Gemini calls\n{llm_calls}\n\n"
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write(body + section + (footer or REPORT_FOOTER) + "\n")
+
+
 def documentation_node(state: GraphState) -> Dict[str, Any]:
     """Gathers all information and creates a final Markdown report."""
     logger.info("    - Executing: Documentation Node")
@@ -37,6 +82,8 @@ def documentation_node(state: GraphState) -> Dict[str, Any]:
     
     # Format the plan into a readable list
     formatted_plan = format_plan_for_report(cleaning_plan)
+    formatted_optimization = format_optimization_for_report(state.get('optimized_plan', {}))
+    formatted_log = "\n".join(f"- {message}" for message in log_messages)
     
     report = f"""
 # RTGS AI Analyst Run Report
@@ -58,9 +105,14 @@ The AI analyzed the data and generated the following plan, which was then execut
 
 ---
 
-## 3. Execution Log
+## 3. Plan Optimization
+{formatted_optimization}
+
+---
+
+## 4. Execution Log
 A high-level log of the pipeline's execution stages:
-{"\n- ".join(log_messages)}
+{formatted_log}
 
 
 ---
@@ -68,8 +120,9 @@ A high-level log of the pipeline's execution stages:
 """
     
     # Define the path and save the report to a file, ensuring UTF-8 encoding
-    report_path = "outputs/run_report.md"
+    report_path = run_report_path(state)
     try:
+        os.makedirs(os.path.dirname(report_path), exist_ok=True)
         with open(report_path, "w", encoding="utf-8") as f:
             f.write(report)
         logger.debug(f"Successfully generated and saved run report to {report_path}")
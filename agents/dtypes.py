@@ -0,0 +1,84 @@
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# Compact representations chosen at ingestion. They change how a column is stored, never
+# its values: low-cardinality text becomes `category`, other text Arrow-backed strings,
+# and int64 columns the smallest integer type that holds them. Float columns stay float64,
+# because float32 would change means, scaling and every derived statistic.
+# Code whose result depends on the dtype sees a compacted column as it would have been
+# read without compaction, through `logical_dtype`, `expand` and `value_counts`.
+
+ARROW_STRING = pd.StringDtype("pyarrow")
+
+
+def is_compact(series: pd.Series) -> bool:
+    dtype = series.dtype
+    if isinstance(dtype, (pd.CategoricalDtype, pd.StringDtype)):
+        return True
+    return isinstance(dtype, np.dtype) and dtype.kind == "i" and dtype.itemsize < 8
+
+
+def logical_dtype(series: pd.Series) -> str:
+    """The dtype name the column would have without compaction, e.g. 'object' for a category."""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return str(dtype.categories.dtype)
+    if isinstance(dtype, pd.StringDtype):
+        return "object"
+    if is_compact(series):
+        return "int64"
+    return str(dtype)
+
+
+def expand(series: pd.Series) -> pd.Series:
+    """The column in its uncompacted dtype: object text with NaN for missing values, or int64."""
+    if not is_compact(series):
+        return series
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(object)
+    if isinstance(series.dtype, pd.StringDtype):
+        return series.astype(object).where(series.notna(), np.nan)
+    return series.astype("int64")
+
+
+def value_counts(series: pd.Series) -> pd.Series:
+    """
+    `series.value_counts()` as it would be for the uncompacted column. For a category that
+    means counting the codes: values in order of first appearance, ties sorted the same
+    way, and no zero counts for categories that no longer occur.
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.value_counts()
+    codes = pd.Series(series.cat.codes.to_numpy())
+    counts = codes[codes >= 0].value_counts()
+    result = pd.Series(counts.to_numpy(), index=series.cat.categories.take(counts.index.to_numpy()), name="count")
+    result.index.name = series.name
+    return result
+
+
+def compact_dtypes(df: pd.DataFrame, max_category_ratio: float) -> Dict[str, int]:
+    """
+    Compacts the frame's columns in place. Text columns whose distinct values are at most
+    `max_category_ratio` of their non-missing values become categories, other text columns
+    Arrow strings, and int64 columns are downcast. Returns how many columns of each kind
+    were converted.
+    """
+    converted = {"category": 0, "text": 0, "integer": 0}
+    for i in range(df.shape[1]):
+        series = df.iloc[:, i]
+        if series.dtype == np.int64:
+            downcast = pd.to_numeric(series, downcast="integer")
+            if downcast.dtype != series.dtype:
+                df.isetitem(i, downcast)
+                converted["integer"] += 1
+        elif series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) == "string":
+            present = series.count()
+            if present and series.nunique() / present <= max_category_ratio:
+                df.isetitem(i, series.astype("category"))
+                converted["category"] += 1
+            else:
+                df.isetitem(i, series.astype(ARROW_STRING))
+                converted["text"] += 1
+    return converted
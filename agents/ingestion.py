@@ -1,8 +1,20 @@
+import csv
+import io
+import os
 import pandas as pd
 import re
-from typing import Dict, Any
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List
+import config
 from state import GraphState
+from agents import tracing
 from agents.logger import logger
+from agents.artifacts import artifact_path, write_artifact
+from agents.dtypes import compact_dtypes
+from agents.parallel_ingestion import ASCII_COMPATIBLE_ENCODINGS, read_csv_parallel
+
+CANDIDATE_DELIMITERS = [',', ';', '\t', '|']
 
 def standardize_column_names(df: pd.DataFrame) -> pd.DataFrame:
     """Converts all column names to a clean snake_case format."""
@@ -15,46 +27,146 @@ def standardize_column_names(df: pd.DataFrame) -> pd.DataFrame:
     df.columns = new_cols
     return df
 
+def _read_sample(path: str, size: int) -> bytes:
+    """Reads the first `size` bytes of the file, cut back to the last complete line."""
+    with open(path, 'rb') as f:
+        sample = f.read(size)
+        at_eof = not f.read(1)
+    if not at_eof and b'\n' in sample:
+        sample = sample[:sample.rindex(b'\n') + 1]
+    return sample
+
+def sniff_encoding(sample: bytes) -> str:
+    """Picks the first encoding that decodes the byte sample cleanly."""
+    if sample.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
+    if sample.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'utf-16'
+    for encoding in ('utf-8', 'cp1252'):
+        try:
+            sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    # latin-1 maps every byte, so it always succeeds.
+    return 'latin-1'
+
+def _field_counts(text: str, delimiter: str) -> List[int]:
+    """Number of fields in each sampled record, honouring quoted fields."""
+    rows = [len(row) for row in csv.reader(io.StringIO(text), delimiter=delimiter) if row]
+    # The last record may have been cut off by the sample boundary.
+    return rows[:-1] if len(rows) > 2 else rows
+
+def sniff_structure(sample_text: str) -> Dict[str, Any]:
+    """
+    Chooses the delimiter whose sampled field counts are most consistent and
+    flags the file as malformed when data rows have more fields than the header.
+    """
+    best = None
+    for delimiter in CANDIDATE_DELIMITERS:
+        counts = _field_counts(sample_text, delimiter)
+        if not counts:
+            continue
+        header_fields, data_counts = counts[0], counts[1:] or counts[:1]
+        modal_fields = Counter(data_counts).most_common(1)[0][0]
+        # Counting the header too lets a delimiter that fits every row win ties.
+        consistency = sum(1 for c in counts if c == modal_fields) / len(counts)
+        score = consistency if modal_fields > 1 or header_fields > 1 else 0.0
+        if best is None or score > best['consistency_score']:
+            best = {
+                'delimiter': delimiter,
+                'header_fields': header_fields,
+                'modal_fields': modal_fields,
+                'sampled_rows': len(data_counts),
+                'consistency_score': score,
+            }
+    if best is None:
+        best = {'delimiter': ',', 'header_fields': 1, 'modal_fields': 1, 'sampled_rows': 0, 'consistency_score': 0.0}
+    best['malformed'] = best['modal_fields'] > best['header_fields']
+    return best
+
+def sniff_source_format(path: str) -> Dict[str, Any]:
+    """Detects encoding, delimiter and structural health from a byte sample of the file."""
+    sample = _read_sample(path, config.INGEST_SAMPLE_BYTES)
+    encoding = sniff_encoding(sample)
+    source_format = {'encoding': encoding}
+    source_format.update(sniff_structure(sample.decode(encoding, errors='ignore')))
+    return source_format
+
 def ingestion_node(state: GraphState) -> Dict[str, Any]:
     """
-    Uses a hybrid approach: tries a fast, standard read first, then falls back
-    to a specialized parser if it detects a malformed text file.
+    Sniffs the file's encoding and dialect from a byte sample, then parses it
+    exactly once with a fast engine, using a specialised layout when the sampled
+    field counts show a malformed header. Large well-formed files are parsed as
+    newline-aligned byte ranges on a process pool.
     """
     logger.info("    - Executing: Hybrid Ingestion Node")
     raw_data_path = state['raw_data_path']
 
+    source_format = sniff_source_format(raw_data_path)
+    logger.debug(f"Sniffed source format: {source_format}")
+
+    read_options = {
+        'encoding': source_format['encoding'],
+        'encoding_errors': 'replace',
+        'sep': source_format['delimiter'],
+        'on_bad_lines': 'skip',
+    }
+
+    workers = int(config.get_option(state, "ingest_workers") or 1)
+    file_size_mb = os.path.getsize(raw_data_path) / (1024 * 1024)
+    parallel = (
+        workers > 1
+        and file_size_mb >= config.PARALLEL_INGEST_MIN_MB
+        and not source_format['malformed']
+        and config.INGEST_ENGINE == 'c'
+        and source_format['encoding'] in ASCII_COMPATIBLE_ENCODINGS
+    )
+    # One pool serves both the parallel parse and the parallel write of the artifact.
+    executor = ProcessPoolExecutor(max_workers=workers) if parallel else None
+
     df = None
     try:
-        # --- STEP 1: THE FAST PATH for 99% of files ---
-        df = pd.read_csv(
-            raw_data_path,
-            encoding='latin-1',
-            on_bad_lines='skip',
-            engine='python'
-        )
-        logger.debug(f"Initial read successful. DataFrame shape: {df.shape}")
-
-        # --- STEP 2: THE CHECK for the broken Amazon file edge case ---
-        # Heuristic: If there's only one column and its name contains "review",
-        # it's highly likely to be the malformed Amazon file.
-        if df.shape[1] == 1 and 'review' in str(df.columns[0]).lower():
-            logger.warning("Malformed CSV detected (single column with 'review' in name). Applying specialized parser...")
-            
-            # --- STEP 3: THE ROBUST FALLBACK ---
+        if parallel:
+            logger.debug(f"Large well-formed file ({file_size_mb:.0f}MB). Parsing byte ranges on {workers} workers.")
+            df = read_csv_parallel(raw_data_path, read_options, executor, workers)
+            source_format['engine'] = f'c (parallel x{workers})'
+        elif source_format['malformed']:
+            # Data rows carry more fields than the header (e.g. the broken Amazon
+            # review export), so read them positionally and skip the header row.
+            logger.warning("Malformed CSV detected (data rows have more fields than the header). Applying specialized parser...")
+            with open(raw_data_path, encoding=source_format['encoding'], errors='replace') as f:
+                header = next(csv.reader(f, delimiter=source_format['delimiter']), [])
+            if len(header) == 1 and 'review' in header[0].lower():
+                names = ['review_text', 'decision']
+            else:
+                names = header + [f"column_{i + 1}" for i in range(len(header), source_format['modal_fields'])]
             df = pd.read_csv(
                 raw_data_path,
-                encoding='latin-1',
                 header=None,
-                usecols=[0, 1],
-                names=['review_text', 'decision'],
-                on_bad_lines='skip',
-                engine='python'
+                skiprows=1,
+                usecols=list(range(len(names))),
+                names=names,
+                engine='c',
+                **read_options
             )
-            # We need to skip the original header row which is now read as data
-            df = df.iloc[1:].reset_index(drop=True)
+            source_format['engine'] = 'c'
             logger.debug("Specialized parser applied successfully.")
+        else:
+            engine = config.INGEST_ENGINE
+            try:
+                df = pd.read_csv(raw_data_path, engine=engine, **read_options)
+            except pd.errors.ParserError as e:
+                # Structures the fast tokenizers reject (e.g. an unterminated quote) still parse here.
+                logger.warning(f"The '{engine}' parser rejected the file ({e}). Falling back to the python engine.")
+                engine = 'python'
+                df = pd.read_csv(raw_data_path, engine=engine, **read_options)
+            source_format['engine'] = engine
+        logger.debug(f"Read successful. DataFrame shape: {df.shape}")
 
     except Exception as e:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
         logger.critical(f"Fatal error during ingestion: {e}", exc_info=True)
         raise e
 
@@ -68,11 +180,26 @@ def ingestion_node(state: GraphState) -> Dict[str, Any]:
 
     logger.debug("Standardized and cleaned columns.")
 
-    standardized_data_path = "outputs/1_standardized_data.csv"
-    standardized_df.to_csv(standardized_data_path, index=False)
+    log_messages = ["Hybrid ingestion complete."]
+    if config.COMPACT_DTYPES:
+        converted = compact_dtypes(standardized_df, config.COMPACT_CATEGORY_MAX_RATIO)
+        logger.debug(f"Compacted column dtypes: {converted}")
+        log_messages.append(
+            f"Compacted {converted['category']} categorical, {converted['text']} text and {converted['integer']} integer columns."
+        )
+
+    standardized_data_path = artifact_path(os.path.join(config.get_option(state, "output_dir"), "1_standardized_data"), config.get_option(state, "artifact_format"))
+    try:
+        write_artifact(standardized_df, standardized_data_path, executor=executor, workers=workers if parallel else 1)
+    finally:
+        if executor is not None:
+            executor.shutdown()
     logger.debug(f"Saved standardized data to {standardized_data_path}")
+    tracing.annotate(bytes_in=os.path.getsize(raw_data_path), rows_out=len(standardized_df),
+                     bytes_out=os.path.getsize(standardized_data_path))
 
     return {
         "standardized_data_path": standardized_data_path,
-        "log_messages": state.get('log_messages', []) + ["Hybrid ingestion complete."]
+        "source_format": source_format,
+        "log_messages": log_messages
     }
\ No newline at end of file
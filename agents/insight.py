@@ -1,30 +1,39 @@
 import glob
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 import json
-from typing import Dict, Any, List
-from collections import Counter
+from typing import Dict, Any, List, Optional
+from functools import lru_cache
+from concurrent.futures import Executor, Future
 
 from rich.console import Console
 from rich.table import Table
 
-import nltk
-from nltk.corpus import stopwords
-
+import config
 from state import GraphState
-from agents.profiler import get_data_profile
-import google.generativeai as genai
+from agents.profiler import derive_profile
+from agents.artifacts import read_artifact
+from agents.dtypes import expand, value_counts
+from agents import engines, llm_cache, tracing
+from agents.llm_client import LLMUnavailableError
+from agents.plotting import histogram_spec, render_plot_timed, scatter_spec, start_renderer
+from agents.word_counts import top_words
 from agents.logger import logger
 
-try:
-    stopwords.words('english')
-except LookupError:
-    nltk.download('stopwords')
-
 console = Console()
 
+
+@lru_cache(maxsize=1)
+def _stop_words() -> frozenset:
+    """NLTK's English stop words, loaded (and downloaded if missing) by the first word-frequency analysis."""
+    import nltk
+    from nltk.corpus import stopwords
+    try:
+        return frozenset(stopwords.words('english'))
+    except LookupError:
+        nltk.download('stopwords')
+        return frozenset(stopwords.words('english'))
+
 def _create_markdown_table(data: pd.Series, index_name: str, value_name: str) -> str:
     """Converts a pandas Series into a Markdown table string."""
     headers = f"| {index_name} | {value_name} |\n"
@@ -66,13 +75,19 @@ def generate_findings_in_batch(interpretation_requests: List[Dict[str, Any]]) ->
     prompt += "Provide your recommendations as a numbered list of sentences, with each recommendation on a new line."
     # --- END: PROMPT UPGRADE ---
 
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    try:
-        response = model.generate_content(prompt)
-        findings = [line.strip().split('. ', 1)[1] for line in response.text.strip().split('\n') if '. ' in line]
+    def parse_findings(text: str) -> List[str]:
+        findings = [line.strip().split('. ', 1)[1] for line in text.strip().split('\n') if '. ' in line]
         if len(findings) != len(interpretation_requests):
-             return ["An AI-generated recommendation could not be produced." for _ in interpretation_requests]
+            raise ValueError(f"Expected {len(interpretation_requests)} recommendations, got {len(findings)}.")
         return findings
+
+    try:
+        return llm_cache.cached_generate("gemini-2.5-flash", prompt, parse=parse_findings, purpose="findings")
+    except LLMUnavailableError:
+        raise
+    except ValueError as e:
+        logger.debug(f"Discarding batch recommendations: {e}")
+        return ["An AI-generated recommendation could not be produced." for _ in interpretation_requests]
     except Exception as e:
         logger.error(f"Error generating batch recommendations: {e}")
         return ["An AI-generated recommendation could not be produced." for _ in interpretation_requests]
@@ -113,11 +128,11 @@ def generate_insight_plan(profile: Dict[str, Any]) -> Dict[str, Any]:
     """
     
     generation_config = {"temperature": 0.0, "response_mime_type": "application/json"}
-    model = genai.GenerativeModel("gemini-2.5-flash", generation_config=generation_config)
-    
     try:
-        response = model.generate_content(prompt)
-        return json.loads(response.text)
+        return llm_cache.cached_generate("gemini-2.5-flash", prompt, generation_config, parse=json.loads,
+                                         purpose="insight plan")
+    except LLMUnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Error generating insight plan: {e}")
         return {"analyses": []}
@@ -127,7 +142,7 @@ def insight_node(state: GraphState) -> Dict[str, Any]:
     Executes analyses, generates plots, and interprets all results in a single batch.
     """
     logger.info("    - Executing: Automated EDA & Interpretation Node")
-    insights_dir = "outputs/insights"
+    insights_dir = os.path.join(config.get_option(state, "output_dir"), "insights")
     if os.path.exists(insights_dir):
         logger.debug(f"Cleaning old plots from '{insights_dir}'...")
         old_plots = glob.glob(os.path.join(insights_dir, "*.png"))
@@ -141,7 +156,7 @@ def insight_node(state: GraphState) -> Dict[str, Any]:
     cleaned_data_path = state['cleaned_data_path']
     
     try:
-        df = pd.read_csv(cleaned_data_path, encoding='latin-1')
+        df = read_artifact(cleaned_data_path)
         if df.empty:
             logger.warning("Cleaned data is empty. No insights generated.")
             return {"insights": {"generated_insights": []}}
@@ -149,15 +164,72 @@ def insight_node(state: GraphState) -> Dict[str, Any]:
         logger.warning("Cleaned data file is empty. No insights generated.")
         return {"insights": {"generated_insights": []}}
     
-    profile = get_data_profile(cleaned_data_path)
+    tracing.annotate(rows_in=len(df), bytes_in=os.path.getsize(cleaned_data_path))
+    engine = engines.resolve_engine(config.get_option(state, "engine"))
+    # Only the columns the cleaning plan changed are profiled again.
+    profile = derive_profile(state.get('data_profile'), cleaned_data_path, state.get('cleaning_lineage'), engine)
     if not profile.get("columns"):
         logger.warning("Data profile is empty. No insights can be generated.")
         return {"insights": {"generated_insights": []}}
-        
-    insight_plan = generate_insight_plan(profile)
-    analysis_tasks = insight_plan.get("analyses", [])
-    
+
+    # Rendering workers start up while the AI plans the analyses.
+    plot_workers = int(config.get_option(state, "plot_workers") or 1)
+    renderer = start_renderer(plot_workers)
+    try:
+        insight_plan = generate_insight_plan(profile)
+        generated_insights, plot_specs, interpretation_batch = _run_analyses(
+            df, insight_plan.get("analyses", []), insights_dir, renderer, plot_workers, engine)
+
+        # Figures render in the worker processes while the AI interprets the statistics.
+        if renderer is not None:
+            renders = [renderer.submit(render_plot_timed, spec) for spec in plot_specs]
+        else:
+            renders = [_render_inline(spec) for spec in plot_specs]
+        findings = generate_findings_in_batch(interpretation_batch) if interpretation_batch else None
+
+        for insight, spec, render in zip(generated_insights, plot_specs, renders):
+            try:
+                timing = render.result()
+                tracing.add_span(f"plot {spec['kind']}", "plot", timing["ts_us"], timing["dur_us"],
+                                 pid=timing["pid"], path=spec["path"])
+                logger.debug(f"Saved plot to {spec['path']}")
+            except Exception as e:
+                logger.error(f"Could not render plot {spec['path']}. Error: {e}")
+                insight["plot_path"] = None
+    finally:
+        if renderer is not None:
+            renderer.shutdown(cancel_futures=True)
+
+    if findings is not None:
+        for i in range(len(generated_insights)):
+            if i < len(findings):
+                generated_insights[i]["finding"] = findings[i]
+            else:
+                generated_insights[i]["finding"] = "An AI-generated finding could not be produced for this insight."
+            
+    return {"insights": {"generated_insights": generated_insights}}
+
+
+def _render_inline(spec: Dict[str, Any]) -> Future:
+    """Renders a plot in this process, wrapped in a finished Future like the pool's results."""
+    future = Future()
+    try:
+        future.set_result(render_plot_timed(spec))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _run_analyses(df: pd.DataFrame, analysis_tasks: List[Dict[str, Any]], insights_dir: str,
+                  executor: Optional[Executor] = None, workers: int = 1, engine: str = "pandas"):
+    """
+    Computes the statistics for each analysis and describes its plot, without drawing
+    anything. Returns the insights, their render specs and the interpretation batch.
+    Word counts of large text columns are spread over `executor` (the plot workers).
+    With `engine="polars"`, aggregations Polars supports are computed there.
+    """
     generated_insights = []
+    plot_specs = []
     interpretation_batch = []
 
     for i, task in enumerate(analysis_tasks):
@@ -166,12 +238,12 @@ def insight_node(state: GraphState) -> Dict[str, Any]:
         question = task.get("question_to_answer", "No question was provided by the AI.")
         
         try:
-            plt.figure(figsize=(10, 6))
-            plot_path = f"outputs/insights/insight_{i+1}_{action}.png"
+            plot_path = os.path.join(insights_dir, f"insight_{i+1}_{action}.png")
             title = f"Insight {i+1}: {action.replace('_', ' ').title()}"
             
             stats_for_ai = None
             markdown_table = None
+            plot_spec = None
 
             if action == "distribution" and details.get("column") in df.columns:
                 col = details["column"]
@@ -180,11 +252,13 @@ def insight_node(state: GraphState) -> Dict[str, Any]:
                     data_to_describe = df[col].dropna()
                 else:
                     title = f"Distribution of Length of '{col}'"
-                    data_to_describe = df[col].str.len().dropna()
+                    lengths = engines.text_lengths(expand(df[col])) if engine == "polars" else None
+                    data_to_describe = lengths if lengths is not None else expand(df[col]).str.len().dropna()
 
-                sns.histplot(data_to_describe, kde=True, color='skyblue')
-                plt.title(title, fontsize=16)
-                stats = data_to_describe.describe().to_dict()
+                plot_spec = histogram_spec(data_to_describe, config.LARGE_PLOT_ROWS)
+                stats = engines.describe(data_to_describe) if engine == "polars" else None
+                if stats is None:
+                    stats = data_to_describe.describe().to_dict()
                 stats_for_ai = {k: round(v, 2) for k, v in stats.items() if pd.notna(v)}
                 markdown_table = _create_stats_markdown_table(stats_for_ai)
 
@@ -192,9 +266,10 @@ def insight_node(state: GraphState) -> Dict[str, Any]:
                 col_x, col_y = details["column_x"], details["column_y"]
                 if col_x in df.columns and col_y in df.columns:
                     title = f"Correlation between '{col_x}' and '{col_y}'"
-                    sns.scatterplot(x=df[col_x], y=df[col_y])
-                    plt.title(title, fontsize=16)
-                    corr = df[col_x].corr(df[col_y])
+                    plot_spec = scatter_spec(df[col_x], df[col_y], config.LARGE_PLOT_ROWS)
+                    corr = engines.correlation(df[col_x], df[col_y]) if engine == "polars" else None
+                    if corr is None:
+                        corr = df[col_x].corr(df[col_y])
                     stats_for_ai = {"pearson_correlation": round(corr, 2)}
                     markdown_table = _create_stats_markdown_table(stats_for_ai)
 
@@ -202,7 +277,11 @@ def insight_node(state: GraphState) -> Dict[str, Any]:
                 groupby_col, agg_col, agg_func = details["groupby_column"], details["agg_column"], details["agg_function"]
                 if groupby_col in df.columns and agg_col in df.columns:
                     title = f"Top 15 {agg_func.title()} of '{agg_col}' by '{groupby_col}'"
-                    summary_data = df.groupby(groupby_col)[agg_col].agg(agg_func).sort_values(ascending=False).head(15)
+                    summary_data = engines.group_by_agg(df[groupby_col], df[agg_col], agg_func) if engine == "polars" else None
+                    if summary_data is None:
+                        # observed=True: a categorical key only yields the groups present in the data.
+                        summary_data = df.groupby(groupby_col, observed=True)[agg_col].agg(agg_func)
+                    summary_data = summary_data.sort_values(ascending=False).head(15)
                     stats_for_ai = summary_data.head(5).to_dict()
                     
                     table = Table(title=title)
@@ -213,25 +292,23 @@ def insight_node(state: GraphState) -> Dict[str, Any]:
                     console.print(table)
                     
                     markdown_table = _create_markdown_table(summary_data, groupby_col.title(), agg_func.title())
-                    summary_data.plot(kind='bar', color='teal')
-                    plt.title(title, fontsize=16)
+                    plot_spec = {"kind": "bar", "values": summary_data, "color": 'teal'}
             
             elif action == "count_plot" and details.get("column") in df.columns:
                 col = details["column"]
                 title = f"Top 15 Category Counts in '{col}'"
-                summary_data = df[col].value_counts().head(15)
+                summary_data = value_counts(df[col]).head(15)
                 stats_for_ai = summary_data.head(5).to_dict()
                 markdown_table = _create_markdown_table(summary_data, col.title(), "Count")
-                sns.countplot(y=df[col], order=summary_data.index, palette='viridis', hue=df[col], legend=False)
-                plt.title(title, fontsize=16)
+                plot_spec = {"kind": "horizontal_count", "values": summary_data, "label": col}
 
             elif action == "word_frequency" and details.get("text_column") in df.columns:
                 text_col = details["text_column"]
                 title = f"Top 15 Most Common Words in '{text_col}'"
-                stop_words = set(stopwords.words('english'))
-                words = ' '.join(df[text_col].dropna()).split()
-                word_counts = Counter(word for word in words if word not in stop_words)
-                insight_data = pd.Series(dict(word_counts.most_common(15)))
+                parallel = executor is not None and len(df) >= config.WORD_COUNT_PARALLEL_MIN_ROWS
+                most_common = top_words(df[text_col], _stop_words(), 15, config.WORD_COUNT_CHUNK_ROWS,
+                                        config.WORD_COUNT_MAX_VOCAB, executor if parallel else None, workers)
+                insight_data = pd.Series(dict(most_common))
                 stats_for_ai = insight_data.head(5).to_dict()
                 
                 table = Table(title=title)
@@ -241,19 +318,14 @@ def insight_node(state: GraphState) -> Dict[str, Any]:
                     table.add_row(word, str(count))
                 console.print(table)
                 markdown_table = _create_markdown_table(insight_data, "Word", "Count")
-                insight_data.plot.bar(color='cyan')
-                plt.title(title, fontsize=16)
+                plot_spec = {"kind": "bar", "values": insight_data, "color": 'cyan'}
 
-            else:
+            if plot_spec is None:
                 logger.warning(f"Skipping invalid or incomplete analysis task: {task}")
-                plt.close()
                 continue
-                
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
-            plt.savefig(plot_path)
-            plt.close()
-            logger.debug(f"Saved plot to {plot_path}")
+
+            plot_spec.update(title=title, path=plot_path)
+            plot_specs.append(plot_spec)
             
             insight_info = {
                 "summary": title, 
@@ -267,15 +339,5 @@ def insight_node(state: GraphState) -> Dict[str, Any]:
             
         except Exception as e:
             logger.error(f"Could not execute analysis task {task}. Error: {e}", exc_info=True)
-            plt.close()
 
-    if interpretation_batch:
-        findings = generate_findings_in_batch(interpretation_batch)
-        
-        for i in range(len(generated_insights)):
-            if i < len(findings):
-                generated_insights[i]["finding"] = findings[i]
-            else:
-                generated_insights[i]["finding"] = "An AI-generated finding could not be produced for this insight."
-            
-    return {"insights": {"generated_insights": generated_insights}}
\ No newline at end of file
+    return generated_insights, plot_specs, interpretation_batch
@@ -3,14 +3,11 @@ import json
 from datetime import datetime
 from typing import Dict, Any, List
 
-import google.generativeai as genai
-from dotenv import load_dotenv
-
+import config
 from state import GraphState
 from agents.logger import logger
-
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+from agents import llm_cache
+from agents.llm_client import LLMUnavailableError
 
 def generate_dataset_summary(profile: Dict[str, Any]) -> str:
     """Asks the AI to generate a high-level, natural language summary of the dataset."""
@@ -32,16 +29,28 @@ def generate_dataset_summary(profile: Dict[str, Any]) -> str:
     Generate the summary paragraph now.
     """
     
-    model = genai.GenerativeModel("gemini-2.5-flash") # Corrected model name
-    
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        return llm_cache.cached_generate("gemini-2.5-flash", prompt, purpose="dataset summary") # Corrected model name
+    except LLMUnavailableError:
+        # After retries, Gemini is down: fail the run (a re-run resumes here) rather than report without a summary.
+        raise
     except Exception as e:
         logger.error(f"Error generating dataset summary: {e}")
         return "An AI-generated summary of the dataset could not be produced."
 
 
+def dataset_summary_node(state: GraphState) -> Dict[str, Any]:
+    """
+    Writes the dataset overview for the insight report. It only needs the profile
+    from planning, so the graph runs it while the data is being cleaned.
+    """
+    logger.info("    - Executing: Dataset Summary Node")
+    data_profile = state.get('data_profile', {})
+    if not data_profile:
+        return {}
+    return {"dataset_summary": generate_dataset_summary(data_profile)}
+
+
 def insight_report_node(state: GraphState) -> Dict[str, Any]:
     """
     Gathers all generated insights, tables, and findings to create a final 
@@ -61,7 +70,7 @@ def insight_report_node(state: GraphState) -> Dict[str, Any]:
     
     if data_profile:
         report_lines.append("## Dataset Overview")
-        summary_text = generate_dataset_summary(data_profile)
+        summary_text = state.get('dataset_summary') or generate_dataset_summary(data_profile)
         report_lines.append(summary_text)
         report_lines.append("---")
 
@@ -96,7 +105,7 @@ def insight_report_node(state: GraphState) -> Dict[str, Any]:
     report_lines.append("\n---\n*End of Report*")
     
     report_content = "\n".join(report_lines)
-    report_path = "outputs/insights/insight_report.md"
+    report_path = os.path.join(config.get_option(state, "output_dir"), "insights", "insight_report.md")
     
     try:
         os.makedirs(os.path.dirname(report_path), exist_ok=True)
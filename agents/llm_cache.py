@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import config
+from agents import llm_client, llm_ledger, tracing
+from agents.logger import logger
+
+# Bump when the stored entry layout changes so old entries are simply missed.
+CACHE_VERSION = 1
+
+# An entry's file mtime is when it was stored, which the TTL counts from; its atime is
+# set on every hit and orders the least recently used for eviction. Walking the cache
+# costs a stat per entry, so `put` evicts on the first write of the process and then
+# only once its running estimate of the cache size passes LLM_CACHE_MAX_MB.
+_size_lock = threading.Lock()
+_size_estimate: Optional[int] = None
+
+
+def cache_key(model: str, generation_config: Optional[Dict[str, Any]], prompt: str) -> str:
+    """Content address of one LLM call: the model, its generation config and the prompt."""
+    call = {"v": CACHE_VERSION, "model": model, "config": generation_config or {}, "prompt": prompt}
+    # Answers from another endpoint (e.g. a local stub server) are kept apart from Gemini's.
+    if config.LLM_API_ENDPOINT:
+        call["endpoint"] = config.LLM_API_ENDPOINT
+    payload = json.dumps(call, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def schema_fingerprint(profile: Dict[str, Any]) -> str:
+    """
+    Hash of a dataset's shape rather than its exact statistics: column names and
+    types, whether values are missing, and bucketed cardinality and magnitude. A
+    re-delivery of the same dataset with fresh rows maps to the same fingerprint.
+    """
+    def magnitude(value: Any) -> Any:
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        if value != value:
+            return None
+        # Sign plus number of integer digits, e.g. 412.0 -> '+3'.
+        return f"{'-' if value < 0 else '+'}{len(str(int(abs(value))))}"
+
+    columns = []
+    for name, stats in (profile.get("columns") or {}).items():
+        entry = {"name": name, "type": stats.get("data_type")}
+        if stats.get("data_type") != "identifier":
+            entry["missing"] = bool(stats.get("missing_values_count"))
+        if "unique_values_count" in stats:
+            unique = stats["unique_values_count"]
+            # Small category sets drive binary encoding and valid-value filters, so keep them exact.
+            if unique <= 10:
+                entry["unique"] = unique
+                entry["values"] = sorted(stats.get("top_5_values", {}))
+            else:
+                entry["unique"] = magnitude(unique)
+        if "mean" in stats:
+            entry["min"] = magnitude(stats.get("min"))
+            entry["mean"] = magnitude(stats.get("mean"))
+        columns.append(entry)
+
+    payload = json.dumps({"v": CACHE_VERSION, "columns": columns}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key: str) -> str:
+    return os.path.join(config.LLM_CACHE_DIR, key[:2], f"{key}.json")
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _expired(stored_at: float, now: float) -> bool:
+    return now - stored_at > config.LLM_CACHE_TTL_HOURS * 3600
+
+
+def get(key: str) -> Optional[str]:
+    """Returns the cached response text for a key, or None if missing or expired."""
+    if not config.LLM_CACHE:
+        return None
+    path = _entry_path(key)
+    now = time.time()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            stored_at = os.fstat(f.fileno()).st_mtime
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if _expired(stored_at, now):
+        _remove(path)
+        return None
+    # Records the use in the atime, keeping the mtime the TTL counts from.
+    try:
+        os.utime(path, (now, stored_at))
+    except OSError:
+        pass
+    return entry.get("text")
+
+
+def put(key: str, text: str, **metadata: Any) -> None:
+    """Stores a response text under a key, evicting stale and least recently used entries when due."""
+    if not config.LLM_CACHE:
+        return
+    path = _entry_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename, so concurrent runs never read a partial entry.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "text": text, **metadata}, f, ensure_ascii=False)
+            size = f.tell()
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write LLM cache entry {key[:12]}: {e}")
+        return
+    global _size_estimate
+    with _size_lock:
+        if _size_estimate is not None:
+            _size_estimate += size
+        if _size_estimate is None or _size_estimate > config.LLM_CACHE_MAX_MB * 1024 * 1024:
+            _size_estimate = evict()
+
+
+def invalidate(key: str) -> None:
+    """Deletes one entry, e.g. when its cached response turned out to be unusable."""
+    _remove(_entry_path(key))
+
+
+def evict() -> int:
+    """
+    Deletes entries stored longer ago than the TTL, then the least recently used until
+    the cache fits its budget. Returns the size of what is left, in bytes.
+    """
+    if not os.path.isdir(config.LLM_CACHE_DIR):
+        return 0
+    now = time.time()
+    entries = []
+    for root, _, files in os.walk(config.LLM_CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if _expired(stat.st_mtime, now):
+                _remove(path)
+                continue
+            entries.append((stat.st_atime, stat.st_size, path))
+
+    budget = config.LLM_CACHE_MAX_MB * 1024 * 1024
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= budget:
+            break
+        _remove(path)
+        total -= size
+    return total
+
+
+def load(key: str, parse: Optional[Callable[[str], Any]] = None) -> Any:
+    """Returns the cached response for a key (parsed if `parse` is given), or None on a miss."""
+    text = get(key)
+    if text is None:
+        return None
+    try:
+        return parse(text) if parse else text
+    except Exception:
+        invalidate(key)
+        return None
+
+
+def lookup(model_name: str, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+           parse: Optional[Callable[[str], Any]] = None, purpose: str = "") -> Any:
+    """Cache-only half of `cached_generate`: never touches the network. Hits are traced and added to the call ledger."""
+    ts_us = time.time_ns() / 1000
+    started = time.perf_counter()
+    result = load(cache_key(model_name, generation_config, prompt), parse)
+    if result is not None:
+        elapsed = time.perf_counter() - started
+        logger.debug(f"LLM cache hit for {model_name}.")
+        tracing.add_span(f"gemini {model_name}", "llm", ts_us, elapsed * 1_000_000, purpose=purpose,
+                         prompt_chars=len(prompt), cache="hit")
+        llm_ledger.record(purpose, model_name, prompt, "hit", elapsed, parsed=True)
+    return result
+
+
+def generate_and_store(model_name: str, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                       parse: Optional[Callable[[str], Any]] = None, purpose: str = "") -> Any:
+    """
+    Network half of `cached_generate`, for callers that have already missed with `lookup`:
+    asks the model, and caches the answer if it parses.
+    """
+    with tracing.span(f"gemini {model_name}", cat="llm", purpose=purpose, prompt_chars=len(prompt), cache="miss") as span:
+        started = time.perf_counter()
+        text, parsed, error = None, None, ""
+        try:
+            text = llm_client.generate(model_name, prompt, generation_config)
+            span.set(response_chars=len(text))
+            parsed = False
+            result = parse(text) if parse else text
+            parsed = True
+        except Exception as e:
+            # A response that does not parse is counted as a parse failure, not a failed call.
+            if text is None:
+                error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            llm_ledger.record(purpose, model_name, prompt, "miss", time.perf_counter() - started,
+                              span.args.get("retries", 0), text, span.args.get("prompt_tokens"),
+                              span.args.get("response_tokens"), parsed, error)
+        put(cache_key(model_name, generation_config, prompt), text, model=model_name)
+        return result
+
+
+def cached_generate(model_name: str, prompt: str, generation_config: Optional[Dict[str, Any]] = None,
+                    parse: Optional[Callable[[str], Any]] = None, purpose: str = "") -> Any:
+    """
+    Returns the model's response text for the prompt (or `parse(text)`), serving it
+    from the on-disk cache when possible. Only responses that parse are stored, so a
+    malformed answer is retried on the next run instead of being replayed. Every call
+    is added to the call ledger under `purpose`, e.g. 'cleaning plan'.
+    """
+    cached = lookup(model_name, prompt, generation_config, parse, purpose)
+    if cached is not None:
+        return cached
+    return generate_and_store(model_name, prompt, generation_config, parse, purpose)
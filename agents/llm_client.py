@@ -0,0 +1,161 @@
+import os
+import json
+import random
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import config
+from agents import tracing
+from agents.logger import logger
+
+# One Gemini client per process, shared by every node and thread. Model handles are
+# built once per model and generation config and reused, so the client's connections
+# (a gRPC channel, or a pooled HTTP session with `rest`) stay warm between calls. At
+# most LLM_MAX_CONCURRENCY requests are in flight at once. A request that fails for a
+# transient reason is retried with jittered exponential backoff, and a circuit breaker
+# makes calls fail fast once the service keeps failing, instead of probing connectivity
+# before every plan.
+
+MAX_BACKOFF_SECONDS = 30.0
+
+
+class LLMUnavailableError(ConnectionError):
+    """Gemini could not be reached: the retries ran out, or the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Counts failed requests in a row. Once `failures` is reached the circuit opens and
+    `allow` refuses requests for `cooldown_s` seconds. After that it lets one request
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failures: int, cooldown_s: float):
+        self.failures = failures
+        self.cooldown_s = cooldown_s
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown_s:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            if self._probing or self._consecutive >= self.failures:
+                if self._opened_at is None or self._probing:
+                    logger.warning(f"Gemini failed {self._consecutive} times in a row; pausing requests for {self.cooldown_s:g}s.")
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+
+_breaker = CircuitBreaker(config.LLM_BREAKER_FAILURES, config.LLM_BREAKER_COOLDOWN_SECONDS)
+_slots = threading.BoundedSemaphore(max(1, config.LLM_MAX_CONCURRENCY))
+
+
+@lru_cache(maxsize=1)
+def _genai():
+    """
+    The Gemini client, imported and configured on the first request. It takes about a
+    second to import, which runs served from the cache never pay.
+    """
+    import google.generativeai as genai
+    options = {"api_endpoint": config.LLM_API_ENDPOINT} if config.LLM_API_ENDPOINT else None
+    # An http(s):// endpoint (a stub server, a gateway) speaks REST.
+    transport = config.LLM_TRANSPORT or ("rest" if config.LLM_API_ENDPOINT.startswith("http") else None)
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"), transport=transport, client_options=options)
+    return genai
+
+
+@lru_cache(maxsize=None)
+def _model(model_name: str, generation_config: str):
+    """A reusable model handle per model and (JSON-encoded) generation config."""
+    return _genai().GenerativeModel(model_name, generation_config=json.loads(generation_config) or None)
+
+
+def _is_transient(error: Exception) -> bool:
+    """Errors worth retrying: timeouts, dropped connections, rate limiting and server errors."""
+    from google.api_core import exceptions as api_errors
+    return isinstance(error, (
+        api_errors.TooManyRequests, api_errors.ResourceExhausted, api_errors.InternalServerError,
+        api_errors.BadGateway, api_errors.ServiceUnavailable, api_errors.GatewayTimeout,
+        api_errors.DeadlineExceeded, OSError,
+    ))
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Full-jitter exponential backoff: a random wait of up to base * 2^attempt, capped."""
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, config.LLM_BACKOFF_SECONDS * 2 ** attempt))
+
+
+def _usage(response: Any) -> Dict[str, int]:
+    """The prompt and response token counts the service reported, if it did."""
+    usage = getattr(response, "usage_metadata", None)
+    counts = {"prompt_tokens": getattr(usage, "prompt_token_count", 0),
+              "response_tokens": getattr(usage, "candidates_token_count", 0)}
+    return {name: int(count) for name, count in counts.items() if count}
+
+
+def generate(model_name: str, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Sends one prompt and returns the response text. Transient failures are retried up
+    to LLM_MAX_RETRIES times; other errors (a rejected request, a blocked response) are
+    raised at once. Raises LLMUnavailableError when the retries run out or the circuit
+    breaker is open.
+    """
+    model = _model(model_name, json.dumps(generation_config or {}, sort_keys=True))
+    # The library's own retry (up to 10 minutes on 503s) is off; the loop below retries instead.
+    request_options = {"timeout": config.LLM_TIMEOUT_SECONDS, "retry": None}
+    retries = 0
+    while True:
+        if not _breaker.allow():
+            raise LLMUnavailableError(
+                f"Gemini is unavailable: requests are paused after {config.LLM_BREAKER_FAILURES} failures in a row. Try again later.")
+        try:
+            with _slots:
+                response = model.generate_content(prompt, request_options=request_options)
+            text = response.text
+        except Exception as e:
+            if not _is_transient(e):
+                # The service answered, so it is up; the request itself was at fault.
+                _breaker.record_success()
+                raise
+            _breaker.record_failure()
+            if retries >= config.LLM_MAX_RETRIES or _breaker.is_open:
+                tracing.annotate(retries=retries)
+                raise LLMUnavailableError(f"Gemini request failed after {retries + 1} attempts: {e}") from e
+            wait = backoff_seconds(retries)
+            retries += 1
+            logger.debug(f"Gemini request failed ({type(e).__name__}: {e}); retry {retries} in {wait:.1f}s.")
+            time.sleep(wait)
+            continue
+        _breaker.record_success()
+        tracing.annotate(retries=retries, **_usage(response))
+        return text
+
+
+def reset() -> None:
+    """Forgets model handles and closes the circuit, e.g. after swapping in a stub model."""
+    _model.cache_clear()
+    _breaker.record_success()
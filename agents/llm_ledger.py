@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import statistics
+import threading
+from typing import Any, Dict, List, Optional
+
+import config
+from agents.logger import logger
+
+# One record per model call of the current run, served from the cache or not: which
+# prompt it was, how big, how long it took and what it cost in tokens. Nodes call the
+# model from several threads at once, so every access goes through the lock. After the
+# run the records are saved next to its outputs and appended to a history shared by all
+# runs, which shows prompts growing (e.g. on ever wider datasets) before they get slow.
+
+_lock = threading.Lock()
+_records: List[Dict[str, Any]] = []
+
+# Gemini's tokenizer averages about four characters of English text per token. Used
+# when the response carries no usage counts, and for answers served from the cache.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def start_ledger() -> None:
+    """Discards records from a previous run in this process."""
+    with _lock:
+        _records.clear()
+
+
+def record(purpose: str, model: str, prompt: str, cache: str, latency_s: float = 0.0, retries: int = 0,
+           response: Optional[str] = None, prompt_tokens: Optional[int] = None,
+           response_tokens: Optional[int] = None, parsed: Optional[bool] = None, error: str = "") -> None:
+    """
+    Adds one call. `cache` is 'hit', 'miss' or 'schema' (a plan reused from a dataset with
+    the same schema); token counts left out are estimated from the text.
+    """
+    # Hits and reused plans have no usage counts; their prompt size is still estimated.
+    estimated = cache == "miss" and (prompt_tokens is None or (response is not None and response_tokens is None))
+    entry = {
+        "ts": time.time(),
+        "purpose": purpose or "other",
+        "model": model,
+        "cache": cache,
+        "prompt_bytes": len(prompt.encode("utf-8")),
+        "prompt_tokens": prompt_tokens if prompt_tokens is not None else estimate_tokens(prompt),
+        "response_tokens": response_tokens if response_tokens is not None else estimate_tokens(response or ""),
+        "tokens_estimated": estimated,
+        "latency_s": round(latency_s, 4),
+        "retries": retries,
+        "parsed": parsed,
+        "error": error,
+    }
+    if entry["prompt_tokens"] >= config.LLM_PROMPT_WARN_TOKENS:
+        logger.warning(f"The {entry['purpose']} prompt is {entry['prompt_tokens']:,} tokens "
+                       f"(warning threshold {config.LLM_PROMPT_WARN_TOKENS:,}); calls will slow down as it grows.")
+    with _lock:
+        _records.append(entry)
+
+
+def records() -> List[Dict[str, Any]]:
+    with _lock:
+        return list(_records)
+
+
+def write_ledger(path: str) -> str:
+    """Saves the run's records as JSON Lines."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in records():
+            f.write(json.dumps(entry) + "\n")
+    return path
+
+
+def append_history(run: Dict[str, Any]) -> None:
+    """
+    Appends the run's records, tagged with `run` (its id and input), to LLM_LEDGER_HISTORY.
+    Each record is one short line written in append mode, so concurrent batch jobs can
+    share the file. Once it holds LLM_LEDGER_HISTORY_RUNS runs, it is renamed to
+    `<file>.1` (replacing the one before) and a new file is started; the file is never
+    rewritten, so a record appended meanwhile by another job moves along with it.
+    """
+    path = config.LLM_LEDGER_HISTORY
+    entries = records()
+    if not path or not entries:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps({**run, **entry}) + "\n")
+    with open(path, "r", encoding="utf-8") as f:
+        runs = {entry["run"] for entry in _read_entries(f)}
+        counted = os.fstat(f.fileno())
+    if len(runs) < config.LLM_LEDGER_HISTORY_RUNS:
+        return
+    try:
+        # Another job may have rotated the file since it was counted.
+        current = os.stat(path)
+        if (current.st_dev, current.st_ino) == (counted.st_dev, counted.st_ino):
+            os.replace(path, f"{path}.1")
+    except OSError as e:
+        # On Windows a file another job has open cannot be renamed; a later run rotates it.
+        logger.debug(f"Could not rotate the call history {path}: {e}")
+
+
+def _read_entries(lines) -> List[Dict[str, Any]]:
+    entries = []
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(entry, dict) and "run" in entry:
+            entries.append(entry)
+    return entries
+
+
+def read_history() -> List[Dict[str, Any]]:
+    """Records of earlier runs, oldest first; unreadable lines (e.g. a torn write) are skipped."""
+    path = config.LLM_LEDGER_HISTORY
+    if not path:
+        return []
+    entries = []
+    for part in (f"{path}.1", path):
+        if os.path.exists(part):
+            with open(part, "r", encoding="utf-8") as f:
+                entries.extend(_read_entries(f))
+    return entries
+
+
+def _fmt(value: Any, digits: int = 0) -> str:
+    if value is None:
+        return ""
+    return f"{value:,.{digits}f}"
+
+
+def _by_purpose(entries: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in entries:
+        groups.setdefault(entry.get("purpose", "other"), []).append(entry)
+    return groups
+
+
+def ledger_table() -> str:
+    """Markdown table of the run's model calls, one row per purpose."""
+    entries = records()
+    if not entries:
+        return "No model calls were made in this run (stages reused from checkpoints make none)."
+
+    lines = [
+        "| Call | Calls | Cache hits | Largest prompt (KB) | Largest prompt (tokens) | Tokens in | Tokens out "
+        "| Total latency (s) | Retries | Parse failures |",
+        "|:---|---:|---:|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    groups = sorted(_by_purpose(entries).items(), key=lambda item: (-sum(e["latency_s"] for e in item[1]), item[0]))
+    for purpose, calls in groups:
+        # Only calls that reached the model spend tokens; hits and reused plans cost none.
+        misses = [e for e in calls if e["cache"] == "miss"]
+        estimated = "~" if any(e["tokens_estimated"] for e in misses) else ""
+        lines.append(
+            f"| {purpose} | {len(calls)} | {len(calls) - len(misses)} | {_fmt(max(e['prompt_bytes'] for e in calls) / 1024, 1)} "
+            f"| {_fmt(max(e['prompt_tokens'] for e in calls))} "
+            f"| {estimated}{_fmt(sum(e['prompt_tokens'] for e in misses))} "
+            f"| {estimated}{_fmt(sum(e['response_tokens'] for e in misses))} "
+            f"| {_fmt(sum(e['latency_s'] for e in calls), 2)} | {sum(e['retries'] for e in calls)} "
+            f"| {sum(1 for e in calls if e['parsed'] is False)} |"
+        )
+    misses = [e for e in entries if e["cache"] == "miss"]
+    errors = sum(1 for e in misses if e["error"])
+    lines.append(f"\n**Tokens sent to the model:** {sum(e['prompt_tokens'] for e in misses):,} in, "
+                 f"{sum(e['response_tokens'] for e in misses):,} out, over {len(misses)} uncached calls"
+                 f"{f' ({errors} failed)' if errors else ''}. "
+                 "Counts marked ~ include estimates at four characters per token, for responses that "
+                 "did not report usage.")
+    return "\n".join(lines)
+
+
+def history_table(input_name: str) -> str:
+    """
+    Markdown table comparing this run's prompts with earlier runs on the same input file
+    in LLM_LEDGER_HISTORY, to spot prompts growing as re-deliveries get wider.
+    """
+    history = [entry for entry in read_history() if entry.get("input") == input_name]
+    if not history:
+        return ""
+
+    lines = [
+        "| Call | Runs | Median prompt tokens | Largest prompt tokens | This run's prompt tokens | Median uncached latency (s) |",
+        "|:---|---:|---:|---:|---:|---:|",
+    ]
+    current = {purpose: max(e["prompt_tokens"] for e in calls) for purpose, calls in _by_purpose(records()).items()}
+    for purpose, calls in sorted(_by_purpose(history).items()):
+        # One value per run: the largest prompt of that purpose (wide tables send several shards).
+        per_run: Dict[str, int] = {}
+        for e in calls:
+            per_run[e["run"]] = max(per_run.get(e["run"], 0), e["prompt_tokens"])
+        latencies = [e["latency_s"] for e in calls if e["cache"] == "miss" and not e["error"]]
+        lines.append(
+            f"| {purpose} | {len(per_run)} | {_fmt(statistics.median(per_run.values()))} | {_fmt(max(per_run.values()))} "
+            f"| {_fmt(current.get(purpose))} | {_fmt(statistics.median(latencies) if latencies else None, 2)} |"
+        )
+    return "\n".join(lines)
@@ -1,4 +1,5 @@
 import logging
+import multiprocessing
 import sys
 import os
 from datetime import datetime
@@ -9,7 +10,6 @@ def setup_logger():
     Sets up a single, project-wide logger that uses RichHandler for
     beautiful console output and a FileHandler for detailed logs.
     """
-    os.makedirs("logs", exist_ok=True)
     logger = logging.getLogger('rtgs_ai_analyst')
     logger.setLevel(logging.DEBUG)
     logger.propagate = False
@@ -17,22 +17,47 @@ def setup_logger():
     if logger.hasHandlers():
         logger.handlers.clear()
 
+    console_handler = RichHandler(
+        show_path=False, log_time_format="[%X]", markup=True
+    )
+    console_handler.setLevel(logging.INFO)
+    logger.addHandler(console_handler)
+
+    # Spawned worker processes re-import the entry module (and with it this one);
+    # only the main process writes the run log.
+    if multiprocessing.parent_process() is not None:
+        return logger
+
+    os.makedirs("logs", exist_ok=True)
+    log_filename = f"logs/run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+    logger.addHandler(_file_handler(log_filename))
+    return logger
+
+def _file_handler(log_filename: str) -> logging.FileHandler:
     file_formatter = logging.Formatter(
         '%(asctime)s - %(levelname)s - %(module)s:%(lineno)d - %(message)s'
     )
-    log_filename = f"logs/run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
     file_handler = logging.FileHandler(log_filename, encoding='utf-8')
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(file_formatter)
+    return file_handler
 
-    console_handler = RichHandler(
-        show_path=False, log_time_format="[%X]", markup=True
-    )
-    console_handler.setLevel(logging.INFO)
+def add_log_file(log_filename: str) -> logging.Handler:
+    """Also writes the detailed log to the given file, e.g. one per batch job. Pass the result to `remove_log_file`."""
+    os.makedirs(os.path.dirname(log_filename) or ".", exist_ok=True)
+    handler = _file_handler(log_filename)
+    logger.addHandler(handler)
+    return handler
 
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    return logger
+def remove_log_file(handler: logging.Handler) -> None:
+    logger.removeHandler(handler)
+    handler.close()
+
+def quiet_console() -> None:
+    """Limits console output to warnings, e.g. in batch workers whose output would interleave."""
+    for handler in logger.handlers:
+        if isinstance(handler, RichHandler):
+            handler.setLevel(logging.WARNING)
 
 def log_error_and_exit(logger_instance: logging.Logger, exc: Exception):
     """Logs the full exception and provides a clean exit for the user."""
@@ -0,0 +1,138 @@
+import io
+import math
+import os
+import logging
+import pandas as pd
+from concurrent.futures import Executor
+from typing import Dict, Any, List, Tuple
+
+# Worker processes import this module, so it uses the named logger rather than
+# importing agents.logger (which would open a new log file in every worker).
+logger = logging.getLogger('rtgs_ai_analyst')
+
+# Byte-range splitting relies on '\n' and '"' being single bytes.
+ASCII_COMPATIBLE_ENCODINGS = ('utf-8', 'utf-8-sig', 'cp1252', 'latin-1')
+SCAN_BLOCK_BYTES = 16 * 1024 * 1024
+TARGET_PART_BYTES = 64 * 1024 * 1024
+
+
+def find_record_boundaries(path: str, parts: int, quotechar: bytes = b'"') -> List[int]:
+    """
+    Returns byte offsets that split the file into roughly equal ranges of whole
+    records. The first offset is the end of the header record and the last is
+    the file size. An offset is only placed after a newline that sits outside
+    quotes (an even number of quote characters since the start of the file),
+    so quoted fields spanning several lines are never cut.
+    """
+    size = os.path.getsize(path)
+    boundaries: List[int] = []
+    targets: List[int] = []
+    parity = 0
+    pos = 0
+
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(SCAN_BLOCK_BYTES)
+            if not block:
+                break
+            i = 0
+            while True:
+                if not boundaries:
+                    search_from = i  # the header ends at the first unquoted newline
+                else:
+                    while targets and targets[0] <= boundaries[-1]:
+                        targets.pop(0)
+                    if not targets or targets[0] >= pos + len(block):
+                        break
+                    search_from = max(i, targets[0] - pos)
+                parity ^= block.count(quotechar, i, search_from) & 1
+                i = search_from
+                found = False
+                while True:
+                    newline = block.find(b'\n', i)
+                    if newline == -1:
+                        break
+                    parity ^= block.count(quotechar, i, newline) & 1
+                    i = newline + 1
+                    if parity == 0:
+                        found = True
+                        break
+                if not found:
+                    break
+                boundaries.append(pos + i)
+                if len(boundaries) == 1:
+                    step = (size - boundaries[0]) / parts
+                    targets = [boundaries[0] + math.ceil(step * k) for k in range(1, parts)]
+            parity ^= block.count(quotechar, i) & 1
+            pos += len(block)
+
+    if not boundaries:
+        boundaries.append(size)
+    if boundaries[-1] != size:
+        boundaries.append(size)
+    return boundaries
+
+
+def _parse_range(path: str, start: int, end: int, columns: List[str], read_options: Dict[str, Any],
+                 text_columns: Tuple[str, ...] = ()) -> pd.DataFrame:
+    """Parses the records in bytes [start, end) of the file. Runs in a worker process."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return pd.read_csv(
+        io.BytesIO(data),
+        header=None,
+        names=columns,
+        dtype={col: str for col in text_columns} or None,
+        engine='c',
+        **read_options
+    )
+
+
+def _conflicting_columns(parts: List[pd.DataFrame]) -> List[str]:
+    """Columns parsed as text in one range but as numbers or booleans (with values) in another."""
+    conflicts = []
+    for col in parts[0].columns:
+        typed = [p[col] for p in parts if p[col].dtype != object and p[col].notna().any()]
+        has_text = any(p[col].dtype == object for p in parts)
+        kinds = {s.dtype.kind for s in typed}
+        if typed and (has_text or ('b' in kinds and len(kinds) > 1)):
+            conflicts.append(col)
+    return conflicts
+
+
+def read_csv_parallel(path: str, read_options: Dict[str, Any], executor: Executor, workers: int) -> pd.DataFrame:
+    """
+    Parses a well-formed CSV by splitting it into newline-aligned byte ranges and
+    reading them concurrently. Returns the same frame as a single `pd.read_csv`.
+    """
+    parts = max(workers, math.ceil(os.path.getsize(path) / TARGET_PART_BYTES))
+    boundaries = find_record_boundaries(path, parts)
+    ranges = list(zip(boundaries[:-1], boundaries[1:]))
+    logger.debug(f"Parsing {len(ranges)} byte ranges with {workers} workers.")
+
+    with open(path, 'rb') as f:
+        header = f.read(boundaries[0])
+    columns = list(pd.read_csv(io.BytesIO(header), nrows=0, **read_options).columns)
+    if not ranges:
+        return pd.DataFrame(columns=columns)
+
+    def parse_all(text_columns: Tuple[str, ...], selected: List[int]) -> List[pd.DataFrame]:
+        futures = [
+            executor.submit(_parse_range, path, ranges[k][0], ranges[k][1], columns, read_options, text_columns)
+            for k in selected
+        ]
+        return [future.result() for future in futures]
+
+    frames = parse_all((), list(range(len(ranges))))
+
+    # A column typed differently across ranges would have been read as text by a
+    # single pass; re-read just the ranges that guessed a type, with those columns as text.
+    conflicts = _conflicting_columns(frames)
+    if conflicts:
+        logger.debug(f"Re-reading ranges with mixed-type columns as text: {conflicts}")
+        retry = [k for k, frame in enumerate(frames) if any(frame[c].dtype != object for c in conflicts)]
+        for k, frame in zip(retry, parse_all(tuple(conflicts), retry)):
+            frames[k] = frame
+
+    return pd.concat(frames, ignore_index=True)
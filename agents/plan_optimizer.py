@@ -0,0 +1,268 @@
+import copy
+import re
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from agents.logger import logger
+
+# Marker for steps whose outcome depends on every column (e.g. full-row duplicates).
+ALL_COLUMNS = "*"
+
+CUSTOM_FUNCTIONS = {"calculate_year_span"}
+SCALING_STRATEGIES = {"min_max", "standard"}
+AGGREGATE_FILL_STRATEGIES = {"mean", "median", "mode"}
+# Steps that give the same result when repeated with nothing in between touching their columns.
+IDEMPOTENT_ACTIONS = {"remove_duplicates", "clean_text", "clean_categorical", "fill_missing"}
+
+
+def _step_column(step: Dict[str, Any]) -> Optional[str]:
+    return step.get("column") or (step.get("details") or {}).get("column")
+
+
+def _subset(step: Dict[str, Any]) -> List[str]:
+    """The columns a remove_duplicates step compares; empty for whole rows."""
+    subset = (step.get("details") or {}).get("subset") or []
+    return [subset] if isinstance(subset, str) else list(subset)
+
+
+def describe_step(step: Dict[str, Any]) -> str:
+    """Short human-readable label, e.g. 'clean_text on `review_text`'."""
+    column = _step_column(step)
+    if step.get("action") == "remove_duplicates" and _subset(step):
+        column = "`, `".join(_subset(step))
+    if step.get("action") == "create_feature":
+        column = (step.get("details") or {}).get("new_column_name")
+    return f"{step.get('action')} on `{column}`" if column else str(step.get("action"))
+
+
+def step_effects(step: Dict[str, Any], schema: List[str]) -> Dict[str, Any]:
+    """
+    Describes what a step does to the frame, given the columns that exist when it runs:
+    the columns it reads and writes, the columns it creates or drops, whether it can
+    remove rows, and whether its result depends on which rows are present.
+    """
+    action = step.get("action")
+    details = step.get("details") or {}
+    column = _step_column(step)
+    effects = {
+        "reads": set(), "writes": set(), "creates": set(), "drops": set(),
+        "filters_rows": False, "row_dependent": False,
+    }
+
+    if action == "remove_duplicates":
+        effects["reads"] = set(_subset(step)) or {ALL_COLUMNS}
+        effects["filters_rows"] = True
+    elif action == "remove_column":
+        effects["reads"] = {column}
+        effects["drops"] = {column}
+    elif action == "clean_categorical":
+        effects["reads"] = {column}
+        effects["filters_rows"] = True
+    elif action in ("clean_text", "encode_binary", "scale_numeric", "convert_type", "fill_missing"):
+        effects["reads"] = {column}
+        effects["writes"] = {column}
+        # Statistics (min/max, mean, mode, ...) and to_numeric's dtype inference
+        # change with the set of rows the step sees.
+        effects["row_dependent"] = (
+            action == "scale_numeric"
+            or (action == "fill_missing" and details.get("strategy") in AGGREGATE_FILL_STRATEGIES)
+            or (action == "convert_type" and details.get("new_type") not in ("int64", "float64"))
+        )
+    elif action == "create_feature":
+        new_col = details.get("new_column_name")
+        identifiers = set(re.findall(r"[A-Za-z_][A-Za-z0-9_]*", str(details.get("expression", ""))))
+        effects["reads"] = identifiers & set(schema)
+        effects["writes"] = {new_col}
+    elif action == "execute_custom_function":
+        effects["reads"] = {details.get("source_column")}
+        effects["writes"] = {column}
+
+    effects["creates"] = {c for c in effects["writes"] if c not in schema}
+    return effects
+
+
+def invalid_reason(step: Dict[str, Any], schema: List[str]) -> Optional[str]:
+    """Why the executor would skip or fail on this step, or None if it would run."""
+    action = step.get("action")
+    details = step.get("details") or {}
+    column = _step_column(step)
+
+    if action == "remove_duplicates":
+        missing = [c for c in _subset(step) if c not in schema]
+        return f"subset column `{missing[0]}` does not exist at this point" if missing else None
+    if action == "create_feature":
+        if not (details.get("new_column_name") and details.get("expression")):
+            return "it has no new column name or expression"
+        return None
+    if action not in ("remove_column", "clean_text", "clean_categorical", "encode_binary",
+                      "scale_numeric", "convert_type", "fill_missing", "execute_custom_function"):
+        return f"'{action}' is not a supported action"
+    if not column:
+        return "it names no column"
+    if action == "execute_custom_function":
+        if details.get("function_name") not in CUSTOM_FUNCTIONS:
+            return f"custom function '{details.get('function_name')}' is not in the library"
+        if details.get("source_column") not in schema:
+            return f"source column `{details.get('source_column')}` does not exist at this point"
+        return None
+    if column not in schema:
+        return f"column `{column}` does not exist at this point"
+    if action == "clean_categorical" and not details.get("valid_values"):
+        return "it lists no valid values"
+    if action == "encode_binary" and not details.get("positive_value"):
+        return "it gives no positive value"
+    return None
+
+
+def _schemas(steps: List[Dict[str, Any]], columns: List[str]) -> List[List[str]]:
+    """The columns present just before each step runs."""
+    schema = list(columns)
+    schemas = []
+    for step in steps:
+        schemas.append(list(schema))
+        effects = step_effects(step, schema)
+        schema = [c for c in schema if c not in effects["drops"]] + sorted(effects["creates"])
+    return schemas
+
+
+def _touches(effects: Dict[str, Any], columns: Set[str]) -> bool:
+    touched = effects["reads"] | effects["writes"] | effects["drops"]
+    return ALL_COLUMNS in touched or bool(touched & columns)
+
+
+def _can_move_before(step: Dict[str, Any], prev: Dict[str, Any], schema: List[str]) -> bool:
+    """True if running `step` before `prev` gives the same frame as running it after."""
+    s = step_effects(step, schema)
+    p = step_effects(prev, schema)
+    action = step.get("action")
+
+    if action == "remove_column":
+        return not _touches(p, s["drops"])
+    if action == "clean_categorical":
+        if p["writes"] & s["reads"] or p["row_dependent"]:
+            return False
+        # Two filters on one column commute, but swapping them saves nothing; they are
+        # merged in step 5 instead.
+        if prev.get("action") == "clean_categorical" and _step_column(prev) == _step_column(step):
+            return False
+        # Duplicate rows agree on every column the dedupe compares, so they pass
+        # or fail the filter together; otherwise the two row filters do not commute.
+        if prev.get("action") == "remove_duplicates":
+            return ALL_COLUMNS in p["reads"] or bool(s["reads"] <= p["reads"])
+        return True
+    if action == "remove_duplicates":
+        if p["row_dependent"] or p["drops"]:
+            return False
+        if prev.get("action") == "clean_categorical":
+            return ALL_COLUMNS in s["reads"] or p["reads"] <= s["reads"]
+        # Only steps that add derived columns leave row equality unchanged, as long as
+        # the columns compared already exist.
+        return p["writes"] == p["creates"] and not p["writes"] & s["reads"] and not p["filters_rows"]
+    return False
+
+
+def optimize_plan(plan: Dict[str, Any], columns: List[str]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Rewrites the AI cleaning plan into an equivalent but cheaper one for a frame with
+    the given columns. Returns the new plan and a list of human-readable rewrites.
+    """
+    if "steps" not in plan or not isinstance(plan["steps"], list):
+        return plan, []
+
+    steps = [copy.deepcopy(step) for step in plan["steps"] if isinstance(step, dict)]
+    labels = {id(step): f"step {i + 1} ({describe_step(step)})" for i, step in enumerate(steps)}
+    rewrites: List[str] = []
+
+    changed = True
+    while changed:
+        changed = False
+
+        # 1. Drop steps the executor would skip or fail on, given the columns at that point.
+        schemas = _schemas(steps, columns)
+        for i, step in enumerate(steps):
+            reason = invalid_reason(step, schemas[i])
+            if reason:
+                rewrites.append(f"Dropped {labels[id(step)]}: {reason}.")
+                del steps[i]
+                changed = True
+                break
+        if changed:
+            continue
+
+        # 2. Drop writes to a column that is removed before anything reads it.
+        schemas = _schemas(steps, columns)
+        for i, step in enumerate(steps):
+            effects = step_effects(step, schemas[i])
+            if effects["filters_rows"] or effects["drops"] or not effects["writes"]:
+                continue
+            for later_index, later in enumerate(steps[i + 1:], start=i + 1):
+                later_effects = step_effects(later, schemas[later_index])
+                if later_effects["drops"] >= effects["writes"]:
+                    rewrites.append(f"Dropped {labels[id(step)]}: the column is removed by {labels[id(later)]} before it is used.")
+                    del steps[i]
+                    changed = True
+                    break
+                if _touches(later_effects, effects["writes"]):
+                    break
+            if changed:
+                break
+        if changed:
+            continue
+
+        # 3. Drop repeats of idempotent steps when nothing in between touched their columns.
+        schemas = _schemas(steps, columns)
+        for i, step in enumerate(steps):
+            if step.get("action") not in IDEMPOTENT_ACTIONS:
+                continue
+            effects = step_effects(step, schemas[i])
+            watched = effects["reads"] | effects["writes"]
+            for later_index, later in enumerate(steps[i + 1:], start=i + 1):
+                same = (later.get("action"), _step_column(later), later.get("details")) == \
+                       (step.get("action"), _step_column(step), step.get("details"))
+                if same:
+                    rewrites.append(f"Dropped {labels[id(later)]}: it repeats {labels[id(step)]}.")
+                    del steps[later_index]
+                    changed = True
+                    break
+                later_effects = step_effects(later, schemas[later_index])
+                if later_effects["drops"] or (
+                    (ALL_COLUMNS in watched and later_effects["writes"])
+                    or later_effects["writes"] & watched
+                ):
+                    break
+            if changed:
+                break
+
+    # 4. Push column drops, row filters and de-duplication as early as they commute.
+    for action in ("remove_column", "clean_categorical", "remove_duplicates"):
+        for step in [s for s in steps if s.get("action") == action]:
+            i = next(k for k, s in enumerate(steps) if s is step)
+            start = i
+            while i > 0 and _can_move_before(step, steps[i - 1], _schemas(steps, columns)[i - 1]):
+                steps[i - 1], steps[i] = steps[i], steps[i - 1]
+                i -= 1
+            if i != start:
+                rewrites.append(f"Moved {labels[id(step)]} ahead of {labels[id(steps[i + 1])]}.")
+
+    # 5. Merge back-to-back filters on the same column into one. Disjoint filters are left
+    # alone: together they remove every row, but the executor reads an empty list of valid
+    # values as "no filter".
+    i = 0
+    while i < len(steps) - 1:
+        first, second = steps[i], steps[i + 1]
+        if first.get("action") == second.get("action") == "clean_categorical" and _step_column(first) == _step_column(second):
+            allowed = second["details"]["valid_values"]
+            kept = [v for v in first["details"]["valid_values"] if v in allowed]
+            if not kept:
+                i += 1
+                continue
+            first["details"]["valid_values"] = kept
+            rewrites.append(f"Merged {labels[id(second)]} into {labels[id(first)]}.")
+            del steps[i + 1]
+            continue
+        i += 1
+
+    optimized = dict(plan)
+    optimized["steps"] = steps
+    if rewrites:
+        logger.debug(f"Plan optimizer applied {len(rewrites)} rewrites: {rewrites}")
+    return optimized, rewrites
@@ -1,7 +1,11 @@
+import os
 from typing import Dict, Any
+import config
 from state import GraphState
 from agents.profiler import get_data_profile
+from agents.engines import resolve_engine
 from agents.ai_planner import generate_cleaning_plan
+from agents import tracing
 from agents.logger import logger
 
 def planning_node(state: GraphState) -> Dict[str, Any]:
@@ -10,8 +14,17 @@ def planning_node(state: GraphState) -> Dict[str, Any]:
     logger.info("    - Executing: AI Planning Node")
     
     data_path = state['standardized_data_path']
-    profile = get_data_profile(data_path)
+    profile = get_data_profile(data_path, resolve_engine(config.get_option(state, "engine")))
+    tracing.annotate(rows_in=profile.get("total_rows"), bytes_in=os.path.getsize(data_path))
     plan = generate_cleaning_plan(profile)
+    message = "AI planning complete."
+    if "planning" in plan:
+        planning = plan["planning"]
+        message = f"AI planning complete: {len(profile['columns'])} columns planned in {planning['shards']} concurrent shards."
+        if planning["unplanned_columns"]:
+            message += f" Planning failed for {len(planning['unplanned_columns'])} columns, which are left as they are."
+        if planning["global_pass_failed"]:
+            message += " The dataset-level pass failed, so duplicates were not considered."
     
     return {
         "cleaning_plan": plan,
@@ -19,5 +32,5 @@ def planning_node(state: GraphState) -> Dict[str, Any]:
         # Save the generated profile to the main state so the report builder can use it.
         "data_profile": profile,
         # --- END: NEW ADDITION ---
-        "log_messages": state.get('log_messages', []) + ["AI planning complete."]
+        "log_messages": [message]
     }
\ No newline at end of file
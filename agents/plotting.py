@@ -0,0 +1,183 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Plots are described by plain "render specs" holding only the data they draw, so they
+# can be rendered in worker processes. Workers import this module, which must not import
+# agents.logger (that would open a new log file in every worker); errors are raised back
+# to the caller instead. Figures are built with the object-oriented API on the Agg
+# canvas, so no pyplot global state is shared between plots. matplotlib and seaborn are
+# imported by the first render, so the process that only builds specs never loads them.
+#
+# Above a row threshold, histograms and scatter plots are reduced in the parent process
+# to fixed-size summaries: binned counts with a KDE computed on a grid, and a 2D
+# histogram of point density. Render time, PNG size and the data sent to workers then
+# stay the same however many rows there are.
+
+HISTOGRAM_MAX_BINS = 200
+KDE_GRID = 2048
+# Points along the KDE curve, as seaborn draws it.
+KDE_SUPPORT = 200
+DENSITY_BINS = 200
+
+
+@lru_cache(maxsize=1)
+def _seaborn():
+    """seaborn, imported after selecting matplotlib's Agg backend (seaborn imports pyplot)."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import seaborn
+    return seaborn
+
+
+def _warm_up() -> None:
+    """Runs once per worker so the first real render does not pay for imports and font loading."""
+    _seaborn()
+    from matplotlib.figure import Figure
+    Figure().canvas.draw()
+
+
+def start_renderer(workers: int) -> Optional[Executor]:
+    """
+    Starts a pool of rendering processes, or returns None to render in-process. Workers
+    are spawned rather than forked, because the graph runs nodes on threads and forking
+    a threaded process can deadlock. They start importing matplotlib straight away.
+    """
+    if workers <= 1:
+        return None
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    for _ in range(workers):
+        executor.submit(_warm_up)
+    return executor
+
+
+def _binned_kde(data: np.ndarray, edges: np.ndarray) -> Optional[Dict[str, np.ndarray]]:
+    """
+    The KDE line of `sns.histplot(kde=True)`, scaled to counts: a Gaussian kernel with
+    Scott's bandwidth over the data's range. The data are binned onto a fine grid and
+    convolved with the kernel by FFT, instead of summing a kernel per point.
+    """
+    lo, hi = float(data.min()), float(data.max())
+    bandwidth = float(data.std(ddof=1)) * len(data) ** -0.2
+    if not bandwidth > 0:
+        return None
+    # Pad by the kernel's reach so the convolution does not wrap around.
+    reach = 4 * bandwidth
+    counts, grid_edges = np.histogram(data, bins=KDE_GRID, range=(lo - reach, hi + reach))
+    step = grid_edges[1] - grid_edges[0]
+    offsets = np.arange(-KDE_GRID, KDE_GRID + 1) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    size = 4 * KDE_GRID + 1
+    density = np.fft.irfft(np.fft.rfft(counts, size) * np.fft.rfft(kernel, size), size)[KDE_GRID:2 * KDE_GRID]
+    centers = (grid_edges[:-1] + grid_edges[1:]) / 2
+    support = np.linspace(lo, hi, KDE_SUPPORT)
+    return {"x": support, "y": np.interp(support, centers, density) * (edges[1] - edges[0])}
+
+
+def _bin_count(data: np.ndarray) -> int:
+    """numpy's "auto" bin count (the finer of Freedman-Diaconis and Sturges), at most HISTOGRAM_MAX_BINS."""
+    if len(data) < 2 or data.min() == data.max():
+        return 1
+    sturges = np.log2(len(data)) + 1
+    q75, q25 = np.percentile(data, [75, 25])
+    fd_width = 2 * (q75 - q25) * len(data) ** (-1 / 3)
+    bins = max(sturges, (data.max() - data.min()) / fd_width) if fd_width > 0 else sturges
+    return int(min(np.ceil(bins), HISTOGRAM_MAX_BINS))
+
+
+def histogram_spec(values: pd.Series, large_rows: int) -> Dict[str, Any]:
+    """The render spec of a histogram with its KDE; from `large_rows` values on, pre-binned."""
+    if len(values) < large_rows:
+        return {"kind": "histogram", "values": values}
+    data = values.to_numpy(dtype="float64", na_value=np.nan)
+    data = data[np.isfinite(data)]
+    edges = np.histogram_bin_edges(data, bins=_bin_count(data))
+    counts, _ = np.histogram(data, bins=edges)
+    return {"kind": "binned_histogram", "edges": edges, "counts": counts,
+            "kde": _binned_kde(data, edges) if len(data) > 1 else None, "label": values.name}
+
+
+def scatter_spec(x: pd.Series, y: pd.Series, large_rows: int) -> Dict[str, Any]:
+    """
+    The render spec of a scatter plot; from `large_rows` points on, a 2D histogram of
+    their density, or a random sample of `large_rows` points if an axis is not numeric.
+    """
+    if len(x) < large_rows:
+        return {"kind": "scatter", "x": x, "y": y}
+    if not (pd.api.types.is_numeric_dtype(x) and pd.api.types.is_numeric_dtype(y)):
+        sample = x.sample(n=large_rows, random_state=0).index
+        return {"kind": "scatter", "x": x.loc[sample], "y": y.loc[sample]}
+    xs = x.to_numpy(dtype="float64", na_value=np.nan)
+    ys = y.to_numpy(dtype="float64", na_value=np.nan)
+    finite = np.isfinite(xs) & np.isfinite(ys)
+    counts, x_edges, y_edges = np.histogram2d(xs[finite], ys[finite], bins=DENSITY_BINS)
+    return {"kind": "density", "counts": counts, "x_edges": x_edges, "y_edges": y_edges,
+            "x_label": x.name, "y_label": y.name}
+
+
+def render_plot(spec: Dict[str, Any]) -> str:
+    """Draws one insight plot described by `spec` and saves it as a PNG. Returns the path."""
+    sns = _seaborn()
+    from matplotlib.artist import setp
+    from matplotlib.colors import LogNorm
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    kind = spec["kind"]
+
+    if kind == "histogram":
+        sns.histplot(spec["values"], kde=True, color='skyblue', ax=ax)
+    elif kind == "binned_histogram":
+        edges = spec["edges"]
+        ax.bar(edges[:-1], spec["counts"], width=np.diff(edges), align='edge', color='skyblue',
+               alpha=0.75, edgecolor='white', linewidth=0.5)
+        if spec["kde"] is not None:
+            ax.plot(spec["kde"]["x"], spec["kde"]["y"], color='skyblue')
+        ax.set_xlabel(spec.get("label") or "")
+        ax.set_ylabel("Count")
+    elif kind == "scatter":
+        sns.scatterplot(x=spec["x"], y=spec["y"], ax=ax)
+    elif kind == "density":
+        counts = np.ma.masked_equal(spec["counts"].T, 0)
+        mesh = ax.pcolormesh(spec["x_edges"], spec["y_edges"], counts, cmap='viridis',
+                             norm=LogNorm(vmin=1, vmax=max(int(counts.max() or 1), 1)))
+        fig.colorbar(mesh, ax=ax, label="rows")
+        ax.set_xlabel(spec.get("x_label") or "")
+        ax.set_ylabel(spec.get("y_label") or "")
+    elif kind == "bar":
+        pd.Series(spec["values"]).plot(kind='bar', color=spec.get("color"), ax=ax)
+    elif kind == "horizontal_count":
+        # Pre-counted bars: the worker receives the top categories, not the whole column.
+        counts = pd.Series(spec["values"])
+        labels = counts.index.astype(str)
+        sns.barplot(x=counts.to_numpy(), y=labels, order=list(labels), hue=labels,
+                    palette='viridis', legend=False, ax=ax)
+        ax.set_xlabel("count")
+        ax.set_ylabel(spec.get("label", ""))
+    else:
+        raise ValueError(f"Unknown plot kind '{kind}'.")
+
+    ax.set_title(spec["title"], fontsize=16)
+    setp(ax.get_xticklabels(), rotation=45, ha='right')
+    fig.tight_layout()
+    fig.savefig(spec["path"])
+    return spec["path"]
+
+
+def render_plot_timed(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    `render_plot`, plus when and where it ran, so the caller can record a trace span for
+    work done in a worker process. Timestamps are wall-clock microseconds, which are
+    comparable across processes.
+    """
+    ts_us = time.time_ns() / 1000
+    started = time.perf_counter()
+    path = render_plot(spec)
+    return {"path": path, "ts_us": ts_us, "dur_us": (time.perf_counter() - started) * 1_000_000, "pid": os.getpid()}
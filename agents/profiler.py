@@ -1,17 +1,23 @@
 import pandas as pd
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import warnings # <-- Import the warnings library
+import config
 from agents.logger import logger
+from agents.artifacts import cached_artifact, read_artifact, iter_artifact_chunks
+from agents.dtypes import expand, logical_dtype, value_counts
+from agents.sketches import RunningMoments, HyperLogLog, FrequentItems, hash_values
+from agents import engines
 
 
-def profile_in_memory(df: pd.DataFrame) -> Dict[str, Any]:
+def profile_in_memory(df: pd.DataFrame, engine: str = "pandas") -> Dict[str, Any]:
     """Generates a statistical profile for a DataFrame."""
     profile = {}
     total_rows = len(df)
     
     for col in df.columns:
-        unique_count = df[col].nunique()
+        native = engines.column_profile(df[col]) if engine == "polars" else None
+        unique_count = native["unique_count"] if native else df[col].nunique()
         
         # Identifier Rule: If a column has nearly all unique values, it's likely an ID.
         if total_rows > 0 and unique_count / total_rows > 0.99:
@@ -19,11 +25,13 @@ def profile_in_memory(df: pd.DataFrame) -> Dict[str, Any]:
             continue
 
         col_data = {
-            "data_type": str(df[col].dtype),
-            "missing_values_count": int(df[col].isnull().sum()),
+            "data_type": logical_dtype(df[col]),
+            "missing_values_count": native["missing_values_count"] if native else int(df[col].isnull().sum()),
         }
 
-        if pd.api.types.is_numeric_dtype(df[col]):
+        if native and pd.api.types.is_numeric_dtype(df[col]):
+            col_data.update({"min": native["min"], "max": native["max"], "mean": native["mean"], "std_dev": native["std"]})
+        elif pd.api.types.is_numeric_dtype(df[col]):
             # --- START: FINAL FIX ---
             # Suppress RuntimeWarning that can occur when calculating std dev on a
             # column with NaN values, which is expected during profiling.
@@ -38,30 +46,157 @@ def profile_in_memory(df: pd.DataFrame) -> Dict[str, Any]:
             # --- END: FINAL FIX ---
         else: # Assumed categorical/object
             col_data["unique_values_count"] = unique_count
-            top_values = df[col].value_counts().nlargest(5).to_dict()
+            counts = native["value_counts"] if native else value_counts(df[col])
+            top_values = counts.nlargest(5).to_dict()
             col_data["top_5_values"] = {str(k): int(v) for k, v in top_values.items()}
             
         profile[col] = col_data
     return {"total_rows": total_rows, "columns": profile}
 
-def get_data_profile(file_path: str) -> Dict[str, Any]:
+class _StreamingColumn:
+    """Mergeable per-column state built up chunk by chunk."""
+
+    def __init__(self):
+        self.dtypes = set()
+        self.missing = 0
+        self.moments = RunningMoments()
+        self.distinct = HyperLogLog()
+        self.frequent = FrequentItems()
+        self.numbers_seen = False
+        self.text_seen = False
+
+    def update(self, series: pd.Series) -> None:
+        series = expand(series)
+        self.dtypes.add(str(series.dtype))
+        if pd.api.types.is_object_dtype(series):
+            self.text_seen = True
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series) and series.notna().any():
+            self.numbers_seen = True
+        self.missing += int(series.isnull().sum())
+        self.distinct.update(hash_values(series))
+        self.frequent.update(series.value_counts())
+        if pd.api.types.is_numeric_dtype(series):
+            self.moments.update(series.to_numpy(dtype="float64", na_value=float("nan")))
+
+    def resolved_dtype(self) -> str:
+        """The dtype pandas would infer if the whole column were read at once."""
+        if len(self.dtypes) == 1:
+            return next(iter(self.dtypes))
+        if all(d.startswith(("int", "float")) for d in self.dtypes):
+            return "float64"
+        return "object"
+
+    @property
+    def mixed(self) -> bool:
+        """
+        True if some chunks parsed the column as numbers and others as text. Their values
+        were then hashed and counted in two forms (5.0 and "5"), so the column is profiled again.
+        """
+        return self.numbers_seen and self.text_seen
+
+
+def profile_in_chunks(file_path: str, chunksize: int = None) -> Dict[str, Any]:
+    """
+    Generates the same profile as `profile_in_memory` by streaming the file in
+    chunks, so peak memory is bounded by the chunk size rather than the file size.
+    """
+    chunksize = chunksize or config.PROFILE_CHUNK_ROWS
+    columns: Dict[str, _StreamingColumn] = {}
+    total_rows = 0
+
+    for chunk in iter_artifact_chunks(file_path, chunksize):
+        total_rows += len(chunk)
+        for col in chunk.columns:
+            columns.setdefault(col, _StreamingColumn()).update(chunk[col])
+
+    # A whole-file read gives such a column as text, so count it again from the text in the file.
+    mixed = [col for col, state in columns.items() if state.mixed]
+    if mixed:
+        logger.debug(f"Re-profiling columns read as both numbers and text: {mixed}")
+        text_states = {col: _StreamingColumn() for col in mixed}
+        for chunk in iter_artifact_chunks(file_path, chunksize, columns=mixed, text_columns=mixed):
+            for col in mixed:
+                text_states[col].update(chunk[col])
+        columns.update(text_states)
+
+    profile = {}
+    for col, state in columns.items():
+        unique_count = state.distinct.count()
+
+        # Identifier Rule: same as the in-memory profiler, using the HLL estimate.
+        if total_rows > 0 and unique_count / total_rows > 0.99:
+            profile[col] = {"data_type": "identifier", "unique_count": unique_count}
+            continue
+
+        dtype = state.resolved_dtype()
+        col_data = {
+            "data_type": dtype,
+            "missing_values_count": state.missing,
+        }
+        if pd.api.types.is_numeric_dtype(pd.api.types.pandas_dtype(dtype)):
+            col_data.update(state.moments.to_dict())
+        else:
+            col_data["unique_values_count"] = unique_count
+            col_data["top_5_values"] = {str(k): int(v) for k, v in state.frequent.top(5)}
+
+        profile[col] = col_data
+    return {"total_rows": total_rows, "columns": profile}
+
+def get_data_profile(file_path: str, engine: str = "pandas") -> Dict[str, Any]:
     """Checks file size and generates a profile for the dataset."""
     logger.debug(f"Profiling data from: {file_path}")
     file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-    
-    df = None
+
+    # A frame that is already in memory is profiled directly, whatever its size.
+    df = cached_artifact(file_path)
+    profile = None
     try:
-        if file_size_mb < 100:
-            logger.debug("File size is small (<100MB). Using in-memory profiling.")
-            df = pd.read_csv(file_path, encoding='latin-1')
+        if df is not None:
+            logger.debug("Data is already in memory. Using in-memory profiling.")
+        elif file_size_mb < config.LARGE_FILE_MB:
+            logger.debug(f"File size is small (<{config.LARGE_FILE_MB:g}MB). Using in-memory profiling.")
+            df = read_artifact(file_path)
         else:
-            logger.debug("File size is large (>=100MB). Using in-memory for prototype.")
-            df = pd.read_csv(file_path, encoding='latin-1')
+            logger.debug(f"File size is large (>={config.LARGE_FILE_MB:g}MB). Using streaming profiling.")
+            profile = profile_in_chunks(file_path)
     except Exception as e:
         logger.error(f"Profiler failed to read {file_path}. Error: {e}")
         # Return an empty profile if the file can't be read at all
         return {"total_rows": 0, "columns": {}}
-        
-    profile = profile_in_memory(df)
+
+    if profile is None:
+        profile = profile_in_memory(df, engine)
     logger.debug("Profiling complete.")
-    return profile
\ No newline at end of file
+    return profile
+
+def derive_profile(base_profile: Dict[str, Any], file_path: str, lineage: Optional[Dict[str, Any]],
+                   engine: str = "pandas") -> Dict[str, Any]:
+    """
+    Profile of the cleaned data, derived from the profile of the data before cleaning.
+    Only the columns the plan wrote or created are profiled again; dropped columns are
+    left out and the rest are carried over. If the plan removed rows, every statistic
+    may have changed, so the file is profiled from scratch.
+    """
+    base_columns = (base_profile or {}).get("columns") or {}
+    columns = (lineage or {}).get("columns")
+    if not base_columns or columns is None or lineage.get("rows_changed") or len(set(columns)) != len(columns):
+        return get_data_profile(file_path, engine)
+
+    modified = set(lineage.get("modified", []))
+    stale = [col for col in columns if col in modified or col not in base_columns]
+    recomputed = {}
+    if stale:
+        logger.debug(f"Deriving profile: re-profiling {len(stale)} of {len(columns)} columns.")
+        df = cached_artifact(file_path)
+        try:
+            subset = df[stale] if df is not None else read_artifact(file_path, columns=stale)
+        except Exception as e:
+            logger.warning(f"Could not read the changed columns of {file_path} ({e}). Profiling the whole file.")
+            return get_data_profile(file_path, engine)
+        recomputed = profile_in_memory(subset, engine)["columns"]
+    else:
+        logger.debug("Deriving profile: the plan changed no column statistics.")
+    return {
+        "total_rows": base_profile["total_rows"],
+        "columns": {col: recomputed[col] if col in recomputed else base_columns[col] for col in columns},
+    }
@@ -0,0 +1,161 @@
+import math
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Tuple
+
+
+# --- MERGEABLE STREAMING SKETCHES ---
+# Each sketch consumes one chunk at a time and can be merged with another
+# sketch of the same kind, so memory stays bounded by the chunk size.
+
+def hash_values(series: pd.Series) -> np.ndarray:
+    """Returns a stable 64-bit hash for every non-null value in the series."""
+    values = series.dropna()
+    # Hash numbers as float64 so an int chunk and a float chunk of the same column agree.
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        values = values.astype("float64")
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+
+class RunningMoments:
+    """Count, mean, variance, min and max using Welford's algorithm (Chan's merge)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values: np.ndarray) -> None:
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        chunk = RunningMoments()
+        chunk.count = int(values.size)
+        chunk.mean = float(values.mean())
+        chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        self.merge(chunk)
+
+    def merge(self, other: "RunningMoments") -> None:
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1), matching pandas."""
+        if self.count < 2:
+            return float("nan")
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    def to_dict(self) -> Dict[str, float]:
+        empty = self.count == 0
+        return {
+            "min": float("nan") if empty else self.min,
+            "max": float("nan") if empty else self.max,
+            "mean": float("nan") if empty else self.mean,
+            "std_dev": self.std(),
+        }
+
+
+class HyperLogLog:
+    """
+    Distinct-count estimator. Counts exactly while the number of distinct
+    hashes is small, then switches to 2**precision HLL registers.
+    """
+
+    def __init__(self, precision: int = 16, exact_limit: int = 8192):
+        self.precision = precision
+        self.exact_limit = exact_limit
+        self._exact = np.empty(0, dtype=np.uint64)
+        self._registers = None
+
+    def _to_registers(self, hashes: np.ndarray) -> None:
+        if self._registers is None:
+            self._registers = np.zeros(1 << self.precision, dtype=np.uint8)
+        if hashes.size == 0:
+            return
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << width) - 1)
+        # frexp's exponent is the bit length; exact because remainder < 2**53.
+        _, bit_length = np.frexp(remainder.astype(np.float64))
+        rank = (width - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self._registers, index, rank)
+
+    def update(self, hashes: np.ndarray) -> None:
+        if self._registers is not None:
+            self._to_registers(hashes)
+            return
+        self._exact = np.union1d(self._exact, hashes)
+        if self._exact.size > self.exact_limit:
+            self._to_registers(self._exact)
+            self._exact = np.empty(0, dtype=np.uint64)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if other._registers is None:
+            self.update(other._exact)
+            return
+        if self._registers is None:
+            self._to_registers(self._exact)
+            self._exact = np.empty(0, dtype=np.uint64)
+        np.maximum(self._registers, other._registers, out=self._registers)
+
+    def count(self) -> int:
+        if self._registers is None:
+            return int(self._exact.size)
+        m = float(self._registers.size)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -self._registers.astype(np.int64))))
+        zeros = int(np.count_nonzero(self._registers == 0))
+        if estimate <= 2.5 * m and zeros > 0:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class FrequentItems:
+    """
+    Misra-Gries heavy-hitter summary. Counts are exact while the number of
+    distinct values stays within `capacity`; beyond that they are lower bounds.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.counts: Dict[Any, int] = {}
+
+    def update(self, value_counts: pd.Series) -> None:
+        """Adds pre-aggregated counts (e.g. a chunk's `value_counts()`)."""
+        if len(value_counts) > self.capacity:
+            # Reduce the chunk to its own Misra-Gries summary before the Python-level merge.
+            value_counts = value_counts.sort_values(ascending=False, kind="stable")
+            threshold = value_counts.iloc[self.capacity]
+            value_counts = value_counts[value_counts > threshold] - threshold
+        for value, count in value_counts.items():
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+        self._prune()
+
+    def merge(self, other: "FrequentItems") -> None:
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+        self._prune()
+
+    def _prune(self) -> None:
+        if len(self.counts) <= self.capacity:
+            return
+        threshold = sorted(self.counts.values(), reverse=True)[self.capacity]
+        self.counts = {k: v - threshold for k, v in self.counts.items() if v > threshold}
+
+    def top(self, n: int) -> List[Tuple[Any, int]]:
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:n]
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource  # POSIX only; peak RSS is left blank elsewhere.
+except ImportError:
+    resource = None
+
+# Spans of the current run, in Chrome trace-event form. Nodes run on several threads
+# at once, so every access goes through the lock. Worker processes do not import this
+# module's state: work done there (plot rendering) is timed in the worker and added here.
+_lock = threading.Lock()
+_spans: List[Dict[str, Any]] = []
+_local = threading.local()
+
+
+def _process_cpu_s() -> float:
+    """
+    CPU time of the whole process (all threads, including Arrow's and Polars'), plus that
+    of worker processes once they have exited, e.g. a pool shut down at the end of a stage.
+    """
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _peak_rss_kb() -> Optional[int]:
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Span:
+    """One timed region. Extra fields (rows, bytes, cache hits, ...) are attached with `set`."""
+
+    def __init__(self, name: str, cat: str, args: Dict[str, Any]):
+        self.name = name
+        self.cat = cat
+        self.args = dict(args)
+
+    def set(self, **args: Any) -> None:
+        self.args.update(args)
+
+
+def start_trace() -> None:
+    """Discards spans from a previous run in this process."""
+    with _lock:
+        _spans.clear()
+
+
+def add_span(name: str, cat: str, ts_us: float, dur_us: float, pid: Optional[int] = None,
+             tid: Optional[int] = None, **args: Any) -> None:
+    """Records a span measured elsewhere, e.g. in a worker process."""
+    event = {
+        "name": name, "cat": cat, "ph": "X", "ts": ts_us, "dur": dur_us,
+        "pid": pid or os.getpid(), "tid": tid or threading.get_ident(), "args": args,
+    }
+    with _lock:
+        _spans.append(event)
+
+
+@contextmanager
+def span(name: str, cat: str = "node", **args: Any) -> Iterator[Span]:
+    """
+    Times the enclosed block: wall time, the process's CPU time (see `_process_cpu_s`) and
+    growth of its peak RSS. Both are process-wide, so they include whatever ran alongside
+    the block on other threads. Spans nest per thread, and `annotate` attaches data to the
+    innermost one.
+    """
+    current = Span(name, cat, args)
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(current)
+    ts_us = time.time_ns() / 1000
+    wall_start = time.perf_counter()
+    cpu_start = _process_cpu_s()
+    rss_start = _peak_rss_kb()
+    try:
+        yield current
+    finally:
+        stack.pop()
+        wall = time.perf_counter() - wall_start
+        current.args["cpu_s"] = round(_process_cpu_s() - cpu_start, 4)
+        if rss_start is not None:
+            current.args["peak_rss_delta_mb"] = round((_peak_rss_kb() - rss_start) / 1024, 2)
+        rows = max(current.args.get("rows_in") or 0, current.args.get("rows_out") or 0)
+        if rows and wall > 0:
+            current.args["rows_per_s"] = round(rows / wall)
+        add_span(current.name, current.cat, ts_us, wall * 1_000_000, **current.args)
+
+
+def annotate(**args: Any) -> None:
+    """Attaches data (rows_in, bytes_out, ...) to the innermost open span on this thread, if any."""
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1].set(**args)
+
+
+def traced(stage: str, node):
+    """Wraps a graph node in a span named after its stage."""
+    def run(state):
+        with span(stage, cat="node"):
+            return node(state)
+    run.__name__ = getattr(node, "__name__", stage)
+    return run
+
+
+def spans() -> List[Dict[str, Any]]:
+    with _lock:
+        return list(_spans)
+
+
+def write_chrome_trace(path: str) -> str:
+    """Saves the run's spans as a Chrome trace (open in chrome://tracing or Perfetto)."""
+    events = spans()
+    thread_names = {}
+    for event in events:
+        thread_names.setdefault((event["pid"], event["tid"]), f"{event['cat']} {len(thread_names) + 1}")
+    metadata = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+        for (pid, tid), name in thread_names.items()
+    ]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f, default=str)
+    return path
+
+
+def _fmt(value: Any, scale: float = 1.0, digits: int = 2) -> str:
+    if value is None or value == "":
+        return ""
+    return f"{value / scale:,.{digits}f}"
+
+
+def timing_table() -> str:
+    """Markdown table with one row per graph node, plus totals for LLM calls and plot renders."""
+    events = spans()
+    nodes = sorted((e for e in events if e["cat"] == "node"), key=lambda e: e["ts"])
+    if not nodes:
+        return "No timing data was recorded for this run."
+
+    lines = [
+        "| Stage | Wall (s) | Process CPU (s) | Process peak RSS Δ (MB) | Rows in | Rows out | MB in | MB out | Rows/s | Notes |",
+        "|:---|---:|---:|---:|---:|---:|---:|---:|---:|:---|",
+    ]
+    for e in nodes:
+        a = e["args"]
+        notes = "reused checkpoint" if a.get("checkpoint") == "reused" else ""
+        lines.append(
+            f"| {e['name']} | {_fmt(e['dur'], 1e6)} | {_fmt(a.get('cpu_s'))} | {_fmt(a.get('peak_rss_delta_mb'))} "
+            f"| {_fmt(a.get('rows_in'), digits=0)} | {_fmt(a.get('rows_out'), digits=0)} "
+            f"| {_fmt(a.get('bytes_in'), 1024 * 1024)} | {_fmt(a.get('bytes_out'), 1024 * 1024)} "
+            f"| {_fmt(a.get('rows_per_s'), digits=0)} | {notes} |"
+        )
+
+    start = min(e["ts"] for e in nodes)
+    end = max(e["ts"] + e["dur"] for e in nodes)
+    lines.append(f"\n**End-to-end wall time:** {(end - start) / 1e6:,.2f} s (stages on parallel branches overlap).")
+    lines.append("CPU and peak memory are measured for the whole process while a stage runs, not for the stage "
+                 "alone. Cleaning and the summary run at the same time, so each is charged with what the other used. "
+                 "CPU includes worker pools that exit within the stage (plots, word counts, parallel ingestion). "
+                 "A rise in peak memory is charged to whichever stage was running when it happened.")
+    for cat, label in (("llm", "Gemini calls"), ("plot", "Plot renders")):
+        subspans = [e for e in events if e["cat"] == cat]
+        if subspans:
+            hits = sum(1 for e in subspans if e["args"].get("cache") == "hit")
+            detail = f", {hits} served from cache" if cat == "llm" else ""
+            lines.append(f"**{label}:** {len(subspans)}{detail}, {sum(e['dur'] for e in subspans) / 1e6:,.2f} s in total.")
+    return "\n".join(lines)
@@ -0,0 +1,78 @@
+import heapq
+from collections import Counter, deque
+from concurrent.futures import Executor
+from typing import FrozenSet, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+# Word counting for the word_frequency insight. A text column is tokenized a chunk of
+# rows at a time, so memory stays bounded by the chunk rather than by one string holding
+# the whole column. Chunks can be counted on a process pool; their counters are merged in
+# chunk order, which keeps ties in first-occurrence order exactly like one big Counter.
+# Workers import this module, so it must not import agents.logger.
+
+
+def _chunks(series: pd.Series, chunk_rows: int) -> Iterator[List[str]]:
+    values = series.dropna()
+    for start in range(0, len(values), chunk_rows):
+        yield values.iloc[start:start + chunk_rows].tolist()
+
+
+def count_chunk(values: List[str], stop_words: FrozenSet[str], keep: Optional[FrozenSet[str]] = None) -> Counter:
+    """
+    Word counts of one chunk, split on whitespace as `' '.join(values).split()` would.
+    Stop words are dropped; with `keep`, only those words are counted.
+    """
+    counts = Counter(" ".join(values).split())
+    if keep is not None:
+        return Counter({word: n for word, n in counts.items() if word in keep})
+    for word in stop_words & counts.keys():
+        del counts[word]
+    return counts
+
+
+def _chunk_counts(series: pd.Series, stop_words: FrozenSet[str], chunk_rows: int, executor: Optional[Executor],
+                  workers: int, keep: Optional[FrozenSet[str]] = None) -> Iterator[Counter]:
+    """Counters of successive chunks, in order. At most two chunks per worker are in flight."""
+    if executor is None:
+        for values in _chunks(series, chunk_rows):
+            yield count_chunk(values, stop_words, keep)
+        return
+    pending = deque()
+    for values in _chunks(series, chunk_rows):
+        pending.append(executor.submit(count_chunk, values, stop_words, keep))
+        if len(pending) >= 2 * workers:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def top_words(series: pd.Series, stop_words: FrozenSet[str], n: int = 15, chunk_rows: int = 100_000,
+              max_vocab: int = 0, executor: Optional[Executor] = None, workers: int = 1) -> List[Tuple[str, int]]:
+    """
+    The `n` most common words of a text column with their counts, as
+    `Counter(' '.join(series.dropna()).split()).most_common(n)` minus stop words.
+
+    With `max_vocab`, at most that many distinct words are tracked: a Misra-Gries sketch
+    keeps every word occurring in more than 1/(max_vocab + 1) of the tokens, and a second
+    pass counts those candidates exactly. The result only differs from the exact one when
+    the top words are rarer than that, i.e. for a flat, very large vocabulary.
+    """
+    if not max_vocab:
+        totals = Counter()
+        for counts in _chunk_counts(series, stop_words, chunk_rows, executor, workers):
+            totals.update(counts)
+        return totals.most_common(n)
+
+    sketch = Counter()
+    for counts in _chunk_counts(series, stop_words, chunk_rows, executor, workers):
+        sketch.update(counts)
+        if len(sketch) > max_vocab:
+            # Subtract the (max_vocab + 1)-th largest count from every word and drop those left at zero.
+            cut = heapq.nlargest(max_vocab + 1, sketch.values())[-1]
+            sketch = Counter({word: c - cut for word, c in sketch.items() if c > cut})
+
+    totals = Counter()
+    for counts in _chunk_counts(series, stop_words, chunk_rows, executor, workers, keep=frozenset(sketch)):
+        totals.update(counts)
+    return totals.most_common(n)
@@ -0,0 +1,228 @@
+import os
+from typing import Any, Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+# Bump when a generator changes, so files cached under the old name are not reused.
+GENERATOR_VERSION = 1
+CHUNK_ROWS = 50_000
+
+DISTRICTS = [
+    "Anantapur", "Chittoor", "East Godavari", "Guntur", "Krishna", "Kurnool", "Prakasam",
+    "Nellore", "Srikakulam", "Visakhapatnam", "Vizianagaram", "West Godavari", "YSR Kadapa",
+    "Adilabad", "Hyderabad", "Karimnagar", "Khammam", "Mahabubnagar", "Medak", "Nalgonda",
+    "Nizamabad", "Rangareddy", "Warangal",
+]
+WORDS = (
+    "good bad great poor product quality price value delivery fast slow battery screen sound "
+    "camera service return refund broke works love hate recommend cheap expensive packaging "
+    "seller amazing terrible okay fine phone charger cable size fit colour"
+).split()
+
+# Every synthetic dataset comes with the plans the stub LLM hands out for it, written the
+# way Gemini answers for real files of the same shape, so each action is exercised.
+
+
+def _gov_wide(rng: np.random.Generator, start: int, rows: int) -> pd.DataFrame:
+    """Wide district-level indicator table: categorical keys, yes/no flags, many numeric columns with gaps."""
+    data = {
+        "S.No": np.arange(start + 1, start + rows + 1),
+        "District Name": rng.choice(DISTRICTS, rows),
+        "Mandal": [f"Mandal {n}" for n in rng.integers(1, 700, rows)],
+        "Year": rng.integers(2014, 2025, rows),
+        "Scheme Active": rng.choice(["Yes", "No"], rows),
+    }
+    for i in range(1, 41):
+        values = rng.gamma(2.0, 50.0 * i, rows).round(2)
+        values[rng.random(rows) < 0.03] = np.nan
+        data[f"Indicator {i:02d}"] = values
+    return pd.DataFrame(data)
+
+
+def _currency(rng: np.random.Generator, start: int, rows: int) -> pd.DataFrame:
+    """Budget table whose amounts are text with currency signs and thousands separators."""
+    allocated = rng.integers(10_000, 50_000_000, rows)
+    spent = (allocated * rng.uniform(0.2, 1.1, rows)).astype(np.int64)
+    return pd.DataFrame({
+        "District": rng.choice(DISTRICTS, rows),
+        "Department": rng.choice(["Health", "Education", "Roads", "Water", "Agriculture"], rows),
+        "Budget Allocated": [f"${v:,}" for v in allocated],
+        "Amount Spent": [f"${v:,}.{c:02d}" for v, c in zip(spent, rng.integers(0, 100, rows))],
+        "Beneficiaries": [f"{v:,}" for v in rng.integers(0, 2_000_000, rows)],
+    })
+
+
+def _year_range(rng: np.random.Generator, start: int, rows: int) -> pd.DataFrame:
+    """Scheme tenures written as '2019-20', '2015-2018' or a single year, for `calculate_year_span`."""
+    first = rng.integers(2000, 2024, rows)
+    length = rng.integers(0, 6, rows)
+    style = rng.integers(0, 3, rows)
+    tenure = [
+        str(y) if s == 0 or n == 0 else (f"{y}-{str(y + n)[2:]}" if s == 1 else f"{y}-{y + n}")
+        for y, n, s in zip(first, length, style)
+    ]
+    return pd.DataFrame({
+        "District": rng.choice(DISTRICTS, rows),
+        "Scheme": [f"Scheme {n}" for n in rng.integers(1, 60, rows)],
+        "Tenure": tenure,
+        "Households Covered": rng.integers(10, 100_000, rows),
+        "Status": rng.choice(["completed", "ongoing", "stalled"], rows),
+    })
+
+
+def _census_wide(rng: np.random.Generator, start: int, rows: int) -> pd.DataFrame:
+    """Census-style table with 800 columns: 20 topics of numeric indicators with gaps, yes/no flags and coded answers."""
+    data = {
+        "S.No": np.arange(start + 1, start + rows + 1),
+        "District": rng.choice(DISTRICTS, rows),
+    }
+    for topic in range(1, 21):
+        for i in range(1, 40):
+            if i % 13 == 0:
+                data[f"T{topic:02d} Flag {i:02d}"] = rng.choice(["Yes", "No"], rows)
+            elif i % 13 == 1:
+                data[f"T{topic:02d} Code {i:02d}"] = rng.choice(["A", "B", "C", "D", "X"], rows)
+            else:
+                values = rng.poisson(20 * i, rows).astype(float)
+                values[rng.random(rows) < 0.02] = np.nan
+                data[f"T{topic:02d} Count {i:02d}"] = values
+    return pd.DataFrame(data)
+
+
+def _review_sentence(rng: np.random.Generator) -> str:
+    return " ".join(rng.choice(WORDS, rng.integers(5, 30))).capitalize() + rng.choice(["!", ".", "!!", "?"])
+
+
+def _write_reviews(rng: np.random.Generator, start: int, rows: int, f) -> None:
+    """Amazon-style export: a single header field, but every row carries the text and a label."""
+    if start == 0:
+        f.write("Uncleaned Review\n")
+    decisions = rng.choice(["positive", "negative"], rows)
+    f.write("".join(f"{_review_sentence(rng)} {n % 97},{d}\n" for n, d in zip(range(start, start + rows), decisions)))
+
+
+GOV_WIDE_PLAN = {"steps": [
+    {"action": "remove_duplicates", "column": None, "details": {}, "reason": "Duplicates skew aggregates."},
+    {"action": "remove_column", "column": "sno", "details": {}, "reason": "Row identifier."},
+    {"action": "encode_binary", "column": "schemeactive", "details": {"positive_value": "Yes"}, "reason": "Binary flag."},
+    *[{"action": "fill_missing", "column": f"indicator{i:02d}", "details": {"strategy": "median"}, "reason": "Gaps in the indicator."}
+      for i in range(1, 41, 4)],
+    {"action": "scale_numeric", "column": "indicator01", "details": {"strategy": "min_max"}, "reason": "Comparable ranges."},
+    {"action": "scale_numeric", "column": "indicator02", "details": {"strategy": "standard"}, "reason": "Comparable ranges."},
+    {"action": "create_feature", "column": None, "details": {"new_column_name": "indicator_ratio", "expression": "indicator03 / (indicator04 + 1)"}, "reason": "Relative intensity."},
+]}
+CURRENCY_PLAN = {"steps": [
+    {"action": "convert_type", "column": "budgetallocated", "details": {"new_type": "float64", "pre_processing": ["remove_currency", "remove_commas"]}, "reason": "Amounts are text."},
+    {"action": "convert_type", "column": "amountspent", "details": {"new_type": "float64", "pre_processing": ["remove_currency", "remove_commas"]}, "reason": "Amounts are text."},
+    {"action": "convert_type", "column": "beneficiaries", "details": {"new_type": "int64", "pre_processing": ["remove_commas"]}, "reason": "Counts are text."},
+    {"action": "create_feature", "column": None, "details": {"new_column_name": "utilisation", "expression": "amountspent / budgetallocated"}, "reason": "Share of budget spent."},
+    {"action": "remove_duplicates", "column": None, "details": {}, "reason": "Duplicates skew aggregates."},
+]}
+YEAR_RANGE_PLAN = {"steps": [
+    {"action": "execute_custom_function", "column": "tenure_years", "details": {"function_name": "calculate_year_span", "source_column": "tenure"}, "reason": "Ranges need parsing."},
+    {"action": "clean_categorical", "column": "status", "details": {"valid_values": ["completed", "ongoing"]}, "reason": "Only active or finished schemes."},
+    {"action": "scale_numeric", "column": "householdscovered", "details": {"strategy": "min_max"}, "reason": "Comparable ranges."},
+]}
+CENSUS_WIDE_PLAN = {"steps": [
+    {"action": "remove_duplicates", "column": None, "details": {}, "reason": "Duplicates skew aggregates."},
+    {"action": "remove_column", "column": "sno", "details": {}, "reason": "Row identifier."},
+    *[{"action": "encode_binary", "column": f"t{t:02d}flag13", "details": {"positive_value": "Yes"}, "reason": "Binary flag."}
+      for t in range(1, 21)],
+    *[{"action": "fill_missing", "column": f"t{t:02d}count{i:02d}", "details": {"strategy": "median"}, "reason": "Gaps in the count."}
+      for t in range(1, 21) for i in (2, 3, 4)],
+    *[{"action": "scale_numeric", "column": f"t{t:02d}count05", "details": {"strategy": "min_max"}, "reason": "Comparable ranges."}
+      for t in range(1, 21, 2)],
+    {"action": "create_feature", "column": None, "details": {"new_column_name": "t01_ratio", "expression": "t01count02 / (t01count03 + 1)"}, "reason": "Relative intensity."},
+]}
+REVIEWS_PLAN = {"steps": [
+    {"action": "clean_text", "column": "review_text", "details": {"operations": ["lowercase", "remove_punctuation", "remove_digits", "remove_non_ascii"]}, "reason": "Normalise text for NLP."},
+    {"action": "clean_categorical", "column": "decision", "details": {"valid_values": ["positive", "negative"]}, "reason": "Valid labels only."},
+    {"action": "encode_binary", "column": "decision", "details": {"positive_value": "positive"}, "reason": "Binary label."},
+    {"action": "remove_duplicates", "column": None, "details": {}, "reason": "Duplicates skew aggregates."},
+]}
+
+DATASETS: Dict[str, Dict[str, Any]] = {
+    "gov_wide": {
+        "frame": _gov_wide,
+        "cleaning_plan": GOV_WIDE_PLAN,
+        "insight_plan": {"analyses": [
+            {"action": "distribution", "details": {"column": "indicator05"}, "question_to_answer": "How is indicator 05 spread?"},
+            {"action": "correlation", "details": {"column_x": "indicator03", "column_y": "indicator04"}, "question_to_answer": "Do indicators 03 and 04 move together?"},
+            {"action": "group_by_summary", "details": {"groupby_column": "districtname", "agg_column": "indicator06", "agg_function": "mean"}, "question_to_answer": "Which district has the highest indicator 06?"},
+            {"action": "count_plot", "details": {"column": "districtname"}, "question_to_answer": "Which districts report most often?"},
+        ]},
+    },
+    "currency": {
+        "frame": _currency,
+        "cleaning_plan": CURRENCY_PLAN,
+        "insight_plan": {"analyses": [
+            {"action": "distribution", "details": {"column": "utilisation"}, "question_to_answer": "How much of their budgets do departments spend?"},
+            {"action": "group_by_summary", "details": {"groupby_column": "department", "agg_column": "amountspent", "agg_function": "sum"}, "question_to_answer": "Which department spends most?"},
+            {"action": "correlation", "details": {"column_x": "budgetallocated", "column_y": "beneficiaries"}, "question_to_answer": "Do bigger budgets reach more people?"},
+        ]},
+    },
+    "year_range": {
+        "frame": _year_range,
+        "cleaning_plan": YEAR_RANGE_PLAN,
+        "insight_plan": {"analyses": [
+            {"action": "distribution", "details": {"column": "tenure_years"}, "question_to_answer": "How long do schemes run?"},
+            {"action": "count_plot", "details": {"column": "district"}, "question_to_answer": "Where are schemes concentrated?"},
+        ]},
+    },
+    "census_wide": {
+        "frame": _census_wide,
+        "cleaning_plan": CENSUS_WIDE_PLAN,
+        "insight_plan": {"analyses": [
+            {"action": "group_by_summary", "details": {"groupby_column": "district", "agg_column": "t01count02", "agg_function": "mean"}, "question_to_answer": "Which district counts most?"},
+            {"action": "count_plot", "details": {"column": "t02code14"}, "question_to_answer": "How are the coded answers split?"},
+        ]},
+    },
+    "amazon_reviews": {
+        "write": _write_reviews,
+        "cleaning_plan": REVIEWS_PLAN,
+        "insight_plan": {"analyses": [
+            {"action": "word_frequency", "details": {"text_column": "review_text"}, "question_to_answer": "What do reviewers talk about?"},
+            {"action": "count_plot", "details": {"column": "decision"}, "question_to_answer": "How are reviews split?"},
+        ]},
+    },
+}
+
+
+def dataset_path(data_dir: str, kind: str, size_mb: float, seed: int = 0) -> str:
+    return os.path.join(data_dir, f"{kind}_{size_mb:g}mb_s{seed}_v{GENERATOR_VERSION}.csv")
+
+
+def generate(kind: str, size_mb: float, path: str, seed: int = 0) -> str:
+    """
+    Writes a synthetic dataset of roughly `size_mb` megabytes to `path`, chunk by chunk
+    so multi-GB files never sit in memory. The same kind, size and seed always give the
+    same bytes.
+    """
+    spec = DATASETS[kind]
+    target = size_mb * 1024 * 1024
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.partial"
+    start, rows = 0, 1_000
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        while f.tell() < target:
+            rng = np.random.default_rng([seed, start])
+            if "write" in spec:
+                spec["write"](rng, start, rows, f)
+            else:
+                frame: Callable[..., pd.DataFrame] = spec["frame"]
+                f.write(frame(rng, start, rows).to_csv(index=False, header=start == 0))
+            start += rows
+            # Size the next chunk from the bytes per row so far, to land close to the target.
+            bytes_per_row = f.tell() / start
+            rows = int(min(CHUNK_ROWS, max(1, (target - f.tell()) / bytes_per_row + 1)))
+    os.replace(tmp_path, path)
+    return path
+
+
+def ensure_dataset(data_dir: str, kind: str, size_mb: float, seed: int = 0) -> str:
+    """Returns the cached file for this kind and size, generating it on first use."""
+    path = dataset_path(data_dir, kind, size_mb, seed)
+    if not os.path.exists(path):
+        generate(kind, size_mb, path, seed)
+    return path
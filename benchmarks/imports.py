@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import statistics
+import subprocess
+import time
+from typing import Any, Dict, List
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+# Run as `python -m benchmarks.imports` from the repository root.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+app = typer.Typer()
+console = Console()
+
+HEAVY = ("pandas", "numpy", "pyarrow", "sklearn", "matplotlib", "seaborn", "nltk", "google.generativeai", "langgraph")
+PLOTTING_NLP_LLM = ("sklearn", "matplotlib", "seaborn", "nltk", "google.generativeai")
+
+# Import time (seconds) each entry point may take in a fresh interpreter, and the
+# libraries it must not load. Node modules may load pandas, but sklearn, plotting, NLTK
+# and the Gemini client only when a step, plot, word count or uncached prompt needs them.
+BUDGETS: Dict[str, Dict[str, Any]] = {
+    "main": {"seconds": 0.35, "forbidden": HEAVY},
+    "pipeline": {"seconds": 1.2, "forbidden": PLOTTING_NLP_LLM},
+    "agents.ingestion": {"seconds": 0.8, "forbidden": PLOTTING_NLP_LLM},
+    "agents.planning": {"seconds": 0.8, "forbidden": PLOTTING_NLP_LLM},
+    "agents.cleaning": {"seconds": 0.8, "forbidden": PLOTTING_NLP_LLM},
+    "agents.insight": {"seconds": 0.8, "forbidden": PLOTTING_NLP_LLM},
+    "agents.insight_report": {"seconds": 0.3, "forbidden": HEAVY},
+}
+
+
+def _import_once(module: str) -> Dict[str, Any]:
+    """Imports `module` in a fresh interpreter; returns its cumulative import time and every module loaded."""
+    code = f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                            cwd=ROOT, check=True)
+    seconds = 0.0
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", indented by nesting depth.
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module and fields[2].startswith(" ") and not fields[2].startswith("  "):
+            seconds = int(fields[1]) / 1e6
+    return {"seconds": seconds, "modules": json.loads(result.stdout.splitlines()[-1])}
+
+
+def _help_seconds() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "main.py", "--help"], capture_output=True, cwd=ROOT, check=True)
+    return time.perf_counter() - started
+
+
+@app.command()
+def check(
+    repeat: int = typer.Option(5, help="Fresh interpreters per entry point; medians are compared with the budget."),
+    scale: float = typer.Option(1.0, help="Multiplies every budget, e.g. 2 on a slow machine."),
+    help_budget: float = typer.Option(0.6, help="Seconds `python main.py --help` may take."),
+):
+    """Checks that each entry point imports within its time budget and without forbidden libraries."""
+    table = Table(title="Import budget")
+    for column in ("Entry point", "Median (s)", "Budget (s)", "Forbidden libraries loaded"):
+        table.add_column(column, justify="right" if "(s)" in column else "left")
+    failures = 0
+
+    for module, budget in BUDGETS.items():
+        runs: List[Dict[str, Any]] = [_import_once(module) for _ in range(repeat)]
+        median = statistics.median(run["seconds"] for run in runs)
+        loaded = set(runs[-1]["modules"])
+        leaked = [name for name in budget["forbidden"] if name in loaded]
+        over = median > budget["seconds"] * scale
+        failures += over or bool(leaked)
+        table.add_row(module, f"[red]{median:.3f}[/red]" if over else f"{median:.3f}",
+                      f"{budget['seconds'] * scale:.2f}", f"[red]{', '.join(leaked)}[/red]" if leaked else "-")
+
+    median = statistics.median(_help_seconds() for _ in range(repeat))
+    over = median > help_budget * scale
+    failures += over
+    table.add_row("main.py --help (wall)", f"[red]{median:.3f}[/red]" if over else f"{median:.3f}",
+                  f"{help_budget * scale:.2f}", "-")
+
+    console.print(table)
+    if failures:
+        console.print(f"[bold red]{failures} entry points are over their import budget.[/bold red]")
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+# Run as `python -m benchmarks.run` from the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from agents import insight, tracing
+from agents.artifacts import clear_artifacts, read_artifact
+from agents.cleaning import execute_plan
+from agents.logger import quiet_console
+from agents.plan_optimizer import describe_step, optimize_plan
+from agents.profiler import get_data_profile
+from agents.engines import resolve_engine
+from benchmarks import stub_llm
+from benchmarks.datasets import DATASETS, ensure_dataset
+from pipeline import run_pipeline
+
+app = typer.Typer()
+console = Console()
+
+STAGES = ["ingest", "plan", "clean", "summary", "documentation", "insight", "insight_report"]
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _summarise(samples: List[float]) -> Dict[str, Any]:
+    return {"median_s": round(statistics.median(samples), 6), "min_s": round(min(samples), 6),
+            "runs": [round(s, 6) for s in samples]}
+
+
+def _time_actions(standardized_path: str, plan: Dict[str, Any], engine: str = "pandas") -> Dict[str, float]:
+    """Profiling and every plan step on their own, run the way the cleaning node runs them."""
+    timings = {}
+    started = time.perf_counter()
+    get_data_profile(standardized_path, engine)
+    timings["profile"] = time.perf_counter() - started
+
+    df = read_artifact(standardized_path)
+    if config.OPTIMIZE_PLAN:
+        plan, _ = optimize_plan(plan, list(df.columns))
+    for i, step in enumerate(plan.get("steps", []), start=1):
+        started = time.perf_counter()
+        df = execute_plan(df, {"steps": [step]}, inplace=True, engine=engine)
+        timings[f"{i}. {describe_step(step)}"] = time.perf_counter() - started
+    clear_artifacts()
+    return timings
+
+
+def benchmark_dataset(path: str, spec: Dict[str, Any], repeat: int, run_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs the whole pipeline `repeat` times on one file, timing every node and every cleaning action."""
+    node_runs: Dict[str, List[float]] = {}
+    action_runs: Dict[str, List[float]] = {}
+    rows = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory(prefix="rtgs-bench-") as output_dir:
+            final_state = run_pipeline(path, {**run_config, "output_dir": output_dir, "resume": False})
+            for span in tracing.spans():
+                if span["cat"] == "node":
+                    node_runs.setdefault(span["name"], []).append(span["dur"] / 1e6)
+            rows = (final_state.get("data_profile") or {}).get("total_rows")
+            engine = resolve_engine(run_config.get("engine", config.ENGINE))
+            for name, seconds in _time_actions(final_state["standardized_data_path"], spec["cleaning_plan"], engine).items():
+                action_runs.setdefault(name, []).append(seconds)
+    return {
+        "file_mb": round(os.path.getsize(path) / (1024 * 1024), 3),
+        "rows": rows,
+        "nodes": {stage: _summarise(node_runs[stage]) for stage in STAGES if stage in node_runs},
+        "actions": {name: _summarise(samples) for name, samples in action_runs.items()},
+    }
+
+
+@app.command()
+def run(
+    kinds: str = typer.Option(",".join(DATASETS), help="Comma-separated dataset shapes to generate."),
+    sizes: str = typer.Option("1,10", help="Comma-separated dataset sizes in MB, e.g. '1,100,2048'."),
+    repeat: int = typer.Option(3, help="Pipeline runs per dataset; medians are reported."),
+    seed: int = typer.Option(0, help="Seed of the synthetic data generator."),
+    latency: float = typer.Option(0.0, help="Seconds of simulated latency added to every stub LLM call."),
+    latency_per_kchar: float = typer.Option(0.0, help="Further simulated latency per 1,000 prompt characters."),
+    engine: str = typer.Option(config.ENGINE, help="Engine for cleaning, profiling and insight aggregations (pandas or polars)."),
+    data_dir: str = typer.Option(os.path.join("benchmarks", "data"), help="Where generated datasets are cached."),
+    results_dir: str = typer.Option(os.path.join("benchmarks", "results"), help="Where result files are written."),
+    label: str = typer.Option("", help="Name of the result file (defaults to the git revision)."),
+):
+    """Times every node and cleaning action on synthetic datasets, with Gemini replaced by a local stub."""
+    quiet_console()
+    insight.console.quiet = True
+    label = label or _git_revision()
+    run_config = {"artifact_format": config.ARTIFACT_FORMAT, "export_csv": config.EXPORT_CSV, "engine": engine}
+    results = {
+        "label": label,
+        "revision": _git_revision(),
+        "finished_at": None,
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "datasets": [],
+    }
+
+    for kind in [k.strip() for k in kinds.split(",") if k.strip()]:
+        if kind not in DATASETS:
+            raise typer.BadParameter(f"Unknown dataset kind '{kind}'. Choose from: {', '.join(DATASETS)}.")
+        spec = DATASETS[kind]
+        for size_mb in [float(s) for s in sizes.split(",") if s.strip()]:
+            console.print(f"[bold]{kind}[/bold] {size_mb:g} MB: generating...", end=" ")
+            path = ensure_dataset(data_dir, kind, size_mb, seed)
+            console.print(f"running x{repeat}...")
+            stub_llm.install(spec["cleaning_plan"], spec["insight_plan"], latency, latency_per_kchar)
+            result = benchmark_dataset(path, spec, repeat, run_config)
+            results["datasets"].append({"kind": kind, "size_mb": size_mb, **result})
+            _print_dataset(kind, size_mb, result)
+
+    results["finished_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    os.makedirs(results_dir, exist_ok=True)
+    results_path = os.path.join(results_dir, f"{label}.json")
+    with open(results_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    console.print(f"Results saved to {results_path}")
+
+
+def _print_dataset(kind: str, size_mb: float, result: Dict[str, Any]) -> None:
+    table = Table(title=f"{kind} {size_mb:g} MB ({result['rows']:,} rows)")
+    table.add_column("Stage / action")
+    table.add_column("Median (s)", justify="right")
+    table.add_column("Min (s)", justify="right")
+    for group in ("nodes", "actions"):
+        for name, timing in result[group].items():
+            table.add_row(name if group == "nodes" else f"  {name}", f"{timing['median_s']:.4f}", f"{timing['min_s']:.4f}")
+    console.print(table)
+
+
+def _medians(results: Dict[str, Any]) -> Dict[tuple, float]:
+    return {
+        (d["kind"], d["size_mb"], name): timing["median_s"]
+        for d in results["datasets"] for group in ("nodes", "actions")
+        for name, timing in d[group].items()
+    }
+
+
+@app.command()
+def compare(
+    baseline: str = typer.Argument(..., help="Result file of the reference revision."),
+    candidate: str = typer.Argument(..., help="Result file to check against it."),
+    threshold: float = typer.Option(0.10, help="Relative slowdown reported as a regression."),
+    min_seconds: float = typer.Option(0.005, help="Timings below this in both files are ignored as noise."),
+):
+    """Compares two result files and exits non-zero if any stage or action got slower than the threshold."""
+    with open(baseline, encoding="utf-8") as f:
+        before = _medians(json.load(f))
+    with open(candidate, encoding="utf-8") as f:
+        after = _medians(json.load(f))
+
+    table = Table(title=f"{os.path.basename(baseline)} -> {os.path.basename(candidate)}")
+    for column in ("Dataset", "Stage / action", "Before (s)", "After (s)", "Change"):
+        table.add_column(column, justify="right" if column in ("Before (s)", "After (s)", "Change") else "left")
+    regressions = 0
+    for key in sorted(before.keys() & after.keys(), key=str):
+        old, new = before[key], after[key]
+        if max(old, new) < min_seconds:
+            continue
+        change = (new - old) / old if old else float("inf")
+        style = "red" if change > threshold else "green" if change < -threshold else ""
+        regressions += change > threshold
+        table.add_row(f"{key[0]} {key[1]:g} MB", key[2], f"{old:.4f}", f"{new:.4f}", f"[{style}]{change:+.1%}[/{style}]" if style else f"{change:+.1%}")
+    console.print(table)
+    if regressions:
+        console.print(f"[bold red]{regressions} timings regressed by more than {threshold:.0%}.[/bold red]")
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,64 @@
+import json
+import time
+from typing import Any, Dict, Optional
+
+import google.generativeai as genai
+
+import config
+from agents import llm_client
+
+# Stands in for `genai.GenerativeModel` so benchmark timings measure the pipeline, not
+# the network. Responses are chosen by recognising which prompt is being sent.
+
+
+def respond(prompt: str, cleaning_plan: Dict[str, Any], insight_plan: Dict[str, Any]) -> str:
+    """The stub's answer to one of the pipeline's four prompts (also served by `stub_server`)."""
+    if "clean and enhance a pandas DataFrame" in prompt:
+        return json.dumps(cleaning_plan)
+    if "high-value analyses" in prompt:
+        return json.dumps(insight_plan)
+    if "numbered analyses" in prompt:
+        count = prompt.count("--- Analysis ")
+        return "\n".join(f"{i}. Policymakers should review finding {i}." for i in range(1, count + 1))
+    return "A synthetic dataset generated for benchmarking the pipeline."
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubGenerativeModel:
+    """Returns fixed answers for the pipeline's four prompts, after an optional simulated latency."""
+
+    cleaning_plan: Dict[str, Any] = {"steps": []}
+    insight_plan: Dict[str, Any] = {"analyses": []}
+    latency_s: float = 0.0
+    latency_per_kchar_s: float = 0.0
+
+    def __init__(self, model_name: str, generation_config: Optional[Dict[str, Any]] = None, **_):
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def generate_content(self, prompt: str, **_) -> StubResponse:
+        # Real calls take longer the more prompt there is to read.
+        delay = self.latency_s + self.latency_per_kchar_s * len(prompt) / 1000
+        if delay:
+            time.sleep(delay)
+        return StubResponse(respond(prompt, self.cleaning_plan, self.insight_plan))
+
+
+def install(cleaning_plan: Dict[str, Any], insight_plan: Dict[str, Any], latency_s: float = 0.0,
+            latency_per_kchar_s: float = 0.0) -> None:
+    """
+    Routes every Gemini call in this process to the stub, with the given plans. The LLM
+    cache is switched off so each run pays for (and measures) the same work.
+    """
+    StubGenerativeModel.cleaning_plan = cleaning_plan
+    StubGenerativeModel.insight_plan = insight_plan
+    StubGenerativeModel.latency_s = latency_s
+    StubGenerativeModel.latency_per_kchar_s = latency_per_kchar_s
+    genai.GenerativeModel = StubGenerativeModel
+    llm_client.reset()
+    config.LLM_CACHE = False
+    config.LLM_SCHEMA_CACHE = False
@@ -0,0 +1,126 @@
+import os
+import sys
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+import typer
+
+# Run as `python -m benchmarks.stub_server` from the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.datasets import DATASETS
+from benchmarks.stub_llm import respond
+
+# A local HTTP server speaking the Gemini REST API (`models/<model>:generateContent`),
+# with the stub's answers. Point the pipeline at it to exercise the real client end to
+# end (connection reuse, timeouts, retries and the circuit breaker) without the network:
+#   RTGS_LLM_API_ENDPOINT=http://127.0.0.1:8765 GOOGLE_API_KEY=stub python main.py run data.csv
+# Injected failures answer 503 (retried by the client) or hang past the client's timeout.
+
+app = typer.Typer()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "StubServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.split("?")[0].endswith(":generateContent"):
+            self._send(404, {"error": {"code": 404, "message": f"Unknown method {self.path}.", "status": "NOT_FOUND"}})
+            return
+        stub = self.server
+        failure = stub.next_failure()
+        if failure == "hang":
+            time.sleep(stub.hang_s)
+        if failure:
+            self._send(503, {"error": {"code": 503, "message": "The stub is overloaded.", "status": "UNAVAILABLE"}})
+            return
+
+        prompt = "".join(part.get("text", "") for content in request.get("contents", []) for part in content.get("parts", []))
+        delay = stub.latency_s + stub.latency_per_kchar_s * len(prompt) / 1000
+        if delay:
+            time.sleep(delay)
+        text = respond(prompt, stub.spec["cleaning_plan"], stub.spec["insight_plan"])
+        # Roughly four characters per token, as for English text.
+        prompt_tokens, response_tokens = max(1, len(prompt) // 4), max(1, len(text) // 4)
+        self._send(200, {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": response_tokens,
+                              "totalTokenCount": prompt_tokens + response_tokens},
+        })
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, spec: Dict[str, Any], latency_s: float = 0.0, latency_per_kchar_s: float = 0.0,
+                 fail_first: int = 0, fail_rate: float = 0.0, hang_rate: float = 0.0, hang_s: float = 0.0, seed: int = 0):
+        super().__init__(address, StubHandler)
+        self.spec = spec
+        self.latency_s = latency_s
+        self.latency_per_kchar_s = latency_per_kchar_s
+        self.fail_first = fail_first
+        self.fail_rate = fail_rate
+        self.hang_rate = hang_rate
+        self.hang_s = hang_s
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_failure(self) -> str:
+        """'fail', 'hang' or '' for the next request, counting it."""
+        with self._lock:
+            self.requests += 1
+            if self.requests <= self.fail_first:
+                return "fail"
+            draw = self._random.random()
+        if draw < self.hang_rate:
+            return "hang"
+        return "fail" if draw < self.hang_rate + self.fail_rate else ""
+
+
+@app.command()
+def serve(
+    kind: str = typer.Option("currency", help=f"Dataset shape whose fixed plans are served: {', '.join(DATASETS)}."),
+    host: str = typer.Option("127.0.0.1", help="Address to listen on."),
+    port: int = typer.Option(8765, help="Port to listen on."),
+    latency: float = typer.Option(0.0, help="Seconds of simulated latency added to every answer."),
+    latency_per_kchar: float = typer.Option(0.0, help="Further simulated latency per 1,000 prompt characters."),
+    fail_first: int = typer.Option(0, help="Answer the first N requests with 503."),
+    fail_rate: float = typer.Option(0.0, help="Share of later requests answered with 503."),
+    hang_rate: float = typer.Option(0.0, help="Share of requests held for --hang-seconds before a 503 (to trip timeouts)."),
+    hang_seconds: float = typer.Option(300.0, help="How long a hanging request is held."),
+    seed: int = typer.Option(0, help="Seed of the failure draws."),
+):
+    """Serves the benchmark stub's answers over the Gemini REST API."""
+    if kind not in DATASETS:
+        raise typer.BadParameter(f"Unknown dataset kind '{kind}'. Choose from: {', '.join(DATASETS)}.")
+    server = StubServer((host, port), DATASETS[kind], latency, latency_per_kchar, fail_first, fail_rate,
+                        hang_rate, hang_seconds, seed)
+    print(f"Stub Gemini server for '{kind}' listening on http://{host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,141 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Central place for tunable pipeline settings. Every value can be overridden
+# through an environment variable (or the .env file).
+
+# Directory that receives every artifact and report of a run.
+OUTPUT_DIR = os.getenv("RTGS_OUTPUT_DIR", "outputs")
+
+# Files at or above this size are profiled in streaming chunks instead of in memory.
+LARGE_FILE_MB = float(os.getenv("RTGS_LARGE_FILE_MB", "100"))
+
+# Number of rows read per chunk by the streaming profiler.
+PROFILE_CHUNK_ROWS = int(os.getenv("RTGS_PROFILE_CHUNK_ROWS", "200000"))
+
+# Format of the intermediate artifacts handed between nodes: feather, parquet or csv.
+ARTIFACT_FORMATS = ("feather", "parquet", "csv")
+ARTIFACT_FORMAT = os.getenv("RTGS_ARTIFACT_FORMAT", "feather")
+
+# Also export the cleaned data as CSV (the final deliverable) when artifacts are columnar.
+EXPORT_CSV = os.getenv("RTGS_EXPORT_CSV", "true").lower() in ("1", "true", "yes")
+
+
+def get_option(state, name: str):
+    """Returns a per-run option from the state's `run_config`, falling back to the default above."""
+    return (state.get("run_config") or {}).get(name, globals()[name.upper()])
+
+# Bytes sampled from the head of the input to sniff its encoding and delimiter.
+INGEST_SAMPLE_BYTES = int(os.getenv("RTGS_INGEST_SAMPLE_BYTES", str(1024 * 1024)))
+
+# pandas parser used at ingestion: 'c' (default, same dtypes as before) or 'pyarrow'
+# (multi-threaded, but infers dates and returns None for missing text).
+INGEST_ENGINE = os.getenv("RTGS_INGEST_ENGINE", "c")
+
+# Worker processes for parallel ingestion of large, well-formed CSVs (1 disables it).
+INGEST_WORKERS = int(os.getenv("RTGS_INGEST_WORKERS", str(os.cpu_count() or 1)))
+
+# Inputs below this size are parsed serially; pool start-up would outweigh the gain.
+PARALLEL_INGEST_MIN_MB = float(os.getenv("RTGS_PARALLEL_INGEST_MIN_MB", "128"))
+
+# Engine for cleaning steps, profiling and insight aggregations: 'pandas', or 'polars'
+# (needs `pip install -r requirements-polars.txt`; Polars' thread count follows
+# POLARS_MAX_THREADS). Only the operations Polars speeds up run there; see agents.engines.
+ENGINES = ("pandas", "polars")
+ENGINE = os.getenv("RTGS_ENGINE", "pandas")
+
+# Reorder and prune the AI cleaning plan before executing it.
+OPTIMIZE_PLAN = os.getenv("RTGS_OPTIMIZE_PLAN", "true").lower() in ("1", "true", "yes")
+
+# On-disk cache of Gemini responses, keyed by model, generation config and prompt.
+LLM_CACHE = os.getenv("RTGS_LLM_CACHE", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_DIR = os.getenv("RTGS_LLM_CACHE_DIR", ".cache/llm")
+
+# Entries stored longer ago than this are ignored and evicted.
+LLM_CACHE_TTL_HOURS = float(os.getenv("RTGS_LLM_CACHE_TTL_HOURS", str(7 * 24)))
+
+# Least recently used entries are evicted once the cache grows past this size.
+LLM_CACHE_MAX_MB = float(os.getenv("RTGS_LLM_CACHE_MAX_MB", "64"))
+
+# Reuse the cleaning plan of an earlier run whose data had the same schema fingerprint
+# (column names, types and coarse statistics), e.g. a daily re-delivery of the same dataset.
+LLM_SCHEMA_CACHE = os.getenv("RTGS_LLM_SCHEMA_CACHE", "true").lower() in ("1", "true", "yes")
+
+# Gemini connection: 'grpc' or 'rest' (the library picks when empty; 'rest' goes through
+# HTTPS_PROXY), and another API endpoint, e.g. 'http://127.0.0.1:8765' for a local stub
+# server (an http(s):// endpoint uses 'rest').
+LLM_TRANSPORT = os.getenv("RTGS_LLM_TRANSPORT", "")
+LLM_API_ENDPOINT = os.getenv("RTGS_LLM_API_ENDPOINT", "")
+
+# Gemini requests in flight at once across the whole process, and seconds each may take.
+LLM_MAX_CONCURRENCY = int(os.getenv("RTGS_LLM_MAX_CONCURRENCY", "16"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("RTGS_LLM_TIMEOUT_SECONDS", "120"))
+
+# Retries of a request that failed with a timeout, a dropped connection, rate limiting or a
+# 5xx error, after a random wait of up to LLM_BACKOFF_SECONDS * 2^attempt (at most 30 s).
+LLM_MAX_RETRIES = int(os.getenv("RTGS_LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_SECONDS = float(os.getenv("RTGS_LLM_BACKOFF_SECONDS", "1"))
+
+# After this many failed requests in a row, Gemini calls fail straight away for the
+# cooldown; then one request is let through to test whether the service is back.
+LLM_BREAKER_FAILURES = int(os.getenv("RTGS_LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("RTGS_LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+# Every model call of every run (prompt size, tokens, latency, retries, cache status) is
+# appended to this file (empty disables it). After LLM_LEDGER_HISTORY_RUNS runs it is moved
+# to '<file>.1' and a new one is started, so the latest N to 2N runs are kept.
+LLM_LEDGER_HISTORY = os.getenv("RTGS_LLM_LEDGER_HISTORY", ".cache/llm_calls.jsonl")
+LLM_LEDGER_HISTORY_RUNS = int(os.getenv("RTGS_LLM_LEDGER_HISTORY_RUNS", "200"))
+
+# Prompts of at least this many tokens are logged as a warning.
+LLM_PROMPT_WARN_TOKENS = int(os.getenv("RTGS_LLM_PROMPT_WARN_TOKENS", "100000"))
+
+# Processes that render insight plots in parallel (1 renders them in-process, one at a time).
+PLOT_WORKERS = int(os.getenv("RTGS_PLOT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# From this many rows on, histograms are drawn from binned counts with a binned KDE, and
+# scatter plots as 2D histograms of point density.
+LARGE_PLOT_ROWS = int(os.getenv("RTGS_LARGE_PLOT_ROWS", "100000"))
+
+# Skip graph stages whose checkpoint (input, upstream stages, code and settings) is still valid.
+RESUME = os.getenv("RTGS_RESUME", "true").lower() in ("1", "true", "yes")
+
+# Datasets processed concurrently by the `batch` command.
+BATCH_JOBS = int(os.getenv("RTGS_BATCH_JOBS", str(max(1, (os.cpu_count() or 1) // 2))))
+
+# Rows of a text column tokenized at a time by the word_frequency analysis.
+WORD_COUNT_CHUNK_ROWS = int(os.getenv("RTGS_WORD_COUNT_CHUNK_ROWS", "100000"))
+
+# Text columns with at least this many rows are counted on the plot workers (if any).
+WORD_COUNT_PARALLEL_MIN_ROWS = int(os.getenv("RTGS_WORD_COUNT_PARALLEL_MIN_ROWS", "500000"))
+
+# Distinct words tracked while counting (0 = unbounded, exact). With a bound, a heavy-hitter
+# sketch finds the candidates and a second pass counts them exactly.
+WORD_COUNT_MAX_VOCAB = int(os.getenv("RTGS_WORD_COUNT_MAX_VOCAB", "0"))
+
+# Store columns compactly from ingestion on: low-cardinality text as categories, other text
+# as Arrow strings, integers in the smallest type that fits. Values are unchanged.
+COMPACT_DTYPES = os.getenv("RTGS_COMPACT_DTYPES", "true").lower() in ("1", "true", "yes")
+
+# Text columns whose distinct values are at most this share of their rows become categories.
+COMPACT_CATEGORY_MAX_RATIO = float(os.getenv("RTGS_COMPACT_CATEGORY_MAX_RATIO", "0.5"))
+
+# Profiles with more columns than this are planned in shards of PLAN_SHARD_COLUMNS columns,
+# sent to the model concurrently, plus one dataset-level pass.
+WIDE_TABLE_COLUMNS = int(os.getenv("RTGS_WIDE_TABLE_COLUMNS", "150"))
+PLAN_SHARD_COLUMNS = int(os.getenv("RTGS_PLAN_SHARD_COLUMNS", "60"))
+
+# Planning requests in flight at once for a wide table.
+PLANNER_WORKERS = int(os.getenv("RTGS_PLANNER_WORKERS", "16"))
+
+# Feather and Parquet standardized files at or above this size are cleaned out of core:
+# streaming passes gather the plan's column statistics, and a last pass cleans
+# CLEAN_CHUNK_ROWS rows at a time and appends them to the output.
+CHUNKED_CLEANING_MB = float(os.getenv("RTGS_CHUNKED_CLEANING_MB", "2048"))
+CLEAN_CHUNK_ROWS = int(os.getenv("RTGS_CLEAN_CHUNK_ROWS", "500000"))
+
+# Duplicate removal keeps its row fingerprints (16 bytes per row) in memory up to this
+# size, then spills them to disk in hash partitions.
+DEDUP_MEMORY_MB = float(os.getenv("RTGS_DEDUP_MEMORY_MB", "512"))
@@ -1,21 +1,15 @@
 import os
+import sys
+import importlib.util
 import typer
 import traceback
 from datetime import datetime
-from langgraph.graph import StateGraph, END
 
 # We will wrap the agent imports in a try block as well
 try:
+    import config
     from agents.logger import logger, log_error_and_exit
-    from state import GraphState
-    from agents.ingestion import ingestion_node
-    from agents.planning import planning_node
-    from agents.cleaning import cleaning_node
-    from agents.insight import insight_node
-    # --- START: UPGRADE - Re-import BOTH report builders ---
-    from agents.insight_report import insight_report_node
-    from agents.documentation import documentation_node # Re-import the original report node
-    # --- END: UPGRADE ---
+    from agents.batch import discover_inputs, run_batch, write_batch_summary
 except ImportError as e:
     # This will catch errors like the one you saw if a module is missing or has an issue
     print("\n[ERROR] A critical error occurred during application startup.")
@@ -33,11 +27,32 @@ except ImportError as e:
 # The logger is now created in the logger.py file
 app = typer.Typer()
 
+def validate_options(artifact_format: str, engine: str) -> None:
+    """Rejects an unknown artifact format or engine, or the polars engine without polars installed."""
+    if artifact_format not in config.ARTIFACT_FORMATS:
+        raise ValueError(f"Unknown artifact format '{artifact_format}'. Choose one of: {', '.join(config.ARTIFACT_FORMATS)}.")
+    if engine not in config.ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Choose one of: {', '.join(config.ENGINES)}.")
+    # Looked up rather than imported, so a missing package is reported before any work starts.
+    if engine == "polars" and importlib.util.find_spec("polars") is None:
+        raise ValueError("The polars engine needs the optional polars package: "
+                         "pip install -r requirements-polars.txt (or use --engine pandas).")
+
 @app.command()
-def run(input_file: str = typer.Argument(..., help="Path to the input CSV file.")):
+def run(
+    input_file: str = typer.Argument(..., help="Path to the input CSV file."),
+    artifact_format: str = typer.Option(config.ARTIFACT_FORMAT, help=f"Format of intermediate artifacts: {', '.join(config.ARTIFACT_FORMATS)}."),
+    export_csv: bool = typer.Option(config.EXPORT_CSV, help="Also export the cleaned data as CSV."),
+    engine: str = typer.Option(config.ENGINE, help=f"Engine for cleaning, profiling and insight aggregations: {', '.join(config.ENGINES)}."),
+    workers: int = typer.Option(config.INGEST_WORKERS, help="Worker processes for parallel ingestion of large files (1 disables it)."),
+    resume: bool = typer.Option(config.RESUME, "--resume/--fresh", help="Reuse the outputs of stages that are unchanged since the last run."),
+    output_dir: str = typer.Option(config.OUTPUT_DIR, help="Directory for the run's artifacts and reports."),
+):
     """Runs the full Automated EDA pipeline with a clean, logged interface."""
     
     try:
+        validate_options(artifact_format, engine)
+
         logger.info("[bold green]Starting Automated EDA Pipeline...[/bold green]")
         
         # --- Pre-flight Checks ---
@@ -48,38 +63,23 @@ def run(input_file: str = typer.Argument(..., help="Path to the input CSV file."
             raise ValueError(f"Input file is empty.")
         logger.info("    File verified successfully.")
 
-        # --- Define Graph ---
-        workflow = StateGraph(GraphState)
-        workflow.add_node("ingest", ingestion_node)
-        workflow.add_node("plan", planning_node)
-        workflow.add_node("clean", cleaning_node)
-        workflow.add_node("insight", insight_node)
-        # --- START: UPGRADE - Add BOTH report nodes to the graph ---
-        workflow.add_node("documentation", documentation_node) # The original technical report
-        workflow.add_node("insight_report", insight_report_node) # The new analytical report
-        
-        workflow.set_entry_point("ingest")
-        workflow.add_edge("ingest", "plan")
-        workflow.add_edge("plan", "clean")
-        workflow.add_edge("clean", "insight")
-        # Re-wire the final steps to run both report builders in sequence
-        workflow.add_edge("insight", "documentation")
-        workflow.add_edge("documentation", "insight_report")
-        workflow.add_edge("insight_report", END)
-        # --- END: UPGRADE ---
-        graph = workflow.compile()
-
         # --- Execute Pipeline ---
-        initial_state = {"raw_data_path": input_file}
+        run_config = {
+            "artifact_format": artifact_format, "export_csv": export_csv, "engine": engine, "ingest_workers": workers,
+            "resume": resume, "output_dir": output_dir,
+        }
         logger.info("--> Executing data processing and analysis pipeline...")
-        final_state = graph.invoke(initial_state)
+        # Imported here: the pipeline loads the agents' libraries, which `--help` and a failed
+        # pre-flight check have no use for.
+        from pipeline import run_pipeline
+        final_state = run_pipeline(input_file, run_config)
 
         logger.info("\n[bold green]Automated EDA Pipeline Complete![/bold green]")
         # --- START: UPGRADE - Update the final message to mention both reports ---
         # The documentation_path key will now point to the last report generated
-        logger.info(f"    - Analytical Insight Report: outputs/insights/insight_report.md")
-        logger.info(f"    - Technical Run Report: outputs/run_report.md")
-        logger.info(f"    - Cleaned Data: {final_state.get('cleaned_data_path')}")
+        logger.info(f"    - Analytical Insight Report: {os.path.join(output_dir, 'insights', 'insight_report.md')}")
+        logger.info(f"    - Technical Run Report: {os.path.join(output_dir, 'run_report.md')}")
+        logger.info(f"    - Cleaned Data: {final_state.get('cleaned_csv_path') or final_state.get('cleaned_data_path')}")
         # --- END: UPGRADE ---
 
     except PermissionError as e:
@@ -94,10 +94,52 @@ def run(input_file: str = typer.Argument(..., help="Path to the input CSV file."
         # Catch any other unexpected runtime errors
         log_error_and_exit(logger, e)
 
+@app.command()
+def batch(
+    inputs: str = typer.Argument(..., help="Directory of datasets, or a glob pattern such as 'data/**/*.csv'."),
+    output_root: str = typer.Option(os.path.join(config.OUTPUT_DIR, "batch"), help="Each dataset gets its own sub-directory here."),
+    jobs: int = typer.Option(config.BATCH_JOBS, help="Datasets processed at the same time (worker processes)."),
+    artifact_format: str = typer.Option(config.ARTIFACT_FORMAT, help=f"Format of intermediate artifacts: {', '.join(config.ARTIFACT_FORMATS)}."),
+    export_csv: bool = typer.Option(config.EXPORT_CSV, help="Also export the cleaned data as CSV."),
+    engine: str = typer.Option(config.ENGINE, help=f"Engine for cleaning, profiling and insight aggregations: {', '.join(config.ENGINES)}."),
+    resume: bool = typer.Option(config.RESUME, "--resume/--fresh", help="Reuse the outputs of stages that are unchanged since the last run."),
+):
+    """Runs the pipeline on many datasets concurrently and writes a throughput summary."""
+    try:
+        validate_options(artifact_format, engine)
+        input_files = discover_inputs(inputs)
+        if not input_files:
+            raise FileNotFoundError(f"No datasets found for '{inputs}'.")
+        jobs = max(1, min(jobs, len(input_files)))
+
+        logger.info(f"[bold green]Starting batch of {len(input_files)} datasets on {jobs} workers...[/bold green]")
+        run_config = {"artifact_format": artifact_format, "export_csv": export_csv, "engine": engine, "resume": resume}
+        summary = run_batch(input_files, output_root, jobs, run_config)
+        summary_path = write_batch_summary(summary, output_root)
+
+        logger.info(f"\n[bold green]Batch complete:[/bold green] {summary['succeeded']}/{summary['files']} succeeded "
+                    f"in {summary['wall_seconds']:.1f}s ({summary['files_per_minute']} files/min).")
+        logger.info(f"    - Batch Summary: {summary_path}")
+        if summary["failed"]:
+            raise typer.Exit(code=1)
+
+    except (ValueError, FileNotFoundError) as e:
+        log_error_and_exit(logger, e)
+
+def with_default_command(args):
+    """
+    `python main.py data.csv` (the interface before `batch` was added) still runs one file:
+    arguments that do not start with a command or a top-level option go to `run`.
+    """
+    commands = {command.name or command.callback.__name__ for command in app.registered_commands}
+    if args and args[0] not in commands and args[0] not in ("--help", "--install-completion", "--show-completion"):
+        return ["run"] + list(args)
+    return list(args)
+
 if __name__ == "__main__":
     # This is the master safety net. It will catch any error, including ImportErrors.
     try:
-        app()
+        app(args=with_default_command(sys.argv[1:]))
     except Exception as e:
         # This part runs if something catastrophic happened before the logger was even ready
         print("\nAn unexpected critical error occurred.")
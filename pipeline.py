@@ -0,0 +1,145 @@
+import os
+import sys
+import importlib
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict
+
+from langgraph.graph import StateGraph, END
+
+from state import GraphState
+import config
+from agents import llm_ledger, tracing
+from agents.checkpoint import checkpoint_dir, checkpointed, refresh_file_signature
+from agents.logger import logger
+from agents.documentation import add_performance_section, run_report_path
+
+# Each stage's node, as (module, function). Node modules pull in pandas, sklearn,
+# matplotlib, NLTK and the Gemini client, so a module is imported when its node first
+# runs: `--help`, a failed pre-flight check, or a stage replayed from its checkpoint
+# never loads them.
+NODES = {
+    "ingest": ("agents.ingestion", "ingestion_node"),
+    "plan": ("agents.planning", "planning_node"),
+    "clean": ("agents.cleaning", "cleaning_node"),
+    "summary": ("agents.insight_report", "dataset_summary_node"),
+    "insight": ("agents.insight", "insight_node"),
+    "documentation": ("agents.documentation", "documentation_node"), # The original technical report
+    "insight_report": ("agents.insight_report", "insight_report_node"), # The new analytical report
+}
+
+# Parallel branches can reach their first node at the same time; importing one module
+# at a time keeps two threads from compiling sources at once (see `checkpoint.code_hash`).
+_import_lock = threading.Lock()
+
+
+def _lazy_node(module_name: str, function_name: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """A node that imports its module on first call. It reports the module's name, which checkpoints hash."""
+    def run(state: Dict[str, Any]) -> Dict[str, Any]:
+        with _import_lock:
+            module = importlib.import_module(module_name)
+        return getattr(module, function_name)(state)
+    run.__module__ = module_name
+    run.__name__ = function_name
+    return run
+
+
+def load_nodes() -> None:
+    """Imports every node module now, for processes such as batch workers that run many jobs."""
+    for module_name, _ in NODES.values():
+        importlib.import_module(module_name)
+
+
+@lru_cache(maxsize=1)
+def build_graph():
+    """Compiles the pipeline graph once per process; batch workers reuse it for every job."""
+    # Every node is checkpointed and traced; the list names the stages whose output it consumes.
+    def stage(name, upstream):
+        return tracing.traced(name, checkpointed(name, _lazy_node(*NODES[name]), upstream))
+
+    workflow = StateGraph(GraphState)
+    workflow.add_node("ingest", stage("ingest", []))
+    workflow.add_node("plan", stage("plan", ["ingest"]))
+    workflow.add_node("clean", stage("clean", ["plan"]))
+    workflow.add_node("summary", stage("summary", ["plan"]))
+    workflow.add_node("insight", stage("insight", ["clean"]))
+    workflow.add_node("documentation", stage("documentation", ["clean"]))
+    workflow.add_node("insight_report", stage("insight_report", ["insight", "summary"]))
+
+    # Branches leaving the same node run concurrently (LangGraph executes each
+    # step's nodes on a thread pool), so the dataset summary's LLM call overlaps
+    # cleaning, and the run report is written while insights are generated.
+    workflow.set_entry_point("ingest")
+    workflow.add_edge("ingest", "plan")
+    workflow.add_edge("plan", "clean")
+    workflow.add_edge("plan", "summary")
+    workflow.add_edge("clean", "insight")
+    workflow.add_edge("clean", "documentation")
+    # The insight report waits for both the insights and the summary.
+    workflow.add_edge(["insight", "summary"], "insight_report")
+    workflow.add_edge("documentation", END)
+    workflow.add_edge("insight_report", END)
+    return workflow.compile()
+
+
+def run_pipeline(input_file: str, run_config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs the whole graph on one input file and returns the final state. pandas'
+    Copy-on-Write is on while the graph runs and restored afterwards.
+    """
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(f"Input file not found.")
+    if os.path.getsize(input_file) == 0:
+        raise ValueError(f"Input file is empty.")
+
+    initial_state = {"raw_data_path": input_file, "run_config": run_config}
+    tracing.start_trace()
+    llm_ledger.start_ledger()
+    # Nodes share frames by reference (see `agents.artifacts`); Copy-on-Write lets a node
+    # modify a frame it was handed without changing the original. It is set here rather
+    # than at import, so importing the agents leaves pandas' behaviour alone.
+    import pandas as pd
+    try:
+        with pd.option_context("mode.copy_on_write", True):
+            final_state = build_graph().invoke(initial_state)
+    finally:
+        # Frames are only cached if a node that writes artifacts ran (and imported the module).
+        artifacts = sys.modules.get("agents.artifacts")
+        if artifacts is not None:
+            artifacts.clear_artifacts()
+    write_performance_report(final_state)
+    return final_state
+
+
+def write_performance_report(state: Dict[str, Any]) -> None:
+    """
+    Saves the run's trace and model-call ledger next to its outputs, adds the ledger to the
+    history of all runs, and adds the timing and call tables to the run report.
+    """
+    output_dir = config.get_option(state, "output_dir")
+    trace_path = tracing.write_chrome_trace(os.path.join(output_dir, "trace.json"))
+    logger.debug(f"Saved performance trace to {trace_path}")
+    ledger_path = llm_ledger.write_ledger(os.path.join(output_dir, "llm_calls.jsonl"))
+    logger.debug(f"Saved model-call ledger to {ledger_path}")
+    run = {"run": f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}",
+           "input": os.path.basename(state.get("raw_data_path", ""))}
+    try:
+        llm_ledger.append_history(run)
+    except OSError as e:
+        logger.warning(f"Could not add this run's model calls to {config.LLM_LEDGER_HISTORY}: {e}")
+    report_path = run_report_path(state)
+    if not os.path.exists(report_path):
+        return
+    try:
+        history = llm_ledger.history_table(run["input"])
+        llm_calls = llm_ledger.ledger_table()
+        if history:
+            llm_calls += (f"\n\nThe largest prompt of each kind in the runs on `{run['input']}` recorded in "
+                          f"`{config.LLM_LEDGER_HISTORY}`:\n\n{history}")
+        add_performance_section(report_path, tracing.timing_table(), llm_calls)
+    except OSError as e:
+        logger.error(f"Could not add the timing table to {report_path}: {e}")
+        return
+    # The report is the documentation stage's output; keep its checkpoint valid.
+    refresh_file_signature(checkpoint_dir(state), report_path)
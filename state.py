@@ -1,4 +1,10 @@
-from typing import TypedDict, List, Dict, Any
+import operator
+from typing import Annotated, TypedDict, List, Dict, Any
+
+
+def _merge(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    return {**(left or {}), **(right or {})}
+
 
 class GraphState(TypedDict):
     """
@@ -9,17 +15,38 @@ class GraphState(TypedDict):
     raw_data_path: str
     standardized_data_path: str
     cleaned_data_path: str
+    cleaned_csv_path: str
+
+    # Encoding, delimiter and structural health sniffed from the raw file at ingestion
+    source_format: Dict[str, Any]
+
+    # Per-run options chosen on the command line (see config.get_option)
+    run_config: Dict[str, Any]
 
     # The AI-generated plan for cleaning the data
     cleaning_plan: Dict[str, Any]
 
+    # The plan as actually executed after optimization, with the rewrites applied
+    optimized_plan: Dict[str, Any]
+
+    # Which columns the executed plan wrote or dropped and whether it removed rows,
+    # so the cleaned data's profile can be derived from `data_profile`
+    cleaning_lineage: Dict[str, Any]
+
     # --- START: NEW ADDITION ---
     # The statistical profile of the data, to be used for the final report
     data_profile: Dict[str, Any]
     # --- END: NEW ADDITION ---
 
-    # A running log of actions taken during the process
-    log_messages: List[str]
+    # AI-written overview of the dataset, produced alongside cleaning from the profile
+    dataset_summary: str
+
+    # A running log of actions taken during the process. Nodes return only their
+    # new messages; the reducer appends them, so parallel branches can both log.
+    log_messages: Annotated[List[str], operator.add]
+
+    # Checkpoint key of every stage that has run (or been restored) so far
+    stage_keys: Annotated[Dict[str, str], _merge]
 
     # The final insights and artifacts generated
     insights: Dict[str, Any]
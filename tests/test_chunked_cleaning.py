@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents import chunked_cleaning
+from agents.artifacts import read_artifact, write_artifact
+from agents.chunked_cleaning import clean_in_chunks
+from agents.cleaning import execute_plan
+
+
+def _frame(rows: int = 600) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    price = rng.normal(100, 30, rows).round(2)
+    price[rng.random(rows) < 0.1] = np.nan
+    quantity = rng.integers(0, 50, rows).astype("float64")
+    quantity[rng.random(rows) < 0.15] = np.nan
+    # Negative zeros and repeated values put the median's radix narrowing to work.
+    quantity[:5] = -0.0
+    category = rng.choice(np.array(["north", "south", "east", "west", "unknown"], dtype=object), rows)
+    category[rng.random(rows) < 0.1] = None
+    amount = np.array([f"${v:,.2f}" for v in rng.uniform(0, 5000, rows)], dtype=object)
+    amount[rng.random(rows) < 0.05] = "n/a"
+    df = pd.DataFrame({
+        "id": np.arange(rows) % 450,
+        "price": price,
+        "quantity": quantity,
+        "category": category,
+        "amount": amount,
+        "score": rng.exponential(3, rows),
+        "weight": rng.normal(70, 12, rows),
+    })
+    # Exact copies of earlier rows, some of them in later chunks.
+    return pd.concat([df, df.iloc[::7]], ignore_index=True)
+
+
+PLAN = {"steps": [
+    {"action": "remove_duplicates", "details": {}},
+    {"action": "clean_categorical", "column": "category", "details": {"valid_values": ["north", "south", "east", "west"]}},
+    # Statistics taken after the filter, so they need a pass of their own.
+    {"action": "fill_missing", "column": "price", "details": {"strategy": "mean"}},
+    {"action": "fill_missing", "column": "quantity", "details": {"strategy": "median"}},
+    {"action": "fill_missing", "column": "category", "details": {"strategy": "mode"}},
+    {"action": "convert_type", "column": "amount",
+     "details": {"new_type": "float64", "pre_processing": ["remove_currency", "remove_commas"]}},
+    {"action": "scale_numeric", "column": "score", "details": {"strategy": "min_max"}},
+    {"action": "scale_numeric", "column": "weight", "details": {"strategy": "standard"}},
+    {"action": "remove_duplicates", "details": {"subset": ["id"]}},
+]}
+
+
+def _clean_both(tmp_path, df, plan, chunk_rows, fmt="feather"):
+    input_path = str(tmp_path / f"standardized.{fmt}")
+    write_artifact(df, input_path, keep_in_memory=False)
+
+    lineage = {}
+    expected = execute_plan(read_artifact(input_path), plan, lineage=lineage)
+    # Written and read back, as the cleaning node stores its output.
+    expected_path = str(tmp_path / f"expected.{fmt}")
+    write_artifact(expected, expected_path, keep_in_memory=False)
+
+    chunked_lineage = {}
+    output_path = str(tmp_path / f"cleaned.{fmt}")
+    counts = clean_in_chunks(input_path, plan, output_path, None, chunk_rows, lineage=chunked_lineage)
+    return read_artifact(expected_path), read_artifact(output_path), lineage, chunked_lineage, counts
+
+
+@pytest.mark.parametrize("fmt", ["feather", "parquet"])
+def test_chunked_cleaning_matches_in_memory(tmp_path, fmt):
+    expected, result, lineage, chunked_lineage, counts = _clean_both(tmp_path, _frame(), PLAN, chunk_rows=37, fmt=fmt)
+
+    assert counts["rows_out"] == len(expected)
+    assert counts["passes"] > 2
+    # Means and standard deviations are summed per chunk: equal up to rounding.
+    pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-12)
+    assert chunked_lineage == lineage
+
+
+def test_exact_median_over_many_narrowing_passes(tmp_path, monkeypatch):
+    # Keeping at most a few values forces the median through all four 16-bit prefixes.
+    monkeypatch.setattr(chunked_cleaning._Median, "KEEP_VALUES", 3)
+    plan = {"steps": [{"action": "fill_missing", "column": "quantity", "details": {"strategy": "median"}}]}
+    for rows in (600, 601):
+        df = _frame(rows)
+        expected, result, _, _, counts = _clean_both(tmp_path, df, plan, chunk_rows=50)
+        assert counts["passes"] >= 5
+        pd.testing.assert_frame_equal(result, expected, check_exact=True)
+
+
+def test_fill_upcasts_chunks_without_gaps(tmp_path):
+    # Only the last chunk has a gap; filling it with text makes the whole column object.
+    df = pd.DataFrame({"value": np.arange(100, dtype="float64"), "key": np.arange(100)})
+    df.loc[95, "value"] = np.nan
+    plan = {"steps": [{"action": "fill_missing", "column": "value", "details": {"strategy": "constant", "fill_value": "missing"}}]}
+    expected, result, _, _, _ = _clean_both(tmp_path, df, plan, chunk_rows=10)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_convert_type_unifies_chunk_dtypes(tmp_path):
+    # Whole numbers in the first chunks, fractions in the last: every chunk ends up float64.
+    values = [str(i) for i in range(90)] + [f"{i}.5" for i in range(10)]
+    df = pd.DataFrame({"amount": pd.Series(values, dtype=object), "key": np.arange(100)})
+    plan = {"steps": [{"action": "convert_type", "column": "amount", "details": {"pre_processing": []}}]}
+    expected, result, _, _, _ = _clean_both(tmp_path, df, plan, chunk_rows=10)
+    pd.testing.assert_frame_equal(result, expected)
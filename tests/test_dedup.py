@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents.dedup import Deduplicator, drop_duplicate_rows, row_fingerprints
+
+
+def _assert_same_as_pandas(df: pd.DataFrame, subset=None) -> None:
+    expected = df.drop_duplicates(subset)
+    result, removed = drop_duplicate_rows(df, subset)
+    pd.testing.assert_frame_equal(result, expected)
+    assert removed == len(df) - len(expected)
+
+
+def test_signed_zeros_and_missing_floats():
+    df = pd.DataFrame({"x": [0.0, -0.0, np.nan, np.nan, 1.5, -1.5, 1.5], "y": [1, 1, 2, 2, 3, 3, 3]})
+    _assert_same_as_pandas(df)
+    _assert_same_as_pandas(df, ["x"])
+
+
+def test_equal_numbers_of_different_types_in_object_columns():
+    mixed = pd.Series([1, 1.0, True, "1", 0, False, 0.0, -0.0, 2.5, "2.5", None, np.nan], dtype=object)
+    df = pd.DataFrame({"value": mixed, "group": ["a"] * len(mixed)})
+    _assert_same_as_pandas(df)
+    _assert_same_as_pandas(df, ["value"])
+    _assert_same_as_pandas(df[["value"]])
+
+
+def test_typed_nulls_in_a_lone_object_column():
+    # A single object column tells None, NaN, NA and NaT apart; several columns do not.
+    values = pd.Series([None, np.nan, pd.NA, pd.NaT, None, np.nan, pd.NA, pd.NaT, "a"], dtype=object)
+    df = pd.DataFrame({"value": values, "other": 1})
+    _assert_same_as_pandas(df[["value"]])
+    _assert_same_as_pandas(df, ["value"])
+    _assert_same_as_pandas(df)
+
+
+def test_compact_and_datetime_columns():
+    df = pd.DataFrame({
+        "category": pd.Categorical(["a", "b", None, "a", "b", None]),
+        "text": pd.array(["x", None, "y", "x", None, "y"], dtype="string[pyarrow]"),
+        "when": pd.to_datetime(["2024-01-01", None, "2024-01-02", "2024-01-01", None, "2024-01-02"]),
+        "small": np.array([1, 2, 3, 1, 2, 3], dtype="int8"),
+    })
+    _assert_same_as_pandas(df)
+    _assert_same_as_pandas(df, ["category", "when"])
+
+
+def test_combined_key_overflow_is_renumbered():
+    # Eight text columns of 300 values each have more combinations than an int64 holds.
+    rng = np.random.default_rng(3)
+    base = pd.DataFrame({f"c{i}": rng.integers(0, 300, 1500).astype(str).astype(object) for i in range(8)})
+    df = pd.concat([base, base.sample(500, random_state=1)], ignore_index=True)
+    _assert_same_as_pandas(df)
+    _assert_same_as_pandas(df, [f"c{i}" for i in range(0, 8, 2)])
+
+
+def _frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(11)
+    df = pd.DataFrame({
+        "id": rng.integers(0, rows // 2, rows),
+        "name": rng.choice(np.array(["ann", "bob", "cy", None], dtype=object), rows),
+        "score": rng.integers(0, 4, rows) / 2,
+    })
+    return df
+
+
+@pytest.mark.parametrize("subset", [None, ["id"], ["name", "score"]])
+def test_spilled_deduplicator_matches_in_memory(tmp_path, subset):
+    df = _frame(20_000)
+    chunks = [df.iloc[start:start + 1_500] for start in range(0, len(df), 1_500)]
+
+    in_memory = Deduplicator(subset)
+    spilled = Deduplicator(subset, memory_mb=0.01, spill_dir=str(tmp_path))
+    for chunk in chunks:
+        in_memory.add(chunk)
+        spilled.add(chunk)
+    assert spilled.spill_path is not None
+
+    removed = spilled.finish()
+    assert removed == in_memory.finish()
+    assert spilled.spill_path is None and not list(tmp_path.iterdir())
+
+    expected = df.drop_duplicates(subset)
+    assert removed == len(df) - len(expected)
+    offset = 0
+    for chunk in chunks:
+        assert np.array_equal(spilled.keep(offset, len(chunk)), in_memory.keep(offset, len(chunk)))
+        offset += len(chunk)
+    keep = np.concatenate([spilled.keep(0, 7_000), spilled.keep(7_000, len(df) - 7_000)])
+    pd.testing.assert_frame_equal(df[keep], expected)
+
+
+def test_fingerprints_do_not_depend_on_the_frame():
+    # By value, a row's fingerprint is the same in any chunk, which chunked cleaning relies on.
+    df = _frame(1_000)
+    hi, lo = row_fingerprints(df)
+    part_hi, part_lo = row_fingerprints(df.iloc[400:600])
+    assert np.array_equal(hi[400:600], part_hi) and np.array_equal(lo[400:600], part_lo)
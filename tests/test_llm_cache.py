@@ -0,0 +1,70 @@
+import os
+import time
+
+import pytest
+
+import config
+from agents import llm_cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "LLM_CACHE", True)
+    monkeypatch.setattr(config, "LLM_CACHE_DIR", str(tmp_path / "llm"))
+    monkeypatch.setattr(config, "LLM_CACHE_TTL_HOURS", 1.0)
+    monkeypatch.setattr(llm_cache, "_size_estimate", None)
+    return tmp_path / "llm"
+
+
+def _age(key: str, stored_hours_ago: float, used_hours_ago: float) -> None:
+    now = time.time()
+    os.utime(llm_cache._entry_path(key), (now - used_hours_ago * 3600, now - stored_hours_ago * 3600))
+
+
+def test_get_and_evict_expire_by_the_same_clock(cache_dir):
+    for key in ("fresh", "stale", "stale-but-used"):
+        llm_cache.put(key, key)
+    _age("stale", stored_hours_ago=2, used_hours_ago=2)
+    # Used a moment ago, but stored before the TTL: expired for both.
+    _age("stale-but-used", stored_hours_ago=2, used_hours_ago=0)
+    _age("fresh", stored_hours_ago=0.5, used_hours_ago=0.5)
+
+    llm_cache.evict()
+    assert not os.path.exists(llm_cache._entry_path("stale"))
+    assert not os.path.exists(llm_cache._entry_path("stale-but-used"))
+    assert llm_cache.get("fresh") == "fresh"
+
+    llm_cache.put("stale-but-used", "again")
+    _age("stale-but-used", stored_hours_ago=2, used_hours_ago=0)
+    assert llm_cache.get("stale-but-used") is None
+
+
+def test_hits_keep_the_stored_time_and_order_eviction(cache_dir, monkeypatch):
+    for key in ("a", "b", "c"):
+        llm_cache.put(key, "x" * 1000)
+        _age(key, stored_hours_ago=0.5, used_hours_ago=0.5)
+    stored_at = os.stat(llm_cache._entry_path("a")).st_mtime
+    assert llm_cache.get("a") is not None
+    assert os.stat(llm_cache._entry_path("a")).st_mtime == stored_at
+
+    # Room for two entries: the least recently used one goes.
+    monkeypatch.setattr(config, "LLM_CACHE_MAX_MB", 2.5 * os.path.getsize(llm_cache._entry_path("a")) / 2**20)
+    llm_cache.evict()
+    assert [os.path.exists(llm_cache._entry_path(k)) for k in ("a", "b", "c")] == [True, False, True]
+
+
+def test_put_walks_the_cache_only_when_it_may_be_over_budget(cache_dir, monkeypatch):
+    walks = []
+    evict = llm_cache.evict
+    monkeypatch.setattr(llm_cache, "evict", lambda: walks.append(1) or evict())
+
+    for i in range(50):
+        llm_cache.put(f"key{i}", "x" * 100)
+    assert len(walks) == 1
+
+    entry_bytes = os.path.getsize(llm_cache._entry_path("key0"))
+    monkeypatch.setattr(config, "LLM_CACHE_MAX_MB", 60.5 * entry_bytes / 2**20)
+    for i in range(50, 70):
+        llm_cache.put(f"key{i}", "x" * 100)
+    assert len(walks) > 1
+    assert sum(len(files) for _, _, files in os.walk(cache_dir)) <= 60
@@ -0,0 +1,43 @@
+import pytest
+
+import config
+from agents import llm_ledger
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    path = tmp_path / "llm_calls.jsonl"
+    monkeypatch.setattr(config, "LLM_LEDGER_HISTORY", str(path))
+    monkeypatch.setattr(config, "LLM_LEDGER_HISTORY_RUNS", 3)
+    return path
+
+
+def _run(name: str) -> None:
+    llm_ledger.start_ledger()
+    llm_ledger.record("cleaning plan", "model", "prompt " * 10, "miss", latency_s=0.5)
+    llm_ledger.record("findings", "model", "prompt", "hit")
+    llm_ledger.append_history({"run": name, "input": "data.csv"})
+
+
+def test_history_rotates_instead_of_rewriting(history):
+    for i in range(3):
+        _run(f"run{i}")
+    # The third run filled the file: it was moved aside whole, records in order.
+    assert not history.exists()
+    assert [e["run"] for e in llm_ledger.read_history()] == ["run0", "run0", "run1", "run1", "run2", "run2"]
+
+    for i in range(3, 7):
+        _run(f"run{i}")
+    runs = list(dict.fromkeys(e["run"] for e in llm_ledger.read_history()))
+    assert runs == ["run3", "run4", "run5", "run6"]
+    assert "| cleaning plan | 4 |" in llm_ledger.history_table("data.csv")
+
+
+def test_a_record_appended_by_another_job_survives_rotation(history):
+    _run("run0")
+    _run("run1")
+    # Another job's line lands after this job's; rotation moves it along.
+    with open(history, "a", encoding="utf-8") as f:
+        f.write('{"run": "other", "input": "data.csv", "purpose": "findings", "prompt_tokens": 1}\n')
+    _run("run2")
+    assert "other" in {e["run"] for e in llm_ledger.read_history()}
@@ -0,0 +1,55 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pytest
+
+from agents import parallel_ingestion
+from agents.parallel_ingestion import find_record_boundaries, read_csv_parallel
+
+READ_OPTIONS = {"encoding": "utf-8", "encoding_errors": "replace", "sep": ",", "on_bad_lines": "skip"}
+
+
+def _write_csv(path) -> None:
+    lines = ["id,note,code,flag,amount"]
+    for i in range(120):
+        # Quoted fields with newlines and escaped quotes, some of them long enough to
+        # straddle range and scan-block boundaries.
+        note = f'"line one\nline ""two"" of {i}\n{"x" * (i % 40)}"' if i % 3 == 0 else f"plain {i}"
+        # Numbers in most ranges, text in one; booleans in some ranges, 0/1 in others.
+        code = f"A{i}" if i == 100 else str(i * 7)
+        flag = ("True" if i % 2 else "False") if i < 60 else str(i % 2)
+        amount = "" if 30 <= i < 50 else f"{i * 1.5}"
+        lines.append(f"{i},{note},{code},{flag},{amount}")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+@pytest.fixture(scope="module")
+def executor():
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+
+@pytest.mark.parametrize("workers", [2, 5, 13, 40])
+def test_parallel_read_matches_read_csv(tmp_path, monkeypatch, executor, workers):
+    # Small scan blocks make quote parity carry over from one block to the next.
+    monkeypatch.setattr(parallel_ingestion, "SCAN_BLOCK_BYTES", 64)
+    path = tmp_path / "data.csv"
+    _write_csv(path)
+
+    boundaries = find_record_boundaries(str(path), workers)
+    assert len(boundaries) > min(workers, 3)
+
+    result = read_csv_parallel(str(path), READ_OPTIONS, executor, workers)
+    pd.testing.assert_frame_equal(result, pd.read_csv(path, **READ_OPTIONS))
+
+
+def test_boundaries_fall_between_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(parallel_ingestion, "SCAN_BLOCK_BYTES", 50)
+    path = tmp_path / "data.csv"
+    _write_csv(path)
+    data = path.read_bytes()
+    boundaries = find_record_boundaries(str(path), 30)
+    assert boundaries[-1] == len(data)
+    for offset in boundaries[:-1]:
+        # Each range starts a record: an even number of quotes lies before it.
+        assert data[offset - 1:offset] == b"\n" and data[:offset].count(b'"') % 2 == 0
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents.cleaning import execute_plan
+from agents.plan_optimizer import optimize_plan
+
+
+def _frame() -> pd.DataFrame:
+    rng = np.random.default_rng(5)
+    rows = 200
+    df = pd.DataFrame({
+        "region": rng.choice(np.array(["North", "South", "East", "West", None], dtype=object), rows),
+        "status": rng.choice(np.array(["Yes", "No", "yes"], dtype=object), rows),
+        "comment": rng.choice(np.array(["Good!", "bad 2", "OK...", None], dtype=object), rows),
+        "price": np.where(rng.random(rows) < 0.2, np.nan, rng.normal(50, 10, rows).round(1)),
+        "units": rng.integers(1, 5, rows),
+        "notes": rng.choice(np.array(["a", "b"], dtype=object), rows),
+    })
+    return pd.concat([df, df.iloc[::4]], ignore_index=True)
+
+
+def _step(action, column=None, **details):
+    step = {"action": action, "details": details}
+    if column:
+        step["column"] = column
+    return step
+
+
+def _assert_optimized_equal(steps, expected_rewrite):
+    df = _frame()
+    plan = {"steps": steps}
+    optimized, rewrites = optimize_plan(plan, list(df.columns))
+    assert any(r.startswith(expected_rewrite) for r in rewrites), rewrites
+    pd.testing.assert_frame_equal(execute_plan(df, optimized), execute_plan(df, plan))
+    return optimized, rewrites
+
+
+def test_drops_invalid_steps():
+    _assert_optimized_equal([
+        _step("clean_text", "missing_column", operations=["lowercase"]),
+        _step("clean_categorical", "region", valid_values=[]),
+        _step("clean_text", "comment", operations=["lowercase"]),
+    ], "Dropped step 1")
+
+
+def test_drops_writes_to_a_column_removed_later():
+    optimized, _ = _assert_optimized_equal([
+        _step("clean_text", "notes", operations=["lowercase"]),
+        _step("fill_missing", "price", strategy="mean"),
+        _step("remove_column", "notes"),
+    ], "Dropped step 1")
+    assert [s["action"] for s in optimized["steps"]] == ["remove_column", "fill_missing"]
+
+
+def test_drops_idempotent_repeats():
+    _assert_optimized_equal([
+        _step("clean_text", "comment", operations=["lowercase", "remove_punctuation"]),
+        _step("fill_missing", "price", strategy="median"),
+        _step("clean_text", "comment", operations=["lowercase", "remove_punctuation"]),
+        _step("remove_duplicates"),
+        _step("remove_duplicates"),
+    ], "Dropped step 3")
+
+
+def test_keeps_a_repeat_after_its_column_changed():
+    df = _frame()
+    plan = {"steps": [
+        _step("fill_missing", "price", strategy="mean"),
+        _step("scale_numeric", "price", strategy="min_max"),
+        _step("fill_missing", "price", strategy="mean"),
+    ]}
+    optimized, rewrites = optimize_plan(plan, list(df.columns))
+    assert rewrites == []
+    pd.testing.assert_frame_equal(execute_plan(df, optimized), execute_plan(df, plan))
+
+
+def test_pushes_column_drops_ahead():
+    optimized, _ = _assert_optimized_equal([
+        _step("clean_text", "comment", operations=["remove_digits"]),
+        _step("encode_binary", "status", positive_value="yes"),
+        _step("remove_column", "notes"),
+    ], "Moved step 3")
+    assert optimized["steps"][0]["action"] == "remove_column"
+
+
+def test_pushes_filters_ahead_of_row_local_steps():
+    optimized, _ = _assert_optimized_equal([
+        _step("clean_text", "comment", operations=["lowercase"]),
+        _step("encode_binary", "status", positive_value="yes"),
+        _step("clean_categorical", "region", valid_values=["North", "East"]),
+    ], "Moved step 3")
+    assert optimized["steps"][0]["action"] == "clean_categorical"
+
+
+def test_keeps_filters_behind_row_dependent_steps():
+    df = _frame()
+    plan = {"steps": [
+        _step("fill_missing", "price", strategy="mean"),
+        _step("scale_numeric", "units", strategy="standard"),
+        _step("clean_categorical", "region", valid_values=["North"]),
+    ]}
+    optimized, rewrites = optimize_plan(plan, list(df.columns))
+    assert optimized["steps"] == plan["steps"] and rewrites == []
+    pd.testing.assert_frame_equal(execute_plan(df, optimized), execute_plan(df, plan))
+
+
+@pytest.mark.parametrize("subset", [None, ["region", "status"]])
+def test_moves_filters_and_dedup_past_each_other(subset):
+    # The filter's column is among those the dedupe compares, so the two commute.
+    _assert_optimized_equal([
+        _step("encode_binary", "status", positive_value="yes"),
+        _step("remove_duplicates", subset=subset),
+        _step("clean_categorical", "region", valid_values=["South", "West"]),
+    ], "Moved step 3")
+
+
+def test_pushes_dedup_ahead_of_derived_columns():
+    optimized, _ = _assert_optimized_equal([
+        _step("create_feature", new_column_name="total", expression="units * 2"),
+        _step("remove_duplicates", subset=["region", "units"]),
+    ], "Moved step 2")
+    assert optimized["steps"][0]["action"] == "remove_duplicates"
+
+
+def test_keeps_a_dedup_behind_a_filter_on_another_column():
+    df = _frame()
+    plan = {"steps": [
+        _step("clean_categorical", "region", valid_values=["North"]),
+        _step("remove_duplicates", subset=["status"]),
+    ]}
+    optimized, _ = optimize_plan(plan, list(df.columns))
+    assert [s["action"] for s in optimized["steps"]] == ["clean_categorical", "remove_duplicates"]
+    pd.testing.assert_frame_equal(execute_plan(df, optimized), execute_plan(df, plan))
+
+
+def test_merges_overlapping_filters():
+    optimized, _ = _assert_optimized_equal([
+        _step("clean_categorical", "region", valid_values=["North", "South", "East"]),
+        _step("clean_text", "comment", operations=["lowercase"]),
+        _step("clean_categorical", "region", valid_values=["South", "East", "West"]),
+    ], "Merged step 3")
+    filters = [s for s in optimized["steps"] if s["action"] == "clean_categorical"]
+    assert len(filters) == 1 and filters[0]["details"]["valid_values"] == ["South", "East"]
+
+
+def test_does_not_merge_disjoint_filters():
+    df = _frame()
+    plan = {"steps": [
+        _step("clean_categorical", "region", valid_values=["North", "South"]),
+        _step("clean_categorical", "region", valid_values=["East"]),
+    ]}
+    optimized, rewrites = optimize_plan(plan, list(df.columns))
+    assert len(optimized["steps"]) == 2 and rewrites == []
+    result = execute_plan(df, optimized)
+    assert result.empty
+    pd.testing.assert_frame_equal(result, execute_plan(df, plan))